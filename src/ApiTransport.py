@@ -0,0 +1,342 @@
+"""
+API transport module for PaloCleaner
+
+Replaces the urllib based transport used by pan-python (pan.xapi) for all XML API requests sent by the Panorama and
+Firewall objects, with a transport providing :
+- a pool of persistent (keep-alive) connections per appliance, shared by all threads
+- gzip compression of the responses
+- retries with exponential backoff and jitter for idempotent (read-only) requests, when a transient error occurs
+  (connection reset / refused, HTTP 5xx, API throttling)
+- counters of the requests, connections and retries, displayed at the end of the run
+- recording of the requests / responses into a cassette, or replay of a recorded cassette (see SessionCassette)
+"""
+
+import gzip
+import http.client
+import io
+import random
+import socket
+import time
+from threading import Lock
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urlsplit
+import pan.xapi
+from SessionCassette import SessionCassette, CassetteError
+
+# HTTP status codes considered as transient (server error or API throttling) on which idempotent requests are retried
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Connection errors on which idempotent requests are retried (timeouts are not retried, as they are handled by the
+# callers, ie : --opstate-timeout / --opstate-retries)
+RETRY_EXCEPTIONS = (ConnectionRefusedError, ConnectionResetError, ConnectionAbortedError, BrokenPipeError,
+                    http.client.RemoteDisconnected)
+# Base and maximum delay (in seconds) between two retries. The delay doubles on each retry, with a random jitter
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10
+# Maximum number of idle connections kept open for each appliance
+POOL_MAXSIZE = 32
+# pan.xapi urlopen function, restored by ApiTransport.uninstall()
+_original_urlopen = pan.xapi.urlopen
+
+
+class TransportResponse:
+    """Response returned to pan.xapi, with the same interface than the urllib responses it uses"""
+
+    def __init__(self, url: str, status: int, reason: str, headers: http.client.HTTPMessage, body: bytes):
+        """
+        TransportResponse class initialization function
+
+        :param url: (str) The requested URL
+        :param status: (int) The HTTP status code
+        :param reason: (str) The HTTP reason phrase
+        :param headers: (http.client.HTTPMessage) The response headers
+        :param body: (bytes) The (decompressed) response body
+        """
+
+        self.url = url
+        self.status = self.code = status
+        self.reason = reason
+        self.headers = headers
+        self._body = body
+
+    def read(self) -> bytes:
+        return self._body
+
+    def info(self) -> http.client.HTTPMessage:
+        return self.headers
+
+    def getheader(self, name: str, default=None):
+        return self.headers.get(name, default)
+
+    def geturl(self) -> str:
+        return self.url
+
+
+class ApiTransport:
+    """Pooled keep-alive HTTP transport with compression and retries, used instead of urllib by pan.xapi"""
+
+    def __init__(self, retries: int = 3, cassette: SessionCassette = None):
+        """
+        ApiTransport class initialization function
+
+        :param retries: (int) Maximum number of retries of an idempotent request on a transient error
+        :param cassette: (SessionCassette) Cassette on which the requests are recorded, or from which they are replayed
+        """
+
+        self._retries = retries         # Maximum number of retries of an idempotent request on a transient error
+        self.cassette = cassette        # SessionCassette on which the requests are recorded (or from which they are replayed), if any
+        self._pools = dict()            # Idle connections of each appliance. Key is a tuple (scheme, host, port), value is a list of http.client.HTTPConnection
+        self._lock = Lock()             # Lock protecting the pools and counters (requests are sent by several threads)
+        self.counters = {               # Counters of the transport activity, displayed by get_summary()
+            "requests": 0,              # number of API requests
+            "connections": 0,           # number of connections opened
+            "reused": 0,                # number of requests sent on an already opened connection
+            "retries": 0,               # number of retries done after a transient error
+            "failures": 0,              # number of requests failed after all retries
+            "bytes_received": 0,        # number of bytes received (compressed)
+            "bytes_decoded": 0,         # number of bytes of the responses once decompressed
+        }
+
+    def install(self):
+        """
+        Replaces the pan.xapi urlopen function, so that all the API requests go through this transport
+
+        :return:
+        """
+
+        pan.xapi.urlopen = self.urlopen
+
+    def uninstall(self):
+        """
+        Restores the pan.xapi urlopen function and closes the idle connections
+
+        :return:
+        """
+
+        pan.xapi.urlopen = _original_urlopen
+        with self._lock:
+            for pool in self._pools.values():
+                for conn in pool:
+                    conn.close()
+            self._pools.clear()
+
+    def count(self, counter: str, value: int = 1):
+        with self._lock:
+            self.counters[counter] += value
+
+    def get_connection(self, scheme: str, host: str, port: int, timeout, context):
+        """
+        Returns an idle connection to the provided appliance from the pool, or a new connection if none is available
+
+        :param scheme: (str) "http" or "https"
+        :param host: (str) Hostname or IP address of the appliance
+        :param port: (int) TCP port of the appliance (None for default)
+        :param timeout: (int) Socket timeout (in seconds)
+        :param context: (ssl.SSLContext) SSL context used for new HTTPS connections
+        :return: (tuple) The http.client.HTTPConnection, and a boolean indicating if it is a reused connection
+        """
+
+        with self._lock:
+            pool = self._pools.get((scheme, host, port))
+            if pool:
+                conn = pool.pop()
+                self.counters["reused"] += 1
+                conn.timeout = timeout
+                if conn.sock:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.counters["connections"] += 1
+
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=context), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def release_connection(self, scheme: str, host: str, port: int, conn: http.client.HTTPConnection):
+        """
+        Puts back a connection on the pool once its response has been fully read
+
+        :param scheme: (str) "http" or "https"
+        :param host: (str) Hostname or IP address of the appliance
+        :param port: (int) TCP port of the appliance (None for default)
+        :param conn: (http.client.HTTPConnection) The connection to release
+        :return:
+        """
+
+        with self._lock:
+            pool = self._pools.setdefault((scheme, host, port), list())
+            if len(pool) < POOL_MAXSIZE:
+                pool.append(conn)
+                return
+        conn.close()
+
+    @staticmethod
+    def is_idempotent(query: dict) -> bool:
+        """
+        Checks if an XML API request is a read-only request, which can safely be sent again
+
+        :param query: (dict) The parsed parameters of the request (as returned by urllib.parse.parse_qs)
+        :return: (bool) True if the request can be retried
+        """
+
+        request_type = query.get("type", [None])[0]
+        if request_type == "config":
+            return query.get("action", [None])[0] in ("get", "show")
+        if request_type == "op":
+            return query.get("cmd", [""])[0].lstrip().startswith("<show>")
+        return request_type in ("keygen", "log", "version")
+
+    @staticmethod
+    def get_backoff(attempt: int, retry_after: str = None) -> float:
+        """
+        Returns the delay (in seconds) to wait before the next retry
+        Uses the Retry-After header value if provided by the appliance, otherwise an exponential backoff with full jitter
+
+        :param attempt: (int) The number of the retry (starting at 0)
+        :param retry_after: (str) The Retry-After header value of the response, if any
+        :return: (float) The delay to wait
+        """
+
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), BACKOFF_MAX)
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def urlopen(self, url, data=None, timeout=None, context=None, **kwargs):
+        """
+        Sends a request, with the same signature and behavior than the urllib.request.urlopen function used by pan.xapi
+        (raises urllib.error.HTTPError for HTTP error codes, and urllib.error.URLError for connection errors)
+
+        :param url: (urllib.request.Request) The request to send
+        :param data: (bytes) Not used (the request data is provided by the Request object)
+        :param timeout: (int) Socket timeout (in seconds)
+        :param context: (ssl.SSLContext) SSL context used for new HTTPS connections
+        :return: (TransportResponse) The response
+        """
+
+        request = url
+        split_url = urlsplit(request.full_url)
+        scheme, host, port = split_url.scheme, split_url.hostname, split_url.port
+        selector = split_url.path + ("?" + split_url.query if split_url.query else "")
+        body = request.data
+        query = parse_qs(body.decode() if body else split_url.query)
+        retries = self._retries if self.is_idempotent(query) else 0
+
+        headers = {"Accept-Encoding": "gzip", "Connection": "keep-alive"}
+        headers.update(request.header_items())
+        if body is not None:
+            headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+        if timeout is None:
+            timeout = socket.getdefaulttimeout()
+
+        self.count("requests")
+        if self.cassette and self.cassette.replay:
+            return self.replay(request, host, query)
+
+        start_time = time.time()
+        attempt = 0
+        while True:
+            conn, reused = self.get_connection(scheme, host, port, timeout, context)
+            try:
+                conn.request(request.get_method(), selector, body=body, headers=headers)
+                response = conn.getresponse()
+                content = response.read()
+            except RETRY_EXCEPTIONS as e:
+                conn.close()
+                if reused:
+                    # the appliance has closed the idle connection : the request is sent again on a new connection
+                    continue
+                if attempt < retries:
+                    time.sleep(self.get_backoff(attempt))
+                    attempt += 1
+                    self.count("retries")
+                    continue
+                self.count("failures")
+                self.record(host, query, 0, None, str(e).encode(), start_time)
+                raise URLError(e)
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self.count("failures")
+                self.record(host, query, 0, None, str(e).encode(), start_time)
+                raise URLError(e)
+
+            self.count("bytes_received", len(content))
+            if response.getheader("Content-Encoding", "").lower() == "gzip":
+                content = gzip.decompress(content)
+            self.count("bytes_decoded", len(content))
+
+            if response.will_close:
+                conn.close()
+            else:
+                self.release_connection(scheme, host, port, conn)
+
+            if response.status < 400:
+                self.record(host, query, response.status, response.getheader("Content-Type"), content, start_time)
+                return TransportResponse(request.full_url, response.status, response.reason, response.headers, content)
+
+            if response.status in RETRY_STATUS_CODES and attempt < retries:
+                time.sleep(self.get_backoff(attempt, response.getheader("Retry-After")))
+                attempt += 1
+                self.count("retries")
+                continue
+            self.count("failures")
+            self.record(host, query, response.status, response.getheader("Content-Type"), content, start_time)
+            raise HTTPError(request.full_url, response.status, response.reason, response.headers, io.BytesIO(content))
+
+    def record(self, host: str, query: dict, status: int, content_type: str, content: bytes, start_time: float):
+        """
+        Records a request and its response on the cassette, if recording
+
+        :param host: (str) Hostname or IP address of the appliance
+        :param query: (dict) The parsed parameters of the request (as returned by urllib.parse.parse_qs)
+        :param status: (int) The HTTP status code (0 if the request failed with a connection error)
+        :param content_type: (str) The Content-Type header of the response
+        :param content: (bytes) The (decompressed) response body, or the error message
+        :param start_time: (float) Timestamp of the first attempt of the request
+        :return:
+        """
+
+        if self.cassette:
+            self.cassette.record(host, {k: v[0] for k, v in query.items()}, status, content_type, content,
+                                 time.time() - start_time)
+
+    def replay(self, request, host: str, query: dict) -> TransportResponse:
+        """
+        Returns the recorded response of a request, raising the same errors than when it has been recorded
+
+        :param request: (urllib.request.Request) The request
+        :param host: (str) Hostname or IP address of the appliance
+        :param query: (dict) The parsed parameters of the request (as returned by urllib.parse.parse_qs)
+        :return: (TransportResponse) The response
+        """
+
+        try:
+            status, content_type, content, delay = self.cassette.play(host, {k: v[0] for k, v in query.items()})
+        except CassetteError as e:
+            self.count("failures")
+            raise URLError(e)
+        time.sleep(delay)
+        self.count("bytes_decoded", len(content))
+        if not status:
+            self.count("failures")
+            raise URLError(content.decode())
+        headers = http.client.HTTPMessage()
+        if content_type:
+            headers["Content-Type"] = content_type
+        if status >= 400:
+            self.count("failures")
+            raise HTTPError(request.full_url, status, http.client.responses.get(status, ""), headers, io.BytesIO(content))
+        return TransportResponse(request.full_url, status, http.client.responses.get(status, ""), headers, content)
+
+    def get_summary(self) -> str:
+        """
+        Returns a summary of the transport counters, to be displayed at the end of the run
+
+        :return: (str) The summary
+        """
+
+        with self._lock:
+            counters = dict(self.counters)
+        summary = f"{counters['requests']} API requests sent on {counters['connections']} connections " \
+                  f"({counters['reused']} reused), {counters['retries']} retries, {counters['failures']} failures"
+        if counters["bytes_decoded"]:
+            summary += f", {counters['bytes_received'] / 1048576:.1f} MB received " \
+                       f"({counters['bytes_decoded'] / 1048576:.1f} MB uncompressed)"
+        return summary
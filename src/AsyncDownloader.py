@@ -0,0 +1,248 @@
+"""
+Asynchronous download module for PaloCleaner
+
+Downloads the configuration subtrees (objects and rulebases) of all locations concurrently, using asyncio, before
+the objects and rules are built from them by the usual parsing code.
+Each subtree is requested with its own XML API "get" request. All requests of all locations are sent at the same
+time, within a global limit of in-flight requests, so that the download phase takes roughly as long as the slowest
+requests instead of the sum of all of them.
+"""
+
+import asyncio
+import gzip
+import ssl
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urlencode, urlsplit
+from ApiTransport import RETRY_STATUS_CODES, ApiTransport
+from SessionCassette import SessionCassette, CassetteError
+
+# Maximum duration (in seconds) of a single request
+REQUEST_TIMEOUT = 600
+
+
+class AsyncDownloadError(Exception):
+    """Raised when a subtree cannot be downloaded (HTTP error or XML API error response)"""
+    pass
+
+
+class AsyncDownloader:
+    """asyncio based XML API client, downloading configuration subtrees concurrently"""
+
+    def __init__(self, hostname: str, port: int, api_key: str, max_inflight: int, retries: int, transport: ApiTransport = None):
+        """
+        AsyncDownloader class initialization function
+
+        :param hostname: (str) Hostname or IP address of the Panorama
+        :param port: (int) HTTPS port of the Panorama (None for default)
+        :param api_key: (str) The API key to be used for the requests
+        :param max_inflight: (int) Maximum number of requests sent at the same time (and of opened connections)
+        :param retries: (int) Maximum number of retries of a request on a transient error
+        :param transport: (ApiTransport) The transport whose counters are updated with the requests sent
+        """
+
+        if port is None:
+            # same as pan.xapi, the hostname can include the port (ie : "panorama.local:8443")
+            split_hostname = urlsplit("//" + hostname)
+            hostname, port = split_hostname.hostname, split_hostname.port
+        self._hostname = hostname
+        self._port = port or 443
+        self._api_key = api_key
+        self._max_inflight = max_inflight
+        self._retries = retries
+        self._transport = transport
+        self._ssl_context = ssl._create_unverified_context()    # same behavior than pan.xapi (no certificate verification)
+        self._idle_connections = list()                         # Idle (reader, writer) connections, reused by the next requests
+        self.failures = dict()                                  # Dict of the subtrees which could not be downloaded. Key is a tuple (location name, xpath), value is the error
+
+    def count(self, counter: str, value: int = 1):
+        if self._transport:
+            self._transport.count(counter, value)
+
+    def download(self, jobs: dict) -> dict:
+        """
+        Downloads all the requested subtrees concurrently
+
+        :param jobs: (dict) Dict where the key is the location name and the value is the list of xpaths to download
+        :return: (dict) Dict where the key is the location name and the value is a dict {xpath: element} of the
+            downloaded subtrees (the element is None if the xpath does not exist on the configuration). Subtrees which
+            could not be downloaded are not returned (see self.failures)
+        """
+
+        return asyncio.run(self.download_all(jobs))
+
+    async def download_all(self, jobs: dict) -> dict:
+        semaphore = asyncio.Semaphore(self._max_inflight)
+        requests = [(location_name, xpath) for location_name, xpaths in jobs.items() for xpath in xpaths]
+        results = await asyncio.gather(*[self.get_subtree(xpath, semaphore) for _, xpath in requests], return_exceptions=True)
+        for reader, writer in self._idle_connections:
+            writer.close()
+        self._idle_connections.clear()
+
+        subtrees = {location_name: dict() for location_name in jobs}
+        for (location_name, xpath), result in zip(requests, results):
+            if isinstance(result, Exception):
+                self.failures[(location_name, xpath)] = result
+            else:
+                subtrees[location_name][xpath] = result
+        return subtrees
+
+    async def get_subtree(self, xpath: str, semaphore: asyncio.Semaphore):
+        """
+        Downloads a configuration subtree, retrying with exponential backoff on transient errors
+
+        :param xpath: (str) The absolute xpath of the subtree
+        :param semaphore: (asyncio.Semaphore) Semaphore limiting the number of in-flight requests
+        :return: (xml.etree.ElementTree.Element) The subtree element, or None if it does not exist on the configuration
+        """
+
+        query = {"type": "config", "action": "get", "xpath": xpath, "key": self._api_key}
+        cassette = self._transport.cassette if self._transport else None
+        async with semaphore:
+            self.count("requests")
+            if cassette and cassette.replay:
+                status, content = await self.replay_request(cassette, query)
+            else:
+                status, content = await self.send_with_retries(urlencode(query).encode(), cassette, query)
+            if status != 200:
+                self.count("failures")
+                raise AsyncDownloadError(f"HTTP error {status}" if status else content.decode())
+
+        response = ET.fromstring(content)
+        if response.get("status") != "success":
+            raise AsyncDownloadError(response.findtext(".//msg") or ET.tostring(response, encoding="unicode"))
+        result = response.find("./result")
+        return result[0] if result is not None and len(result) else None
+
+    async def send_with_retries(self, body: bytes, cassette: SessionCassette, query: dict) -> (int, bytes):
+        """
+        Sends an XML API request, retrying with exponential backoff on transient errors, and records it on the cassette
+
+        :param body: (bytes) The urlencoded request parameters
+        :param cassette: (SessionCassette) The cassette on which the request is recorded, if any
+        :param query: (dict) The request parameters (recorded on the cassette)
+        :return: (tuple) The HTTP status code (0 if the request failed with a connection error), and the response body
+            (or the error message)
+        """
+
+        start_time = time.time()
+        attempt = 0
+        while True:
+            try:
+                status, content = await asyncio.wait_for(self.send_request(body), REQUEST_TIMEOUT)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+                status, content = 0, f"{type(e).__name__} : {e}".encode()
+            if (status in RETRY_STATUS_CODES or not status) and attempt < self._retries:
+                await asyncio.sleep(ApiTransport.get_backoff(attempt))
+                attempt += 1
+                self.count("retries")
+                continue
+            break
+        if cassette:
+            cassette.record(self._hostname, query, status, "application/xml", content, time.time() - start_time)
+        return status, content
+
+    async def replay_request(self, cassette: SessionCassette, query: dict) -> (int, bytes):
+        try:
+            status, _, content, delay = cassette.play(self._hostname, query)
+        except CassetteError as e:
+            return 0, str(e).encode()
+        await asyncio.sleep(delay)
+        self.count("bytes_decoded", len(content))
+        return status, content
+
+    async def send_request(self, body: bytes) -> (int, bytes):
+        """
+        Sends an XML API request on an idle connection (or on a new one), and reads the response
+        If an idle connection has been closed by Panorama, the request is sent again on a new connection
+
+        :param body: (bytes) The urlencoded request parameters
+        :return: (tuple) The HTTP status code, and the (decompressed) response body
+        """
+
+        while True:
+            reused = bool(self._idle_connections)
+            if reused:
+                reader, writer = self._idle_connections.pop()
+                self.count("reused")
+            else:
+                reader, writer = await asyncio.open_connection(self._hostname, self._port, ssl=self._ssl_context)
+                self.count("connections")
+            try:
+                writer.write(
+                    f"POST /api/ HTTP/1.1\r\nHost: {self._hostname}\r\n"
+                    f"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n"
+                    f"Accept-Encoding: gzip\r\nConnection: keep-alive\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                status, headers, content = await self.read_response(reader)
+            except (OSError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    continue
+                raise
+            break
+
+        self.count("bytes_received", len(content))
+        if headers.get("content-encoding", "").lower() == "gzip":
+            content = gzip.decompress(content)
+        self.count("bytes_decoded", len(content))
+
+        if headers.get("connection", "").lower() == "close" or "content-length" not in headers and \
+                headers.get("transfer-encoding", "").lower() != "chunked":
+            writer.close()
+        else:
+            self._idle_connections.append((reader, writer))
+        return status, content
+
+    @staticmethod
+    async def read_response(reader: asyncio.StreamReader) -> (int, dict, bytes):
+        """
+        Reads an HTTP/1.1 response (status line, headers and body, with Content-Length or chunked transfer encoding)
+
+        :param reader: (asyncio.StreamReader) The connection reader
+        :return: (tuple) The HTTP status code, the headers (dict with lowercase names), and the raw body
+        """
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b"", None)
+        status = int(status_line.split()[1])
+        headers = dict()
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = list()
+            while chunk_size := int((await reader.readline()).split(b";")[0], 16):
+                chunks.append(await reader.readexactly(chunk_size))
+                await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            content = b"".join(chunks)
+        elif "content-length" in headers:
+            content = await reader.readexactly(int(headers["content-length"]))
+        else:
+            content = await reader.read()
+        return status, headers, content
+
+
+def download_subtrees(hostname: str, port: int, api_key: str, jobs: dict, max_inflight: int, retries: int, transport: ApiTransport = None):
+    """
+    Downloads the requested subtrees of all locations concurrently (see AsyncDownloader)
+
+    :param hostname: (str) Hostname or IP address of the Panorama
+    :param port: (int) HTTPS port of the Panorama (None for default)
+    :param api_key: (str) The API key to be used for the requests
+    :param jobs: (dict) Dict where the key is the location name and the value is the list of xpaths to download
+    :param max_inflight: (int) Maximum number of requests sent at the same time
+    :param retries: (int) Maximum number of retries of a request on a transient error
+    :param transport: (ApiTransport) The transport whose counters are updated with the requests sent
+    :return: (tuple) Dict of the downloaded subtrees per location, dict of failures, and duration of the download
+    """
+
+    start_time = time.time()
+    downloader = AsyncDownloader(hostname, port, api_key, max_inflight, retries, transport)
+    subtrees = downloader.download(jobs)
+    return subtrees, downloader.failures, time.time() - start_time
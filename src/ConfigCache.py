@@ -0,0 +1,256 @@
+"""
+Configuration cache module for PaloCleaner
+
+Stores on disk the configuration subtrees (objects and rulebases) downloaded for each location, as well as the
+device-groups hierarchy and the predefined services (per content version), so that next runs against the same Panorama only re-download the locations whose
+configuration has changed.
+Changes are detected using the Panorama configuration logs : each configuration log entry contains the path of the
+modified configuration element, which permits to know the concerned location (shared or device-group name).
+"""
+
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ET
+from threading import Lock
+
+# Maximum number of configuration logs requested to find the changed locations
+# If this number is reached, all locations are considered as changed
+MAX_CONFIG_LOGS = 5000
+
+
+class ConfigCache:
+    """On-disk cache of the configuration subtrees downloaded for each location"""
+
+    def __init__(self, cache_folder: str, panorama_hostname: str):
+        """
+        ConfigCache class initialization function
+
+        :param cache_folder: (str) Path to the folder where the cache files are stored
+        :param panorama_hostname: (str) Hostname of the Panorama (each Panorama has its own cache)
+        """
+
+        self._cache_folder = os.path.join(cache_folder, panorama_hostname)     # Folder where the cache of this Panorama is stored
+        self._manifest = {"config_log_marker": None, "hierarchy": None, "predefined": None, "locations": dict()}   # Content of the manifest.json file (see load())
+        self._changed_locations = None          # Set of locations changed since the cache has been written (None = all locations)
+        self._new_marker = None                 # Configuration log marker (seqno, receive_time) at the start of the current run
+        self._subtrees = dict()                 # Configuration subtrees of each location. Key is the location name, value is a dict {xpath: element}
+        self._refreshed = set()                 # Locations downloaded during the current run
+        self._lock = Lock()                     # Lock protecting the cache structures when downloading concurrently
+        self._predefined = None                 # Tuple (content version, element) of the predefined services downloaded during the current run
+
+    def load(self):
+        """
+        Loads the cache manifest (if it exists)
+        The manifest contains the configuration log marker of the run which wrote the cache, the device-groups hierarchy,
+        and for each location the name of the file containing its subtrees (named by the hash of its content)
+
+        :return:
+        """
+
+        manifest_path = os.path.join(self._cache_folder, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self._manifest = json.load(f)
+
+    def update_changed_locations(self, panorama):
+        """
+        Finds the locations which have been modified since the cache has been written, using the Panorama
+        configuration logs written since the marker stored on the manifest.
+        If the cache is empty, or if the configuration logs cannot be used, all locations are considered as changed
+
+        :param panorama: (panos.panorama.Panorama) The Panorama object to be used for the XML API requests
+        :return: (set) Set of changed locations names, or None if all locations have to be considered as changed
+        """
+
+        # get the most recent configuration log, which will be the marker of the current run
+        response = panorama.xapi.log(log_type="config", nlogs=1)
+        if (last_log := response.find("./result/log/logs/entry")) is not None:
+            self._new_marker = [int(last_log.findtext("seqno")), last_log.findtext("receive_time")]
+
+        if not (marker := self._manifest.get("config_log_marker")) or not self._new_marker:
+            self._changed_locations = None
+            return self._changed_locations
+
+        response = panorama.xapi.log(log_type="config", nlogs=MAX_CONFIG_LOGS, filter=f"(receive_time geq '{marker[1]}')")
+        config_logs = response.findall("./result/log/logs/entry")
+        if len(config_logs) >= MAX_CONFIG_LOGS:
+            self._changed_locations = None
+            return self._changed_locations
+
+        self._changed_locations = set()
+        for log in config_logs:
+            if int(log.findtext("seqno")) <= marker[0]:
+                continue
+            # the path is a space separated list of the configuration nodes (ie : "device-group DG1 address host-1")
+            path = (log.findtext("path") or "").split()
+            if "device-group" in path[:-1]:
+                self._changed_locations.add(path[path.index("device-group") + 1])
+            elif path and path[0] == "shared":
+                self._changed_locations.add("shared")
+            elif path:
+                # a change has been done on another part of the configuration (templates, Panorama settings...)
+                # the hierarchy is not reused from the cache, but the locations are not impacted
+                self._changed_locations.add(None)
+        return self._changed_locations
+
+    def get_hierarchy(self) -> dict:
+        """
+        Returns the device-groups hierarchy stored on the cache, if no configuration change has been done since then
+
+        :return: (dict) Dict of device-groups and their parents (same format than PanoramaDeviceGroupHierarchy.fetch()), or None
+        """
+
+        if self._changed_locations == set():
+            return self._manifest.get("hierarchy")
+        return None
+
+    def set_hierarchy(self, hierarchy: dict):
+        """
+        Stores the device-groups hierarchy on the cache
+
+        :param hierarchy: (dict) Dict of device-groups and their parents
+        :return:
+        """
+
+        self._manifest["hierarchy"] = hierarchy
+
+    def get_predefined(self, content_version: str):
+        """
+        Returns the predefined services element stored on the cache, if it has been stored for the same content version
+
+        :param content_version: (str) The content (applications and threats) version currently installed on Panorama
+        :return: (xml.etree.ElementTree.Element) The predefined <service> element, or None
+        """
+
+        if not content_version or self._manifest.get("predefined") != content_version:
+            return None
+        try:
+            return ET.parse(os.path.join(self._cache_folder, f"predefined-{content_version}.xml")).getroot()
+        except (OSError, ET.ParseError):
+            return None
+
+    def set_predefined(self, content_version: str, services_root):
+        """
+        Stores the predefined services element on the cache, for the provided content version
+
+        :param content_version: (str) The content (applications and threats) version currently installed on Panorama
+        :param services_root: (xml.etree.ElementTree.Element) The predefined <service> element
+        :return:
+        """
+
+        if content_version and services_root is not None:
+            self._predefined = (content_version, services_root)
+
+    def is_valid(self, location_name: str) -> bool:
+        """
+        Checks if the cached subtrees of a location can be used
+
+        :param location_name: (str) The location name (shared or device-group name)
+        :return: (bool) True if the location is on the cache and has not been changed since it has been written
+        """
+
+        return self._changed_locations is not None and location_name not in self._changed_locations \
+            and location_name in self._manifest["locations"]
+
+    def get(self, location_name: str, xpaths: [str]) -> dict:
+        """
+        Returns the cached subtrees of the location for the requested xpaths
+
+        :param location_name: (str) The location name (shared or device-group name)
+        :param xpaths: (list) List of requested xpaths
+        :return: (dict) Dict where the key is the xpath and the value is the element (or None if it does not exist on
+            the configuration), or None if the cache cannot be used for this location / xpaths
+        """
+
+        with self._lock:
+            if not self.is_valid(location_name):
+                return None
+            location_subtrees = self.get_location_subtrees(location_name)
+            if not all(xpath in location_subtrees for xpath in xpaths):
+                return None
+            return {xpath: location_subtrees[xpath] for xpath in xpaths}
+
+    def put(self, location_name: str, subtrees: dict):
+        """
+        Adds downloaded subtrees of a location to the cache
+        The previously cached subtrees of the location are dropped on the first call for this location, except if the
+        location has not been changed (the downloaded subtrees are then added to the still valid ones)
+
+        :param location_name: (str) The location name (shared or device-group name)
+        :param subtrees: (dict) Dict where the key is the xpath and the value is the element (or None)
+        :return:
+        """
+
+        with self._lock:
+            if location_name not in self._refreshed:
+                self._refreshed.add(location_name)
+                if not self.is_valid(location_name):
+                    self._subtrees[location_name] = dict()
+            self.get_location_subtrees(location_name).update(subtrees)
+
+    def get_location_subtrees(self, location_name: str) -> dict:
+        """
+        Returns the subtrees of the location, which are read from the location cache file on first call
+
+        :param location_name: (str) The location name (shared or device-group name)
+        :return: (dict) Dict where the key is the xpath and the value is the element (or None)
+        """
+
+        if location_name not in self._subtrees:
+            try:
+                self._subtrees[location_name] = self.read_location(self._manifest["locations"][location_name])
+            except (OSError, ET.ParseError):
+                # unreadable cache file : the location subtrees will be downloaded
+                self._subtrees[location_name] = dict()
+        return self._subtrees[location_name]
+
+    def read_location(self, file_hash: str) -> dict:
+        """
+        Reads the cached subtrees of a location from its file
+
+        :param file_hash: (str) The hash of the location file content (which is its file name)
+        :return: (dict) Dict where the key is the xpath and the value is the element (or None)
+        """
+
+        root = ET.parse(os.path.join(self._cache_folder, f"{file_hash}.xml")).getroot()
+        return {x.get("xpath"): x[0] if len(x) else None for x in root.iterfind("subtree")}
+
+    def save(self):
+        """
+        Writes the subtrees of the locations downloaded during the current run, and the manifest
+        Each location file is named by the hash of its content. Files which are not referenced anymore are deleted
+
+        :return: (tuple) Number of locations written, and number of locations still loaded from the cache
+        """
+
+        os.makedirs(self._cache_folder, exist_ok=True)
+        for location_name in self._refreshed:
+            root = ET.Element("location", name=location_name)
+            for xpath, element in self._subtrees[location_name].items():
+                subtree = ET.SubElement(root, "subtree", xpath=xpath)
+                if element is not None:
+                    subtree.append(element)
+            content = ET.tostring(root)
+            file_hash = hashlib.sha256(content).hexdigest()
+            if not os.path.exists(file_path := os.path.join(self._cache_folder, f"{file_hash}.xml")):
+                with open(file_path, "wb") as f:
+                    f.write(content)
+            self._manifest["locations"][location_name] = file_hash
+
+        if self._predefined:
+            content_version, services_root = self._predefined
+            ET.ElementTree(services_root).write(os.path.join(self._cache_folder, f"predefined-{content_version}.xml"))
+            self._manifest["predefined"] = content_version
+
+        self._manifest["config_log_marker"] = self._new_marker
+        with open(os.path.join(self._cache_folder, "manifest.json"), "w") as f:
+            json.dump(self._manifest, f, indent=2)
+
+        referenced_files = {f"{x}.xml" for x in self._manifest["locations"].values()}
+        referenced_files.add(f"predefined-{self._manifest.get('predefined')}.xml")
+        for file_name in os.listdir(self._cache_folder):
+            if file_name.endswith(".xml") and file_name not in referenced_files:
+                os.remove(os.path.join(self._cache_folder, file_name))
+
+        return len(self._refreshed), len(self._manifest["locations"]) - len(self._refreshed)
@@ -0,0 +1,119 @@
+"""
+Configuration snapshot module for PaloCleaner
+
+Holds a Panorama configuration tree (as exported with "show config running" / "Export named configuration snapshot")
+and builds the pan-os-python objects from it, exactly as the XML API based refreshall() calls would do.
+This permits to run the analysis and reporting phases without any connection to Panorama.
+"""
+
+import xml.etree.ElementTree as ET
+
+# Name of the Panorama "device" entry under which device-groups are stored in the configuration tree
+PANORAMA_DEVICE_ENTRY = "localhost.localdomain"
+
+
+class ConfigSnapshot:
+    """Panorama configuration tree which can be used instead of the live XML API to get objects and rulebases"""
+
+    def __init__(self, config_root: ET.Element):
+        """
+        ConfigSnapshot class initialization function
+
+        :param config_root: (xml.etree.ElementTree.Element) The <config> element of the Panorama configuration
+        """
+
+        self._config_root = config_root
+
+    @classmethod
+    def from_file(cls, file_path: str):
+        """
+        Loads a Panorama configuration export from the provided file path
+        The file can either contain the <config> element at its root, or an XML API response (<response><result><config>)
+
+        :param file_path: (str) Path to the XML configuration file
+        :return: (ConfigSnapshot) The loaded configuration snapshot
+        """
+
+        root = ET.parse(file_path).getroot()
+        if root.tag != "config":
+            config_root = root.find(".//config")
+            if config_root is None:
+                raise ValueError(f"No <config> element found in {file_path}")
+            root = config_root
+        return cls(root)
+
+    def find(self, xpath: str):
+        """
+        Returns the configuration element matching the provided (absolute) XML API xpath
+
+        :param xpath: (str) An xpath starting with /config, as generated by pan-os-python (ie : PanObject.xpath())
+        :return: (xml.etree.ElementTree.Element) The matching element, or None if not found
+        """
+
+        if not xpath.startswith("/config"):
+            return None
+        return self._config_root.find("." + xpath[len("/config"):])
+
+    def refreshall(self, obj_class, parent, add=False):
+        """
+        Builds instances of obj_class from the configuration snapshot, for the provided parent
+        Same behavior than the panos obj_class.refreshall(parent, add=add) classmethod, without any API call
+
+        :param obj_class: (panos.base.PanObject) The pan-os-python class to instantiate (ie : AddressObject)
+        :param parent: (panos.base.PanObject) The parent of the objects to get (Panorama, DeviceGroup, PreRulebase...)
+        :param add: (bool) Replace the children of this type on the parent with the new instances
+        :return: (list) Created instances of obj_class
+        """
+
+        class_instance = obj_class()
+        class_instance.parent = parent
+        instances = class_instance.refreshall_from_xml(self.find(class_instance.xpath_nosuffix()))
+
+        if add:
+            parent.removeall(cls=obj_class)
+            parent.extend(instances)
+
+        return instances
+
+    def release(self, location_name: str):
+        """
+        Removes the configuration of a location (shared or device-group) from the tree once its objects and rulebases
+        have been built, so that the memory used by its elements can be reused while the next locations are built
+
+        :param location_name: (str) Name of the location (shared or device-group name)
+        :return:
+        """
+
+        if location_name == "shared":
+            parent, tag = self._config_root, "shared"
+        else:
+            parent, tag = self._config_root.find(f"./devices/entry[@name='{PANORAMA_DEVICE_ENTRY}']/device-group"), f"entry[@name='{location_name}']"
+        if parent is not None and (element := parent.find(tag)) is not None:
+            parent.remove(element)
+
+    def get_devicegroups_names(self) -> [str]:
+        """
+        Returns the list of device-groups names found in the configuration snapshot
+
+        :return: (list) List of device-groups names
+        """
+
+        return [
+            x.get("name") for x in
+            self._config_root.findall(f"./devices/entry[@name='{PANORAMA_DEVICE_ENTRY}']/device-group/entry")
+        ]
+
+    def get_dg_hierarchy(self) -> dict:
+        """
+        Returns a dict of device groups and their parents, with the same format than
+        panos.panorama.PanoramaDeviceGroupHierarchy.fetch()
+        Parent information is stored on the readonly section of the Panorama configuration
+
+        :return: (dict) Dict where the key is the device-group name and the value is its parent name (None for top level)
+        """
+
+        hierarchy = {x: None for x in self.get_devicegroups_names()}
+        for dg in self._config_root.findall(f"./readonly/devices/entry[@name='{PANORAMA_DEVICE_ENTRY}']/device-group/entry"):
+            if dg.get("name") in hierarchy and (parent_dg := dg.findtext("parent-dg")):
+                hierarchy[dg.get("name")] = parent_dg
+        return hierarchy
@@ -0,0 +1,134 @@
+"""
+FQDN resolution module for PaloCleaner
+
+Resolves the values of the FQDN address objects (--dns-resolver), so that they can be compared with the IP address
+objects. All the distinct FQDN of a location are resolved concurrently, and each resolution is kept on a cache shared
+by all locations for the TTL of the DNS record, so that a name used at several locations is resolved only once.
+The cache can be stored on disk (--cache-folder) to be used by next runs.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import dns.exception
+import dns.resolver
+
+# Time (in seconds) during which failed resolutions (and names resolving to several records) are kept on the cache
+NEGATIVE_TTL = 300
+# Name of the cache file, stored on the cache folder
+DNS_CACHE_FILE = "dns.json"
+
+
+class FqdnResolver:
+    """Concurrent DNS resolver of FQDN objects values, with a TTL cache"""
+
+    def __init__(self, nameserver: str, max_workers: int = 16, cache_folder: str = None):
+        """
+        FqdnResolver class initialization function
+
+        :param nameserver: (str) IP address of the DNS server to be used
+        :param max_workers: (int) Maximum number of DNS queries sent at the same time
+        :param cache_folder: (str) Folder where the resolutions cache is stored between runs (None to keep it in memory only)
+        """
+
+        self._resolver = dns.resolver.Resolver()
+        self._resolver.nameservers = [nameserver]
+        self._max_workers = max_workers
+        self._cache_file = os.path.join(cache_folder, DNS_CACHE_FILE) if cache_folder else None
+        self._cache = dict()                # Resolutions cache. Key is the FQDN, value is a tuple (IP address or None, expiration timestamp)
+        self._lock = Lock()                 # Lock protecting the cache and counters (locations are downloaded concurrently)
+        self.counters = {                   # Counters of the resolutions done during the run
+            "resolved": 0,                  # number of names resolved to a single IP address
+            "cached": 0,                    # number of resolutions found on the cache (resolved at another location or by a previous run)
+            "multiple": 0,                  # number of names resolving to several records (not taken into account)
+            "failed": 0,                    # number of names which could not be resolved
+        }
+
+    def load(self):
+        """
+        Loads the resolutions cache file (if it exists). Expired resolutions are dropped
+
+        :return:
+        """
+
+        if self._cache_file and os.path.exists(self._cache_file):
+            now = time.time()
+            with open(self._cache_file) as f:
+                self._cache = {k: tuple(v) for k, v in json.load(f).items() if v[1] > now}
+
+    def save(self):
+        if self._cache_file:
+            os.makedirs(os.path.dirname(self._cache_file), exist_ok=True)
+            with self._lock:
+                with open(self._cache_file, "w") as f:
+                    json.dump(self._cache, f)
+
+    def get_cached(self, fqdn: str):
+        """
+        Returns the cached resolution of a name
+
+        :param fqdn: (str) The name to be resolved
+        :return: (tuple) A boolean indicating if a valid resolution has been found on the cache, and the IP address
+            (None if the name could not be resolved to a single IP address)
+        """
+
+        with self._lock:
+            if (cached := self._cache.get(fqdn)) and cached[1] > time.time():
+                return True, cached[0]
+        return False, None
+
+    def query(self, fqdn: str):
+        """
+        Sends the DNS query for a name, and stores the result on the cache
+
+        :param fqdn: (str) The name to be resolved
+        :return: (str) The IP address, or None if the name does not resolve to a single A record
+        """
+
+        try:
+            answer = self._resolver.resolve(fqdn, 'A')
+            if len(answer) == 1:
+                result, ttl, counter = answer[0].to_text(), answer.rrset.ttl, "resolved"
+            else:
+                result, ttl, counter = None, NEGATIVE_TTL, "multiple"
+        except dns.exception.DNSException:
+            result, ttl, counter = None, NEGATIVE_TTL, "failed"
+        with self._lock:
+            self._cache[fqdn] = (result, time.time() + ttl)
+            self.counters[counter] += 1
+        return result
+
+    def resolve_all(self, fqdns):
+        """
+        Resolves concurrently all the provided names which are not on the cache
+
+        :param fqdns: (iterable) The names to be resolved
+        :return:
+        """
+
+        fqdns = set(fqdns)
+        to_resolve = [x for x in fqdns if not self.get_cached(x)[0]]
+        with self._lock:
+            self.counters["cached"] += len(fqdns) - len(to_resolve)
+        if to_resolve:
+            with ThreadPoolExecutor(max_workers=min(self._max_workers, len(to_resolve))) as pool:
+                list(pool.map(self.query, to_resolve))
+
+    def resolve(self, fqdn: str):
+        """
+        Returns the IP address of a name, from the cache or with a DNS query
+
+        :param fqdn: (str) The name to be resolved
+        :return: (str) The IP address, or None if the name does not resolve to a single A record
+        """
+
+        found, result = self.get_cached(fqdn)
+        return result if found else self.query(fqdn)
+
+    def get_summary(self) -> str:
+        with self._lock:
+            counters = dict(self.counters)
+        return f"{counters['resolved']} FQDN resolved, {counters['cached']} resolutions found on cache, " \
+               f"{counters['multiple']} with several records and {counters['failed']} failed (not taken into account)"
@@ -0,0 +1,138 @@
+"""
+Hitcounts cache module for PaloCleaner
+
+Stores on disk the rules hitcounts (last hit and rule modification timestamps) collected during a run, so that next
+runs against the same Panorama within a configurable time to live do not need to collect them again :
+- per appliance (firewall IP address) : the PAN-OS version and the hitcounts of each vsys
+- per device-group : the hitcounts aggregated by Panorama (--hitcounts-source panorama)
+Each entry is used only if it is younger than the TTL, and if it contains all the rulebases required by the run.
+"""
+
+import json
+import os
+import time
+from threading import Lock
+
+# Name of the cache file, stored on the Panorama cache folder (same folder than the configuration cache)
+HITCOUNT_CACHE_FILE = "hitcounts.json"
+
+
+class HitcountCache:
+    """On-disk cache of the rules hitcounts collected from the appliances and from Panorama"""
+
+    def __init__(self, cache_folder: str, panorama_hostname: str, ttl: int, force_refresh: bool = False):
+        """
+        HitcountCache class initialization function
+
+        :param cache_folder: (str) Path to the folder where the cache files are stored
+        :param panorama_hostname: (str) Hostname of the Panorama (each Panorama has its own cache)
+        :param ttl: (int) Time to live (in seconds) of the cached hitcounts
+        :param force_refresh: (bool) True if cached hitcounts must not be used (collected hitcounts are still written)
+        """
+
+        self._cache_folder = os.path.join(cache_folder, panorama_hostname)     # Folder where the cache of this Panorama is stored
+        self._ttl = ttl
+        self._force_refresh = force_refresh
+        self._entries = {"appliances": dict(), "device_groups": dict()}       # Content of the cache file (see get_appliance / get_device_group for the entries format)
+        self._lock = Lock()                     # Lock protecting the entries (appliances are polled concurrently)
+        self.hits = 0                           # Number of entries used from the cache during the current run
+        self.updates = 0                        # Number of entries collected and written during the current run
+
+    def load(self):
+        """
+        Loads the cache file (if it exists). Entries older than the TTL are dropped
+
+        :return:
+        """
+
+        if os.path.exists(file_path := os.path.join(self._cache_folder, HITCOUNT_CACHE_FILE)):
+            with open(file_path) as f:
+                entries = json.load(f)
+            min_collected_at = time.time() - self._ttl
+            for entries_type in self._entries:
+                self._entries[entries_type] = {
+                    k: v for k, v in entries.get(entries_type, dict()).items() if v["collected_at"] >= min_collected_at
+                }
+
+    def get_entry(self, entries_type: str, name: str, rulebases: [str]):
+        with self._lock:
+            entry = self._entries[entries_type].get(name)
+            if self._force_refresh or not entry or not all(
+                    set(rulebases) <= set(x) for x in (entry["vsys"].values() if entries_type == "appliances" else [entry["rulebases"]])):
+                return None
+            self.hits += 1
+            return entry
+
+    def get_appliance(self, ip_address: str, vsys_list: [str], rulebases: [str]):
+        """
+        Returns the cached PAN-OS version and hitcounts of an appliance
+
+        :param ip_address: (str) The appliance IP address
+        :param vsys_list: (list) The vsys names whose hitcounts are required (None for single vsys firewalls)
+        :param rulebases: (list) The rulebases names whose hitcounts are required
+        :return: (tuple) The PAN-OS version, and a dict of hitcounts per vsys, then per rulebase name, then per rule name
+            (dict of HITCOUNT_COUNTERS values). None if the appliance hitcounts are not cached (or cannot be used)
+        """
+
+        entry = self.get_entry("appliances", ip_address, rulebases)
+        if entry is None or not all((x or "vsys1") in entry["vsys"] for x in vsys_list):
+            return None
+        return entry["version"], {x: entry["vsys"][x or "vsys1"] for x in vsys_list}
+
+    def put_appliance(self, ip_address: str, version: str, hitcounts: dict):
+        """
+        Adds the collected PAN-OS version and hitcounts of an appliance to the cache
+
+        :param ip_address: (str) The appliance IP address
+        :param version: (str) The PAN-OS version of the appliance
+        :param hitcounts: (dict) Dict of hitcounts per vsys, then per rulebase name, then per rule name (dict of counters)
+        :return:
+        """
+
+        with self._lock:
+            self._entries["appliances"][ip_address] = {
+                "collected_at": time.time(),
+                "version": version,
+                "vsys": {vsys or "vsys1": rulebases for vsys, rulebases in hitcounts.items()},
+            }
+            self.updates += 1
+
+    def get_device_group(self, location_name: str, rulebases: [str]):
+        """
+        Returns the cached hitcounts aggregated by Panorama for a device-group
+
+        :param location_name: (str) The device-group name
+        :param rulebases: (list) The rulebases names whose hitcounts are required
+        :return: (dict) Dict of hitcounts per rulebase name, then per rule name (dict of HITCOUNT_COUNTERS values).
+            None if the device-group hitcounts are not cached (or cannot be used)
+        """
+
+        entry = self.get_entry("device_groups", location_name, rulebases)
+        return entry["rulebases"] if entry is not None else None
+
+    def put_device_group(self, location_name: str, hitcounts: dict):
+        """
+        Adds the hitcounts aggregated by Panorama for a device-group to the cache
+
+        :param location_name: (str) The device-group name
+        :param hitcounts: (dict) Dict of hitcounts per rulebase name, then per rule name (dict of counters)
+        :return:
+        """
+
+        with self._lock:
+            self._entries["device_groups"][location_name] = {"collected_at": time.time(), "rulebases": hitcounts}
+            self.updates += 1
+
+    def save(self):
+        """
+        Writes the cache file (only if hitcounts have been collected during the current run)
+
+        :return:
+        """
+
+        if not self.updates:
+            return
+        os.makedirs(self._cache_folder, exist_ok=True)
+        with self._lock:
+            with open(os.path.join(self._cache_folder, HITCOUNT_CACHE_FILE), "w") as f:
+                json.dump(self._entries, f)
@@ -0,0 +1,782 @@
+"""
+Mock Panorama XML API server for PaloCleaner
+
+Local HTTPS server implementing the subset of the Panorama (and firewalls) XML API used by PaloCleaner, so that the
+whole processing (download, analysis, and cleaning with --apply-cleaning) can be run and timed without a real Panorama :
+- type=keygen
+- type=config, action get / show / set / edit / delete (including xpaths unions)
+- type=op : "show system info", "show dg-hierarchy", "show devices all|connected", "show rule-hit-count"
+- type=log (configuration logs, generated for each write request)
+
+The served configuration is either a Panorama configuration export (--config-file), or a synthetic configuration
+generated from the provided sizes. Every write request is recorded (--journal), and the resulting configuration can be
+saved when the server is stopped (--save-config).
+
+Managed firewalls (devices attached to the device-groups) are served by the same server, each of them on its own
+loopback address (127.0.0.2, 127.0.0.3...). As PaloCleaner connects to firewalls on the default HTTPS port, hitcounts
+can only be collected from them if the server listens on port 443 (otherwise use --hitcounts-source panorama).
+
+Example :
+    python MockPanorama.py --synthetic --device-groups 20 --objects 2000 --rules 200 --port 8443 --journal writes.jsonl
+    python main.py --panorama-url 127.0.0.1:8443 --api-user admin --api-password admin --apply-cleaning
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import signal
+import ssl
+import subprocess
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from copy import deepcopy
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import RLock
+from urllib.parse import parse_qs, urlsplit
+from ConfigSnapshot import ConfigSnapshot, PANORAMA_DEVICE_ENTRY
+
+API_KEY = "palocleaner-mock-api-key"
+PANORAMA_VERSION = "10.2.0"
+FIREWALL_VERSION = "10.1.0"
+CONTENT_VERSION = "8700-8000"
+# predefined services served when the configuration does not contain a <predefined> section
+PREDEFINED_SERVICES = """
+<service>
+  <entry name="service-http"><protocol><tcp><port>80,8080</port></tcp></protocol></entry>
+  <entry name="service-https"><protocol><tcp><port>443</port></tcp></protocol></entry>
+</service>
+"""
+# rulebase XML tag of each rule type, as used by the "show rule-hit-count" command (hit count style)
+RULE_STYLES = ["security", "nat", "authentication", "pbf", "decryption", "application-override"]
+
+
+def split_xpath(xpath: str) -> [str]:
+    """
+    Splits an xpath on the provided separator characters which are not part of a predicate
+
+    :param xpath: (str) The xpath (ie : "/config/devices/entry[@name='localhost.localdomain']/device-group")
+    :return: (list) List of xpath steps (ie : ["config", "devices", "entry[@name='localhost.localdomain']", "device-group"])
+    """
+
+    steps, current, depth, quote = list(), "", 0, None
+    for char in xpath.strip("/"):
+        if quote:
+            quote = None if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif char == "/" and not depth:
+            steps.append(current)
+            current = ""
+            continue
+        current += char
+    steps.append(current)
+    return steps
+
+
+def split_union(xpath: str) -> [str]:
+    """
+    Splits an xpaths union ("xpath1|xpath2") into the list of xpaths
+
+    :param xpath: (str) The xpaths union
+    :return: (list) List of xpaths
+    """
+
+    xpaths, current, depth, quote = list(), "", 0, None
+    for char in xpath:
+        if quote:
+            quote = None if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif char == "|" and not depth:
+            xpaths.append(current)
+            current = ""
+            continue
+        current += char
+    xpaths.append(current)
+    return xpaths
+
+
+def parse_step(step: str) -> (str, str):
+    """
+    Parses an xpath step
+
+    :param step: (str) The xpath step (ie : "entry[@name='dg1']")
+    :return: (tuple) The tag, and the value of the name attribute predicate (or None)
+    """
+
+    if (match := re.match(r"^([^\[]+)\[@name=(['\"])(.*)\2\]$", step)):
+        return match.group(1), match.group(3)
+    return step, None
+
+
+def step_path(steps: [str]) -> str:
+    """
+    Converts xpath steps (after the /config root) to an ElementTree path relative to the <config> element
+
+    :param steps: (list) List of xpath steps
+    :return: (str) The ElementTree path
+    """
+
+    path = list()
+    for step in steps:
+        tag, name = parse_step(step)
+        if name is None:
+            path.append(tag)
+        else:
+            quote = "'" if "'" not in name else '"'
+            path.append(f"{tag}[@name={quote}{name}{quote}]")
+    return "./" + "/".join(path) if path else "."
+
+
+def hitcount_values(rule_name: str, device: str, reference_time: int) -> dict:
+    """
+    Returns deterministic hitcount values for a rule on a device (some rules are never hit)
+
+    :param rule_name: (str) The rule name
+    :param device: (str) The device identifier (serial/vsys)
+    :param reference_time: (int) Timestamp from which the timestamps are generated
+    :return: (dict) Dict of hitcount fields (XML tag: value)
+    """
+
+    seed = int(hashlib.md5(f"{rule_name}/{device}".encode()).hexdigest()[:12], 16)
+    never_hit = seed % 4 == 0
+    modification = reference_time - (seed >> 8) % (800 * 86400)
+    last_hit = 0 if never_hit else max(modification, reference_time - (seed >> 16) % (400 * 86400))
+    return {
+        "latest": "yes",
+        "hit-count": 0 if never_hit else seed % 100000,
+        "last-hit-timestamp": last_hit,
+        "last-reset-timestamp": 0,
+        "first-hit-timestamp": 0 if never_hit else modification,
+        "rule-creation-timestamp": modification,
+        "rule-modification-timestamp": modification,
+    }
+
+
+def generate_config(nb_device_groups: int, nb_objects: int, nb_rules: int, nb_firewalls: int, seed: int = 0) -> ET.Element:
+    """
+    Generates a synthetic Panorama configuration, with duplicated objects across the device-groups hierarchy
+
+    Device-groups are organized as a tree (each device-group has up to 3 children). Each location (shared and
+    device-groups) has nb_objects address objects (whose values are drawn from a common pool, creating duplicates),
+    address groups, tags, services and service groups. Each device-group has nb_rules pre-rulebase security rules
+    (plus post-rulebase security rules and NAT rules) using the objects visible at its level. nb_firewalls firewalls are
+    attached to each leaf device-group (one of them being a multi-vsys firewall shared with the next leaf device-group)
+
+    :param nb_device_groups: (int) Number of device-groups
+    :param nb_objects: (int) Number of address objects per location
+    :param nb_rules: (int) Number of pre-rulebase security rules per device-group
+    :param nb_firewalls: (int) Number of firewalls per leaf device-group
+    :param seed: (int) Seed of the random generator
+    :return: (xml.etree.ElementTree.Element) The <config> element
+    """
+
+    rng = random.Random(seed)
+    config = ET.Element("config")
+    shared = ET.SubElement(config, "shared")
+    panorama_entry = ET.SubElement(ET.SubElement(config, "devices"), "entry", name=PANORAMA_DEVICE_ENTRY)
+    dg_root = ET.SubElement(panorama_entry, "device-group")
+    readonly_dg_root = ET.SubElement(ET.SubElement(ET.SubElement(ET.SubElement(config, "readonly"), "devices"), "entry", name=PANORAMA_DEVICE_ENTRY), "device-group")
+
+    parents = {f"dg{i}": f"dg{(i - 1) // 3}" if i else None for i in range(nb_device_groups)}
+    visible_objects = {"shared": {"address": [], "service": [], "tag": []}}
+
+    def add_objects(location_name, location_root, parent_name):
+        objects = {x: list(visible_objects[parent_name][x]) if parent_name else list() for x in ["address", "service", "tag"]}
+        tag_root = ET.SubElement(location_root, "tag")
+        tags = [f"{location_name}-tag-{i}" for i in range(3)]
+        for tag_name in tags:
+            ET.SubElement(ET.SubElement(tag_root, "entry", name=tag_name), "color").text = "color1"
+        objects["tag"] += tags
+
+        address_root = ET.SubElement(location_root, "address")
+        addresses = list()
+        for i in range(nb_objects):
+            value_id = rng.randrange(nb_objects)
+            entry = ET.SubElement(address_root, "entry", name=f"{location_name}-host-{i}")
+            if value_id % 10 == 0:
+                ET.SubElement(entry, "ip-netmask").text = f"10.{value_id // 256 % 256}.{value_id % 256}.0/24"
+            else:
+                ET.SubElement(entry, "ip-netmask").text = f"10.{value_id // 65536 % 256}.{value_id // 256 % 256}.{value_id % 256}"
+            if i % 7 == 0:
+                ET.SubElement(ET.SubElement(entry, "tag"), "member").text = rng.choice(tags)
+            addresses.append(entry.get("name"))
+        group_root = ET.SubElement(location_root, "address-group")
+        for i in range(nb_objects // 10):
+            static = ET.SubElement(ET.SubElement(group_root, "entry", name=f"{location_name}-group-{i}"), "static")
+            for member in rng.sample(addresses, min(len(addresses), rng.randint(2, 5))):
+                ET.SubElement(static, "member").text = member
+            addresses.append(f"{location_name}-group-{i}")
+        objects["address"] += addresses
+
+        service_root = ET.SubElement(location_root, "service")
+        services = list()
+        for i in range(max(1, nb_objects // 10)):
+            entry = ET.SubElement(service_root, "entry", name=f"{location_name}-svc-{i}")
+            protocol = ET.SubElement(ET.SubElement(entry, "protocol"), rng.choice(["tcp", "udp"]))
+            ET.SubElement(protocol, "port").text = str(rng.choice(range(1000, 1200)))
+            services.append(entry.get("name"))
+        service_group_root = ET.SubElement(location_root, "service-group")
+        for i in range(nb_objects // 50):
+            members = ET.SubElement(ET.SubElement(service_group_root, "entry", name=f"{location_name}-svcgroup-{i}"), "members")
+            for member in rng.sample(services, min(len(services), 2)):
+                ET.SubElement(members, "member").text = member
+        objects["service"] += services
+        visible_objects[location_name] = objects
+
+    def add_rules(location_name, location_root):
+        objects = visible_objects[location_name]
+        for rulebase, rule_type, count in [("pre-rulebase", "security", nb_rules), ("post-rulebase", "security", nb_rules // 5),
+                                           ("pre-rulebase", "nat", nb_rules // 10)]:
+            if (rulebase_root := location_root.find(rulebase)) is None:
+                rulebase_root = ET.SubElement(location_root, rulebase)
+            rules_root = ET.SubElement(ET.SubElement(rulebase_root, rule_type), "rules")
+            for i in range(count):
+                rule = ET.SubElement(rules_root, "entry", name=f"{location_name}-{rulebase[:-9]}-{rule_type}-{i}")
+                for field in ["from", "to"]:
+                    ET.SubElement(ET.SubElement(rule, field), "member").text = "any"
+                for field in ["source", "destination"]:
+                    field_root = ET.SubElement(rule, field)
+                    for member in rng.sample(objects["address"], min(len(objects["address"]), rng.randint(1, 3))):
+                        ET.SubElement(field_root, "member").text = member
+                if rule_type == "security":
+                    ET.SubElement(ET.SubElement(rule, "application"), "member").text = "any"
+                    ET.SubElement(ET.SubElement(rule, "service"), "member").text = \
+                        rng.choice(objects["service"]) if i % 3 else "application-default"
+                    ET.SubElement(rule, "action").text = "allow"
+                else:
+                    ET.SubElement(rule, "service").text = "any"
+                if i % 5 == 0:
+                    ET.SubElement(ET.SubElement(rule, "tag"), "member").text = rng.choice(objects["tag"])
+
+    add_objects("shared", shared, None)
+    add_rules("shared", shared)
+
+    leaf_dgs = [x for x in parents if x not in parents.values()]
+    firewall_id = 0
+    multi_vsys = None
+    for dg_name, parent_name in parents.items():
+        dg = ET.SubElement(dg_root, "entry", name=dg_name)
+        add_objects(dg_name, dg, parent_name or "shared")
+        add_rules(dg_name, dg)
+        readonly_dg = ET.SubElement(readonly_dg_root, "entry", name=dg_name)
+        if parent_name:
+            ET.SubElement(readonly_dg, "parent-dg").text = parent_name
+        if dg_name in leaf_dgs and nb_firewalls:
+            devices = ET.SubElement(dg, "devices")
+            for i in range(nb_firewalls):
+                if i == 0 and multi_vsys:
+                    # vsys2 of the multi-vsys firewall of the previous leaf device-group
+                    ET.SubElement(ET.SubElement(ET.SubElement(devices, "entry", name=multi_vsys), "vsys"), "entry", name="vsys2")
+                    multi_vsys = None
+                    continue
+                serial = f"0079{firewall_id:08d}"
+                firewall_id += 1
+                entry = ET.SubElement(devices, "entry", name=serial)
+                if i == 0 and nb_firewalls > 1:
+                    ET.SubElement(ET.SubElement(entry, "vsys"), "entry", name="vsys1")
+                    multi_vsys = serial
+    return config
+
+
+class MockPanorama:
+    """Configuration and state of the mock Panorama and of its managed firewalls"""
+
+    def __init__(self, config_root: ET.Element, journal_path: str = None, latency: float = 0):
+        """
+        MockPanorama class initialization function
+
+        :param config_root: (xml.etree.ElementTree.Element) The <config> element served by the mock
+        :param journal_path: (str) Path of the file where write requests are recorded (JSON lines), if any
+        :param latency: (float) Delay (in seconds) added to each request, to simulate a remote Panorama
+        """
+
+        self._config = config_root                  # The <config> element served (and modified by write requests)
+        self._lock = RLock()                        # Lock protecting the configuration and the recorded writes
+        self._journal_path = journal_path           # Path of the file where write requests are recorded (JSON lines)
+        self._latency = latency                     # Delay (in seconds) added to each request
+        self._reference_time = int(time.time())     # Timestamp from which hitcounts timestamps are generated
+        self._config_logs = list()                  # Configuration logs generated by write requests (most recent last)
+        self._log_jobs = dict()                     # Results of the type=log jobs. Key is the job id, value is the list of logs
+        self.writes = list()                        # Write requests received (dicts with action, xpath and element)
+        self.counters = Counter()                   # Number of requests received per type / action / command
+        self.firewalls = dict()                     # Managed firewalls. Key is the serial number, value is a dict (ip, vsys: {vsys: device-group})
+        self.hierarchy = ConfigSnapshot(config_root).get_dg_hierarchy()
+        if config_root.find("./predefined/service") is None:
+            self.ensure_path(["predefined"]).append(ET.fromstring(PREDEFINED_SERVICES))
+        self.init_firewalls()
+
+    def init_firewalls(self):
+        """
+        Finds the firewalls attached to the device-groups, and assigns each of them a loopback address
+
+        :return:
+        """
+
+        for dg in self._config.findall(f"./devices/entry[@name='{PANORAMA_DEVICE_ENTRY}']/device-group/entry"):
+            for device in dg.findall("./devices/entry"):
+                firewall = self.firewalls.setdefault(device.get("name"), {"vsys": dict()})
+                for vsys in device.findall("./vsys/entry") or [ET.Element("entry", name="vsys1")]:
+                    firewall["vsys"][vsys.get("name")] = dg.get("name")
+        for i, firewall in enumerate(self.firewalls.values(), start=2):
+            firewall["ip"] = f"127.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"
+
+    def get_firewall_by_ip(self, ip_address: str):
+        for serial, firewall in self.firewalls.items():
+            if firewall["ip"] == ip_address:
+                return serial
+        return None
+
+    def handle(self, query: dict, local_address: str) -> (int, str):
+        """
+        Handles an XML API request
+
+        :param query: (dict) The request parameters
+        :param local_address: (str) The local IP address on which the request has been received (identifies the firewall)
+        :return: (tuple) The HTTP status code, and the XML response
+        """
+
+        if self._latency:
+            time.sleep(self._latency)
+        request_type = query.get("type")
+        serial = self.get_firewall_by_ip(local_address)
+        self.counters[f"{'firewall' if serial else 'panorama'} {request_type} {query.get('action', '')}".strip()] += 1
+
+        if request_type == "keygen":
+            return 200, f'<response status="success"><result><key>{API_KEY}</key></result></response>'
+        if query.get("key") != API_KEY:
+            return 403, '<response status="error" code="403"><result><msg>Invalid Credential</msg></result></response>'
+        try:
+            if request_type == "config":
+                return 200, self.handle_config(query.get("action"), query.get("xpath", ""), query.get("element"))
+            if request_type == "op":
+                return 200, self.handle_op(ET.fromstring(query.get("cmd", "")), serial)
+            if request_type == "log":
+                return 200, self.handle_log(query)
+        except (ET.ParseError, ValueError, SyntaxError) as e:
+            # (xpath predicates which are not supported by ElementTree raise a SyntaxError)
+            return 200, f'<response status="error" code="18"><msg><line>{e}</line></msg></response>'
+        return 200, f'<response status="error" code="12"><msg><line>Unsupported request type {request_type}</line></msg></response>'
+
+    def handle_config(self, action: str, xpath: str, element: str) -> str:
+        """
+        Handles a type=config request
+
+        :param action: (str) The config action (get, show, set, edit, delete)
+        :param xpath: (str) The xpath (or xpaths union for get / show)
+        :param element: (str) The XML element (for set / edit)
+        :return: (str) The XML response
+        """
+
+        with self._lock:
+            if action in ("get", "show"):
+                result = ET.Element("result")
+                for single_xpath in split_union(xpath):
+                    name_only = single_xpath.endswith("/@name")
+                    steps = split_xpath(single_xpath[:-len("/@name")] if name_only else single_xpath)
+                    if steps[0] != "config":
+                        continue
+                    for found in self._config.findall(step_path(steps[1:])):
+                        result.append(ET.Element(found.tag, name=found.get("name")) if name_only else found)
+                result.set("total-count", str(len(result)))
+                result.set("count", str(len(result)))
+                code = "19" if len(result) else "7"
+                return f'<response status="success" code="{code}">{ET.tostring(result, encoding="unicode")}</response>'
+
+            steps = split_xpath(xpath)
+            if steps[0] != "config" or action not in ("set", "edit", "delete"):
+                return f'<response status="error" code="12"><msg><line>Unsupported config action {action}</line></msg></response>'
+            if action == "set":
+                node = self.ensure_path(steps[1:])
+                for child in ET.fromstring(f"<root>{element}</root>"):
+                    self.merge(node, child)
+            elif action == "edit":
+                parent = self.ensure_path(steps[1:-1])
+                new_element = ET.fromstring(element)
+                existing = parent.find(step_path(steps[-1:]))
+                if existing is not None:
+                    parent.insert(list(parent).index(existing), new_element)
+                    parent.remove(existing)
+                else:
+                    parent.append(new_element)
+            else:
+                parent = self._config.find(step_path(steps[1:-1]))
+                found = parent.findall(step_path(steps[-1:])) if parent is not None else list()
+                if not found:
+                    return '<response status="error" code="7"><msg><line>No such node</line></msg></response>'
+                for x in found:
+                    parent.remove(x)
+            self.record_write(action, steps, xpath, element)
+            return '<response status="success" code="20"><msg>command succeeded</msg></response>'
+
+    def ensure_path(self, steps: [str]) -> ET.Element:
+        """
+        Returns the configuration node matching the provided xpath steps, creating the missing nodes
+
+        :param steps: (list) List of xpath steps (after the /config root)
+        :return: (xml.etree.ElementTree.Element) The configuration node
+        """
+
+        node = self._config
+        for step in steps:
+            if (child := node.find(step_path([step]))) is None:
+                tag, name = parse_step(step)
+                child = ET.SubElement(node, tag, name=name) if name is not None else ET.SubElement(node, tag)
+            node = child
+        return node
+
+    def merge(self, node: ET.Element, new: ET.Element):
+        """
+        Merges an element on a configuration node (same behavior than the XML API "set" action)
+
+        :param node: (xml.etree.ElementTree.Element) The configuration node
+        :param new: (xml.etree.ElementTree.Element) The element to merge on the node
+        :return:
+        """
+
+        for existing in node.findall(new.tag):
+            if new.tag == "member" and existing.text == new.text:
+                return
+            if new.tag != "member" and existing.get("name") == new.get("name"):
+                if len(new):
+                    for child in new:
+                        self.merge(existing, child)
+                else:
+                    existing.text = new.text
+                return
+        node.append(deepcopy(new))
+
+    def record_write(self, action: str, steps: [str], xpath: str, element: str):
+        """
+        Records a write request, and generates the associated configuration log
+
+        :param action: (str) The config action
+        :param steps: (list) The xpath steps
+        :param xpath: (str) The xpath
+        :param element: (str) The XML element, if any
+        :return:
+        """
+
+        write = {"time": time.time(), "action": action, "xpath": xpath, "element": element}
+        self.writes.append(write)
+        if self._journal_path:
+            with open(self._journal_path, "a") as f:
+                f.write(json.dumps(write) + "\n")
+
+        # the configuration log path is a space separated list of the configuration nodes (ie : "device-group DG1 address host-1")
+        path = list()
+        for step in steps[1:]:
+            tag, name = parse_step(step)
+            if tag in ("devices", "readonly") or name == PANORAMA_DEVICE_ENTRY:
+                continue
+            path += [name] if tag == "entry" else [tag] + ([name] if name is not None else [])
+        self._config_logs.append({
+            "seqno": len(self._config_logs) + 1,
+            "receive_time": time.strftime("%Y/%m/%d %H:%M:%S"),
+            "cmd": action,
+            "admin": "admin",
+            "path": " ".join(path),
+        })
+
+    def handle_op(self, cmd: ET.Element, serial: str) -> str:
+        """
+        Handles a type=op request, for Panorama or for a firewall
+
+        :param cmd: (xml.etree.ElementTree.Element) The XML command
+        :param serial: (str) The serial number of the firewall to which the request is sent (None for Panorama)
+        :return: (str) The XML response
+        """
+
+        words = list()
+        node = cmd
+        while node is not None:
+            words.append(node.tag)
+            node = node[0] if len(node) and node.tag != "rule-hit-count" else None
+        if words[:3] == ["show", "system", "info"]:
+            result = self.get_system_info(serial)
+        elif words[:2] == ["show", "dg-hierarchy"] and not serial:
+            result = self.get_dg_hierarchy()
+        elif words[:2] == ["show", "devices"] and not serial:
+            result = self.get_devices()
+        elif words[:2] == ["show", "rule-hit-count"]:
+            result = self.get_rule_hit_count(cmd.find("rule-hit-count"), serial)
+        else:
+            return f'<response status="error" code="17"><msg><line>Unsupported command {" ".join(words)}</line></msg></response>'
+        return f'<response status="success">{ET.tostring(result, encoding="unicode")}</response>'
+
+    def get_system_info(self, serial: str) -> ET.Element:
+        result = ET.Element("result")
+        system = ET.SubElement(result, "system")
+        values = {
+            "hostname": serial or "mock-panorama",
+            "ip-address": self.firewalls[serial]["ip"] if serial else "127.0.0.1",
+            "model": "PA-VM" if serial else "Panorama",
+            "serial": serial or "0000MOCKPANO",
+            "sw-version": FIREWALL_VERSION if serial else PANORAMA_VERSION,
+            "app-version": CONTENT_VERSION,
+            "multi-vsys": ("on" if len(self.firewalls[serial]["vsys"]) > 1 else "off") if serial else "off",
+        }
+        for tag, value in values.items():
+            ET.SubElement(system, tag).text = value
+        return result
+
+    def get_dg_hierarchy(self) -> ET.Element:
+        result = ET.Element("result")
+        nodes = {None: ET.SubElement(result, "dg-hierarchy")}
+        remaining = dict(self.hierarchy)
+        while remaining:
+            for dg_name, parent_name in list(remaining.items()):
+                if parent_name in nodes:
+                    nodes[dg_name] = ET.SubElement(nodes[parent_name], "dg", name=dg_name)
+                    del remaining[dg_name]
+        return result
+
+    def get_devices(self) -> ET.Element:
+        result = ET.Element("result")
+        devices = ET.SubElement(result, "devices")
+        for serial, firewall in self.firewalls.items():
+            entry = ET.SubElement(devices, "entry", name=serial)
+            for tag, value in {"serial": serial, "connected": "yes", "hostname": serial, "ip-address": firewall["ip"],
+                               "model": "PA-VM", "sw-version": FIREWALL_VERSION,
+                               "multi-vsys": "yes" if len(firewall["vsys"]) > 1 else "no"}.items():
+                ET.SubElement(entry, tag).text = value
+            vsys_root = ET.SubElement(entry, "vsys")
+            for vsys in firewall["vsys"]:
+                ET.SubElement(ET.SubElement(vsys_root, "entry", name=vsys), "display-name").text = vsys
+        return result
+
+    def get_location_chain(self, dg_name: str) -> [str]:
+        chain = list()
+        while dg_name:
+            chain.insert(0, dg_name)
+            dg_name = self.hierarchy.get(dg_name)
+        return ["shared"] + chain
+
+    def get_location_root(self, location_name: str) -> ET.Element:
+        if location_name == "shared":
+            return self._config.find("./shared")
+        return self._config.find(f"./devices/entry[@name='{PANORAMA_DEVICE_ENTRY}']/device-group/entry[@name='{location_name}']")
+
+    def get_rules(self, location_name: str, rulebase: str, style: str) -> [str]:
+        location_root = self.get_location_root(location_name)
+        if location_root is None:
+            return list()
+        return [x.get("name") for x in location_root.findall(f"./{rulebase}/{style}/rules/entry")]
+
+    def get_rule_hit_count(self, cmd: ET.Element, serial: str) -> ET.Element:
+        """
+        Builds the response of a "show rule-hit-count" command
+        - sent to a firewall (vsys) : rules pushed by Panorama on the device-group of the vsys and its parents
+        - sent to Panorama (device-group) : rules of the device-group rulebase, with the counters of each member device
+
+        :param cmd: (xml.etree.ElementTree.Element) The <rule-hit-count> element of the command
+        :param serial: (str) The serial number of the firewall to which the request is sent (None for Panorama)
+        :return: (xml.etree.ElementTree.Element) The <result> element
+        """
+
+        result = ET.Element("result")
+        response_root = ET.SubElement(result, "rule-hit-count")
+
+        def add_counters(parent, values):
+            for tag, value in values.items():
+                ET.SubElement(parent, tag).text = str(value)
+
+        with self._lock:
+            if serial:
+                vsys_entry = cmd.find("./vsys/vsys-name/entry")
+                style = vsys_entry.find("./rule-base/entry").get("name")
+                vsys_name = vsys_entry.get("name")
+                dg_name = self.firewalls[serial]["vsys"].get(vsys_name)
+                rules_root = ET.SubElement(ET.SubElement(ET.SubElement(ET.SubElement(
+                    ET.SubElement(response_root, "vsys"), "entry", name=vsys_name), "rule-base"), "entry", name=style), "rules")
+                for location_name in self.get_location_chain(dg_name) if dg_name else list():
+                    for rulebase in ["pre-rulebase", "post-rulebase"]:
+                        for rule_name in self.get_rules(location_name, rulebase, style):
+                            add_counters(ET.SubElement(rules_root, "entry", name=rule_name),
+                                         hitcount_values(rule_name, f"{serial}/{vsys_name}", self._reference_time))
+                return result
+
+            dg_entry = cmd.find("./device-group/entry")
+            if dg_entry is None:
+                return result
+            dg_name = dg_entry.get("name")
+            rulebase = dg_entry[0].tag
+            style = dg_entry[0].find("./entry").get("name")
+            rules_root = ET.SubElement(ET.SubElement(ET.SubElement(ET.SubElement(
+                ET.SubElement(response_root, "device-group"), "entry", name=dg_name), "rule-base"), "entry", name=style), "rules")
+            # member devices of the device-group and of its children
+            members = [f"{serial}/{vsys}" for serial, firewall in self.firewalls.items()
+                       for vsys, vsys_dg in firewall["vsys"].items() if dg_name in self.get_location_chain(vsys_dg)]
+            for rule_name in self.get_rules(dg_name, rulebase, style):
+                rule_entry = ET.SubElement(rules_root, "entry", name=rule_name)
+                devices_values = [hitcount_values(rule_name, x, self._reference_time) for x in members]
+                add_counters(rule_entry, {
+                    "latest": "yes",
+                    "hit-count": sum(x["hit-count"] for x in devices_values),
+                    "last-hit-timestamp": max([x["last-hit-timestamp"] for x in devices_values], default=0),
+                    "rule-modification-timestamp": hitcount_values(rule_name, "panorama", self._reference_time)["rule-modification-timestamp"],
+                })
+                device_vsys = ET.SubElement(rule_entry, "device-vsys")
+                for member, values in zip(members, devices_values):
+                    add_counters(ET.SubElement(device_vsys, "entry", name=member), values)
+        return result
+
+    def handle_log(self, query: dict) -> str:
+        """
+        Handles a type=log request (configuration logs only). The log job is immediately finished
+
+        :param query: (dict) The request parameters
+        :return: (str) The XML response
+        """
+
+        with self._lock:
+            if query.get("action") == "get":
+                logs = self._log_jobs.get(query.get("job-id"), list())
+                result = ET.Element("result")
+                ET.SubElement(ET.SubElement(result, "job"), "status").text = "FIN"
+                logs_root = ET.SubElement(ET.SubElement(result, "log"), "logs", count=str(len(logs)), progress="100")
+                for log in logs:
+                    entry = ET.SubElement(logs_root, "entry", logid=str(log["seqno"]))
+                    for tag, value in log.items():
+                        ET.SubElement(entry, tag).text = str(value)
+                return f'<response status="success">{ET.tostring(result, encoding="unicode")}</response>'
+
+            if query.get("log-type") != "config":
+                return '<response status="error" code="12"><msg><line>Only configuration logs are supported</line></msg></response>'
+            logs = list(reversed(self._config_logs))
+            if (match := re.search(r"receive_time geq '([^']+)'", query.get("query", ""))):
+                logs = [x for x in logs if x["receive_time"] >= match.group(1)]
+            job_id = str(len(self._log_jobs) + 1)
+            self._log_jobs[job_id] = logs[:int(query.get("nlogs", 20))]
+            return f'<response status="success"><result><job>{job_id}</job></result></response>'
+
+    def save(self, file_path: str):
+        with self._lock:
+            ET.ElementTree(self._config).write(file_path)
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """HTTP request handler of the mock server (XML API requests on /api/, with GET or POST parameters)"""
+
+    protocol_version = "HTTP/1.1"
+    mock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_api(urlsplit(self.path).query)
+
+    def do_POST(self):
+        self.handle_api(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+
+    def handle_api(self, data: str):
+        query = {k: v[0] for k, v in parse_qs(data, keep_blank_values=True).items()}
+        status, response = self.mock.handle(query, self.connection.getsockname()[0])
+        body = response.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def get_ssl_context(certfile: str, keyfile: str) -> ssl.SSLContext:
+    """
+    Returns the server SSL context, using the provided certificate, or a self-signed certificate generated with openssl
+
+    :param certfile: (str) Path to the certificate file (None to generate one)
+    :param keyfile: (str) Path to the private key file (None to generate one)
+    :return: (ssl.SSLContext) The SSL context
+    """
+
+    if not certfile:
+        folder = tempfile.mkdtemp(prefix="mock-panorama-")
+        certfile, keyfile = os.path.join(folder, "cert.pem"), os.path.join(folder, "key.pem")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "7", "-subj", "/CN=mock-panorama",
+                        "-keyout", keyfile, "-out", certfile], check=True, capture_output=True)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    return context
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Panorama XML API server for PaloCleaner benchmarks and tests")
+    parser.add_argument("--config-file", type=str, action="store", default=None,
+                        help="Panorama configuration export to be served")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Serve a synthetic configuration generated with the sizes below")
+    parser.add_argument("--device-groups", type=int, action="store", default=10,
+                        help="Number of device-groups of the synthetic configuration")
+    parser.add_argument("--objects", type=int, action="store", default=500,
+                        help="Number of address objects per location of the synthetic configuration")
+    parser.add_argument("--rules", type=int, action="store", default=100,
+                        help="Number of security rules per device-group of the synthetic configuration")
+    parser.add_argument("--firewalls", type=int, action="store", default=2,
+                        help="Number of firewalls attached to each leaf device-group of the synthetic configuration")
+    parser.add_argument("--seed", type=int, action="store", default=0,
+                        help="Seed used to generate the synthetic configuration")
+    parser.add_argument("--listen", type=str, action="store", default="0.0.0.0",
+                        help="Address on which the server listens")
+    parser.add_argument("--port", type=int, action="store", default=443,
+                        help="Port on which the server listens (firewalls hitcounts can only be collected on port 443)")
+    parser.add_argument("--certfile", type=str, action="store", default=None,
+                        help="Server certificate (a self-signed certificate is generated with openssl if not provided)")
+    parser.add_argument("--keyfile", type=str, action="store", default=None,
+                        help="Server certificate private key")
+    parser.add_argument("--latency", type=float, action="store", default=0,
+                        help="Delay (in milliseconds) added to each request, to simulate a remote Panorama")
+    parser.add_argument("--journal", type=str, action="store", default=None,
+                        help="File where each write request is recorded (JSON lines)")
+    parser.add_argument("--save-config", type=str, action="store", default=None,
+                        help="File where the resulting configuration is saved when the server is stopped")
+    args = parser.parse_args()
+
+    if bool(args.config_file) == args.synthetic:
+        print("\n ERROR - exactly one of --config-file and --synthetic must be provided \n")
+        exit(0)
+
+    if args.config_file:
+        config_root = ConfigSnapshot.from_file(args.config_file)._config_root
+    else:
+        config_root = generate_config(args.device_groups, args.objects, args.rules, args.firewalls, args.seed)
+
+    mock = MockPanorama(config_root, args.journal, args.latency / 1000)
+    MockRequestHandler.mock = mock
+    server = ThreadingHTTPServer((args.listen, args.port), MockRequestHandler)
+    server.daemon_threads = True
+    server.socket = get_ssl_context(args.certfile, args.keyfile).wrap_socket(server.socket, server_side=True)
+
+    print(f"Mock Panorama listening on {args.listen}:{args.port} ({len(mock.hierarchy)} device-groups, {len(mock.firewalls)} firewalls)")
+    print(f"API key : {API_KEY} (any username / password is accepted)")
+    # SIGTERM (ie : server started in background) stops the server the same way than Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n{sum(mock.counters.values())} requests received, {len(mock.writes)} writes recorded")
+        for request, count in sorted(mock.counters.items()):
+            print(f"  {request} : {count}")
+        if args.save_config:
+            mock.save(args.save_config)
+            print(f"Configuration saved to {args.save_config}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Object records module for PaloCleaner
+
+The objects (AddressObject, ServiceObject...) and rules (SecurityRule, NatRule...) used by the analysis are built from
+their XML configuration entries as compact records : instances of a __slots__ subclass of their pan-os-python class,
+holding only the name, the parameters values and the parent of the object. Records have no instance __dict__,
+children list, parameters or XPath machinery, which makes them 10 to 50 times smaller than pan-os-python objects (and
+avoids the initialization of the parameters machinery, which is the most expensive part of a refreshall() on large
+configurations).
+As records are instances of their pan-os-python class (with the same class name), the analysis uses them like any
+other object. The pan-os-python parameters machinery is only built on a record ("materialized") when it is used for an
+API call (apply, create, delete...), the values stored on the record being copied to the parameters.
+The XML entry of a record is kept only if some parameters of its class cannot be parsed directly from the XML (see
+get_fields_spec). They are parsed from the XML entry at materialization, which happens the first time one of them is
+read.
+"""
+
+from threading import Lock
+from panos.base import ParentAwareXpath, VersionedStubs
+from panos.objects import AddressObject, AddressGroup, Tag, ServiceObject, ServiceGroup
+from panos.policies import SecurityRule, NatRule, AuthenticationRule, PolicyBasedForwarding, DecryptionRule, ApplicationOverride
+
+# pan-os-python classes which are built as records
+RECORD_CLASSES = [
+    AddressObject, AddressGroup, Tag, ServiceObject, ServiceGroup,
+    SecurityRule, NatRule, AuthenticationRule, PolicyBasedForwarding, DecryptionRule, ApplicationOverride
+]
+
+# attributes set by VersionedPanObject.__init__ / _setups(), which are only available on materialized records
+MATERIALIZED_ATTRIBUTES = {"_params", "_xpaths", "_stubs"}
+
+# cache of the fields which can be parsed directly from the XML, per (class, PAN-OS version)
+_fields_specs = dict()
+# cache of the parameters names of each class
+_params_names = dict()
+# cache of the record class of each pan-os-python class (created when first used, see get_record_class)
+_record_classes = dict()
+# lock protecting the materialization of records (records can be used by several threads)
+_materialize_lock = Lock()
+
+
+def get_fields_spec(obj_class, parent) -> dict:
+    """
+    Returns the fields which can be parsed directly from the XML entries of obj_class, for the PAN-OS version of
+    the device on which parent is attached
+    Parameters whose xpath contains variables (ie : "protocol/{protocol}/port") are not parsed, except the
+    AddressObject and ServiceObject ones which are handled by parse_entry()
+
+    :param obj_class: (panos.base.VersionedPanObject) The pan-os-python class
+    :param parent: (panos.base.PanObject) The parent on which the objects will be attached
+    :return: (dict) Dict of parsed fields (name: (path, vartype))
+    """
+
+    class_instance = obj_class()
+    class_instance.parent = parent
+    panos_version = class_instance.retrieve_panos_version()
+
+    if (fields := _fields_specs.get((obj_class, panos_version))) is None:
+        fields = dict()
+        for param in class_instance._params:
+            var_path = param._get_versioned_value(panos_version)
+            if var_path and var_path.path and "{" not in var_path.path:
+                fields[param.name] = (var_path.path, var_path.vartype)
+        _fields_specs[(obj_class, panos_version)] = fields
+    return fields
+
+
+def get_params_names(obj_class) -> set:
+    """
+    Returns the names of the pan-os-python parameters of obj_class
+
+    :param obj_class: (panos.base.VersionedPanObject) The pan-os-python class
+    :return: (set) The parameters names
+    """
+
+    if (names := _params_names.get(obj_class)) is None:
+        names = _params_names[obj_class] = {param.name for param in obj_class()._params}
+    return names
+
+
+def parse_entry(obj_class, entry, fields) -> dict:
+    """
+    Parses the values of the provided fields from an XML entry, with the same result than the pan-os-python parse_xml()
+
+    :param obj_class: (panos.base.VersionedPanObject) The pan-os-python class of the entry
+    :param entry: (xml.etree.ElementTree.Element) The XML <entry> element
+    :param fields: (dict) Dict of fields to parse (name: (path, vartype)), as returned by get_fields_spec()
+    :return: (dict) Dict of parsed values (name: value)
+    """
+
+    values = dict()
+    for name, (path, vartype) in fields.items():
+        if vartype == "attrib":
+            values[name] = entry.get(path)
+            continue
+        if (element := entry.find(path)) is None:
+            values[name] = None
+        elif vartype == "member":
+            values[name] = [x.text for x in element.iterfind("member")]
+        elif vartype == "entry":
+            values[name] = [x.get("name") for x in element.iterfind("entry")]
+        elif vartype == "yesno":
+            values[name] = {"yes": True, "no": False}.get(element.text)
+        elif vartype == "int":
+            values[name] = int(element.text) if element.text else None
+        else:
+            values[name] = element.text
+
+    # the type of AddressObject (and protocol of ServiceObject) is given by the tag name of a child element
+    if obj_class is AddressObject:
+        values["type"] = values["value"] = None
+        for element in entry:
+            if element.tag in ("ip-netmask", "ip-range", "ip-wildcard", "fqdn"):
+                values["type"], values["value"] = element.tag, element.text
+    elif obj_class is ServiceObject:
+        values["protocol"] = values["source_port"] = values["destination_port"] = None
+        if (protocol := entry.find("protocol/*")) is not None:
+            values["protocol"] = protocol.tag
+            values["source_port"] = protocol.findtext("source-port")
+            values["destination_port"] = protocol.findtext("port")
+
+    return values
+
+
+class ObjectRecord:
+    """Methods shared by the record classes (see get_record_class)"""
+
+    __slots__ = ()
+    children = ()           # records never have children
+
+    def __getattr__(self, name):
+        # only called for the attributes which are not set on the record : the parameters machinery, and the
+        # parameters which have not been parsed from the XML entry
+        if name in MATERIALIZED_ATTRIBUTES or name in type(self).PARAMS:
+            materialize(self)
+            return object.__getattribute__(self, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    # the parameters values are stored on the record slots, and not on the pan-os-python parameters
+    __setattr__ = object.__setattr__
+
+    def _build_element_info(self):
+        # used by element(), and thus by all the API calls modifying the object
+        sync_params(self)
+        return super()._build_element_info()
+
+    def _about_object(self):
+        sync_params(self)
+        return super()._about_object()
+
+    def __reduce__(self):
+        # records are pickled (stage artifacts, copy.copy) with their pan-os-python class, as the record class is not
+        # available on this module under its name
+        slots_state = dict()
+        for name in type(self).__slots__:
+            try:
+                slots_state[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        return new_record, (type(self).PANOS_CLASS,), (self.__dict__ or None, slots_state)
+
+
+def get_record_class(obj_class):
+    """
+    Returns the record class of a pan-os-python class, which has the same name than the pan-os-python class and a
+    slot for each of its parameters
+
+    :param obj_class: (panos.base.VersionedPanObject) The pan-os-python class (one of RECORD_CLASSES)
+    :return: (type) The record class
+    """
+
+    if (record_class := _record_classes.get(obj_class)) is None:
+        params = get_params_names(obj_class)
+        record_class = _record_classes[obj_class] = type(obj_class.__name__, (ObjectRecord, obj_class), {
+            "__slots__": (obj_class.NAME, "parent", "_xml", *sorted(params)),
+            "__qualname__": obj_class.__qualname__,
+            "__module__": __name__,
+            "PANOS_CLASS": obj_class,
+            "PARAMS": frozenset(params),
+        })
+    return record_class
+
+
+def new_record(obj_class):
+    record_class = get_record_class(obj_class)
+    return record_class.__new__(record_class)
+
+
+def get_panos_class(obj) -> type:
+    """
+    Returns the pan-os-python class of an object, which is the class of the object itself if it is not a record
+
+    :param obj: (panos.base.PanObject) The object
+    :return: (type) The pan-os-python class of the object
+    """
+
+    return type(obj).PANOS_CLASS if isinstance(obj, ObjectRecord) else type(obj)
+
+
+def build_from_xml(obj_class, xml, parent) -> list:
+    """
+    Builds records of obj_class for each entry of the provided XML element
+    Same result than the pan-os-python refreshall_from_xml() function
+
+    :param obj_class: (panos.base.VersionedPanObject) The pan-os-python class (one of RECORD_CLASSES)
+    :param xml: (xml.etree.ElementTree.Element) The XML element containing the entries (ie : <address>, <rules>)
+    :param parent: (panos.base.PanObject) The parent of the created records
+    :return: (list) List of records
+    """
+
+    if xml is None:
+        return list()
+
+    fields = get_fields_spec(obj_class, parent)
+    unparsed_params = None
+    records = list()
+    for entry in xml.iterfind("entry"):
+        record = new_record(obj_class)
+        values = parse_entry(obj_class, entry, fields)
+        for name, value in values.items():
+            setattr(record, name, value)
+        if unparsed_params is None:
+            unparsed_params = type(record).PARAMS.difference(values)
+        setattr(record, obj_class.NAME, entry.get("name"))
+        record.parent = parent
+        record._xml = entry if unparsed_params else None
+        records.append(record)
+    return records
+
+
+def materialize(record):
+    """
+    Builds the pan-os-python parameters machinery of a record
+    The values of the parameters which have not been parsed (and not set since) are read from the XML entry of the
+    record. The other values stay on the record slots, and are copied to the parameters by sync_params() when used
+
+    :param record: (ObjectRecord) The record to materialize
+    :return:
+    """
+
+    with _materialize_lock:
+        if "_params" in record.__dict__:
+            return
+        record._xpaths = ParentAwareXpath()
+        record._stubs = VersionedStubs()
+        record._setups()
+        for param in record._params:
+            param.value = param.default
+        if record._xml is not None:
+            record.parse_xml(record._xml)
+        for param in record._params:
+            try:
+                object.__getattribute__(record, param.name)
+            except AttributeError:
+                setattr(record, param.name, param.value)
+        record._xml = None
+
+
+def sync_params(record):
+    """
+    Copies the values of a record to its pan-os-python parameters (materializing the record if needed)
+
+    :param record: (ObjectRecord) The record
+    :return:
+    """
+
+    for param in record._params:
+        param.value = getattr(record, param.name)
@@ -9,12 +9,20 @@ from rich.traceback import install
 import panos.objects
 from panos.panorama import Panorama, DeviceGroup, PanoramaDeviceGroupHierarchy
 from panos.objects import AddressObject, AddressGroup, Tag, ServiceObject, ServiceGroup, ScheduleObject
-from panos.policies import SecurityRule, PreRulebase, PostRulebase, Rulebase, NatRule, AuthenticationRule, PolicyBasedForwarding, DecryptionRule, ApplicationOverride
+from panos.policies import SecurityRule, PreRulebase, PostRulebase, Rulebase, HitCount, NatRule, AuthenticationRule, PolicyBasedForwarding, DecryptionRule, ApplicationOverride
 from panos.predefined import Predefined
-from panos.errors import PanXapiError
+from panos.errors import PanXapiError, PanDeviceError
 from panos.firewall import Firewall
 from panos.device import SystemSettings
 from hierarchy import HierarchyDG
+from ConfigSnapshot import ConfigSnapshot
+from ConfigCache import ConfigCache
+from ApiTransport import ApiTransport
+from SessionCassette import SessionCassette, CassetteError
+from HitcountCache import HitcountCache
+from UsedObjects import UsedObjectsRegistry, UsedObjectsSet
+from PipelineStages import StageArtifacts, StageError, PIPELINE_STAGES, STATE_ATTRIBUTES, FETCH_ARGUMENTS, CHECKPOINT_NAME
+import ObjectRecords
 import PaloCleanerTools
 from PaloCleanerConf import repl_map, cleaning_order
 import re
@@ -22,12 +30,28 @@ import time
 import functools
 import signal
 from multiprocessing import cpu_count
-from threading import Thread, Lock
-from queue import Queue
+from threading import Thread, Lock, Event
+from queue import Queue, Empty
 from ctypes import c_int32
 import math
-import dns.resolver
 import copy
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from xml.etree.ElementTree import ParseError
+
+# pan-os-python classes downloaded for each object type (see plan_fetch)
+OBJECT_TYPES_CLASSES = {
+    "Address": [AddressObject, AddressGroup],
+    "Tag": [Tag],
+    "Service": [ServiceObject, ServiceGroup],
+    "Schedule": [ScheduleObject],
+}
+# 23022022 - Seems that hit timestamps can only be get from device
+# while last modification timestamp has to be get from Panorama
+HITCOUNT_COUNTERS = ["last_hit_timestamp", "rule_modification_timestamp"]
+
+# Rule hitcounts aggregated by Panorama from the member devices (same attributes than panos.policies.HitCount used by fetch_hitcounts)
+AggregatedHitCount = namedtuple("AggregatedHitCount", ["last_hit_timestamp", "rule_modification_timestamp"])
 
 # TODO : when using bulk-actions, make sure that tag-protected objects are not deleted (can be added to device-group for deletion before this check !)
 # TODO : block bulk operations depending of Panorama / PAN-OS version !!!
@@ -49,11 +73,34 @@ class PaloCleaner:
         # Remove api_password from args to avoid it to be printed later (startup arguments are printed in log file)
         kwargs['api_password'] = None
 
+        self._batch = kwargs['batch']                           # boolean, indicating if running headless (no prompt, no pause, no live rendering, cancellation on SIGINT / SIGTERM)
+        self._config_file = kwargs['config_file']               # path to a Panorama XML configuration export, used instead of the live XML API (offline mode)
+        self._config_snapshot = None                            # initialized in the start() function if self._config_file is used. Holds the ConfigSnapshot object
+        self._cache_folder = kwargs['cache_folder']             # path to the folder where downloaded configuration is cached between runs
+        self._config_cache = None                               # initialized in the start() function if self._cache_folder is used. Holds the ConfigCache object
+        self._hitcounts_cache_ttl = kwargs['hitcounts_cache_ttl']   # time to live (in hours) of the hitcounts cached on self._cache_folder. None if hitcounts are not cached
+        self._refresh_hitcounts = kwargs['refresh_hitcounts']   # boolean, indicating if the cached hitcounts must be collected again (and the cache updated)
+        self._hitcount_cache = None                             # initialized in the start() function if self._hitcounts_cache_ttl is used. Holds the HitcountCache object
+        self._api_retries = kwargs['api_retries']               # maximum number of retries of the read-only API requests on transient errors (HTTP 5xx, throttling, connection reset)
+        self._api_transport = None                              # initialized in the start() function when connecting to Panorama. Holds the ApiTransport object used by all API requests
+        self._record_session = kwargs['record_session']         # path of the cassette file where all the API requests / responses are recorded (see SessionCassette)
+        self._replay_session = kwargs['replay_session']         # path of a recorded cassette file, whose responses are replayed instead of contacting Panorama and firewalls
+        self._replay_latency = kwargs['replay_latency']         # "original" or "none", indicating if the replayed responses are delayed by their recorded duration
+        self._stages_folder = kwargs['stages_folder']           # path to the folder where the output of each pipeline stage is saved (see PipelineStages)
+        self._from_stage = kwargs['from_stage']                 # name of the pipeline stage from which the run starts (the output of the previous stages is loaded from self._stages_folder)
+        self._resume = kwargs['resume']                         # boolean, indicating if the run resumes an interrupted run from the output saved on self._stages_folder (last optimized device-group, or last completed stage)
+        self._checkpoint_interval = kwargs['checkpoint_interval']   # minimum time (in seconds) between two checkpoints of the optimize stage (written after a device-group is optimized)
+        self._stage_artifacts = None                            # initialized in the start() function if self._stages_folder is used. Holds the StageArtifacts object
+        self._applied_deletions = set()                         # Objects deleted by the interrupted run after its last checkpoint (when resuming). Set of tuples (location name, class name, object name)
+        self._async_download = kwargs['async_download']         # boolean, indicating if the objects and rulebases of all locations are downloaded concurrently using asyncio (see AsyncDownloader)
+        self._max_inflight_requests = kwargs['max_inflight_requests']   # maximum number of API requests sent at the same time when using async_download
+        self._prefetched = dict()                               # Configuration subtrees downloaded by the asynchronous download. Key is the location name, value is a dict {xpath: element}
         self._dg_filter = kwargs['device_groups']               # list of device-groups to be included in the operation
         self._protect_tags = kwargs['protect_tags'] if kwargs['protect_tags'] else list()   # list of tags for which associated objects need to be preserverd
         self._analysis_perimeter = None                         # initialized in the get_pano_dg_hierarchy() function. Contains a dict with fully, direct and indirect included device-groups 
         self._depthed_tree = dict({0: ['shared']})              # initialized in the get_pano_dg_hierarchy() function. Contains a dict representing the DG hierarchy depth level (key is the depth level, associated with the list of DG at this level)
         self._reversed_tree = dict()                            # initialized in the get_pano_dg_hierarchy() function. Each key (device group name) contains the list of names of the child device groups 
+        self._dg_index = None                                   # initialized in the get_pano_dg_hierarchy() function (or when loading a stage artifact). HierarchyIndex with the precomputed ancestors chain, level and subtree of each device group
         self._apply_cleaning = kwargs['apply_cleaning']         # boolean, indicating if this is just a dry-run or a real cleaning operation
         self._tiebreak_tag = kwargs['tiebreak_tag']             # the tiebreak tag name to be applied on tiebreaked objects 
         self._tiebreak_tag_set = set(self._tiebreak_tag) if self._tiebreak_tag else set() # the tiebreak tag in a set() instance, used later in this form
@@ -63,6 +110,9 @@ class PaloCleaner:
         self._favorise_tagged_objects = kwargs['favorise_tagged_objects']   # boolean, indicated if tagged objects should be favorised by the tiebreak logic
         self._same_name_only = kwargs['same_name_only']         # boolean, indicating if we are running in a mode where we only replace objects existing with same name (and value) upward
         self._nb_thread = kwargs['number_of_threads']           # number of threads to generate when using multithread mode 
+        self._download_threads = kwargs['download_threads']     # number of threads used to download the device-groups objects / rulebases / hitcounts concurrently
+        self._datastructures_lock = Lock()                      # lock protecting the datastructures shared between locations when downloading device-groups concurrently
+        self._cancel_event = Event()                            # event set when the running operations are interrupted, checked by the worker threads before taking a new job
         self._unused_only = kwargs['unused_only']               # list of device-groups on which we want to delete unused only objects. If this argument has been provided at startup without specifying device-groups, it will be an empty list. If not provided at all, will be None 
         self._remove_unused_dependencies = kwargs["remove_unused_dependencies"]    # boolean, indicating if dependencies of unused objects on lower-level groups (unused too) can be deleted for upper object removal
         if self._nb_thread is not None:
@@ -84,8 +134,11 @@ class PaloCleaner:
         self._tag_objsearch = dict()                            # Search datastructure which permits to find all panos.objects.AddressObject and panos.objects.AddressGroup by their associated tags (per device-group)
         self._schedule_namesearch = dict()                      # Search datastructure which permits to find all panos.objects.ScheduleObject  by its name (per device-group)
         self._service_namesearch = dict()                       # Search datastructure which permits to find all panos.objects.ServiceObject and panos.objects.ServiceGroup by its name (per device-group)
+        self._name_resolution = dict()                          # initialized in the build_name_resolution() function. Per object type, then per location, then per object name : tuple of the (object, location) defining this name, from the nearest location up to shared (and predefined)
         self._service_valuesearch = dict()                      # Search datastructure which permits to find all panos.objects.ServiceObject matching a value (generated by PaloCleanerTools.stringify_service) (per device-group)
-        self._used_objects_sets = dict()                        # Huge dict datastructure which contains, for each device-group, a list of tuples (panos.objects, location) of used objects at this level
+        self._addr_group_valuesearch = dict()                   # Search datastructure which permits to find all panos.objects.AddressGroup having the same members set or DAG condition (canonical value generated by PaloCleanerTools.get_group_key) (per device-group)
+        self._used_objects_registry = UsedObjectsRegistry()     # dense integer ids of the (panos.objects, location) pairs, used by the _used_objects_sets bitsets
+        self._used_objects_sets = dict()                        # Huge dict datastructure which contains, for each device-group, a UsedObjectsSet (bitset) of the tuples (panos.objects, location) of used objects at this level
         self._group_sizesearch = dict()                         # Used for group comparison, contains, for each device-group (first dict level), a dict of list of groups, where the keys are the group sizes and the value is the list of this-sized groups 
         self._rulebases = dict()                                # Dict datastructure which contains the reference to the different panos.policies instances (per device-group) 
         self._dg_hierarchy = dict()                             # initialized in the get_pano_dg_hierarchy() function. Contains a hierarchy.HierarchyDG object representing the device-groups hierarchy at each level
@@ -94,7 +147,16 @@ class PaloCleaner:
         self._max_change_timestamp = int(time.time()) - int(kwargs['max_days_since_change']) * 86400 if kwargs['max_days_since_change'] else 0      # Contains the timestamp after which updated rules cannot be cleaned (when specifying it) 
         self._max_hit_timestamp = int(time.time()) - int(kwargs['max_days_since_hit']) * 86400 if kwargs['max_days_since_hit'] else 0               # Contains the timestamp after which hitted rules cannot be cleaned (when specifying it)
         self._need_opstate = self._max_change_timestamp or self._max_hit_timestamp                                                                  # Boolean, indicating if opstate information will have to be used (using timestamps ?) 
+        self._fetch_arguments = {**{x: kwargs[x] for x in FETCH_ARGUMENTS}, "opstate": bool(self._need_opstate)}  # Startup arguments changing the downloaded data (checked when loading a stage artifact)
         self._ignore_opstate_ip = [] if kwargs['ignore_appliances_opstate'] is None else kwargs['ignore_appliances_opstate']                        # List of IP addresses of appliances for which we explicitly don't want to check opstate information
+        self._hitcounts_source = kwargs['hitcounts_source']     # "firewalls" or "panorama", the source of the rules hitcounts (see fetch_hitcounts)
+        self._opstate_threads = kwargs['opstate_threads']       # number of appliances polled concurrently when collecting hitcounts
+        self._opstate_timeout = kwargs['opstate_timeout']       # connection / read timeout (in seconds) of the API requests sent to appliances for hitcounts collection
+        self._opstate_retries = kwargs['opstate_retries']       # number of retries on an appliance for which the hitcounts collection failed
+        self._opstate_deadline = kwargs['opstate_deadline']     # maximum duration (in seconds) of the hitcounts collection. Converted to a timestamp when the download phase starts
+        self._opstate_skipped = dict()                          # Dict of appliances skipped during hitcounts collection. Key is the (IP, vsys) tuple, value is a tuple (location name, reason)
+        self._opstate_members = dict()                          # Member firewalls to be polled for hitcounts. Key is the firewall IP address, value is a dict {vsys: [locations names]}
+        self._opstate_locations = dict()                        # Device-groups whose hitcounts are collected from member firewalls. Key is the location name, value is the DeviceGroup object
         self._console = None                                    # Holds the rich.Console object 
         self._console_context = None                            # Contains the current console context (init, or location). Used in conjunction with self._split_report 
         self.init_console() 
@@ -108,23 +170,57 @@ class PaloCleaner:
         self._groups_percent_match = int(kwargs["groups_comparison_percent_match"])         # integer, minimum level of match (in percentage) between groups to compare 
         self._partial_group_match = kwargs['partial_group_match']                          # boolean, indicating if it is allowed to replace groups with a partial match in the target one (not all IP included)
         self._indirect_protect = dict()
-        self._dns_resolver = None
-        self._dns_resolutions = dict()
+        self._dns_resolver = None                               # FqdnResolver used to resolve FQDN objects values (--dns-resolver). Cache is stored on self._cache_folder if used
+        self._dns_resolutions = dict()                          # IP addresses resolved for FQDN objects values. Key is the IP address, value is the FQDN
         self._parse_schedules = kwargs['parse_schedules']       # boolean, indicating if schedule objects should be used to analyze objects usage (and delete expired objects / rules)
         self._detect_shadow_rules = kwargs['detect_shadow_rules']  # boolean, indicating if shadow rule detection should be performed
         self._detect_shadow_objects = kwargs.get('detect_shadow_objects', False)  # boolean, detect shadow objects in rule fields
         self._detect_shadow_group_members = kwargs.get('detect_shadow_group_members', False)  # boolean, detect shadow members in groups
+        self._fetch_object_types = set()                        # Object types ("Address", "Service"...) downloaded and indexed for each location. Initialized by plan_fetch()
+        self._fetch_rule_types = list()                         # Rule types (panos.policies classes) downloaded for each location. Initialized by plan_fetch()
+        self._hitcount_rulebases = dict()                       # Rulebases names used on the _hitcounts structure, and associated hit count style (rule type) for opstate requests. Initialized by plan_fetch()
+        self.plan_fetch()
         if kwargs['dns_resolver']:
-            self._dns_resolver = dns.resolver.Resolver()
-            self._dns_resolver.nameservers = [kwargs['dns_resolver']]
+            # dnspython is only loaded when FQDN resolution is requested
+            from FqdnResolver import FqdnResolver
+            self._dns_resolver = FqdnResolver(kwargs['dns_resolver'], max_workers=kwargs['dns_threads'],
+                                              cache_folder=self._cache_folder)
 
         if self._compare_groups:
             PaloCleanerTools.surcharge_addressgroups()
             PaloCleanerTools.surcharge_addressobjects()
 
-        signal.signal(signal.SIGINT, self.signal_handler)
+        if self._batch:
+            signal.signal(signal.SIGINT, self.cancel_handler)
+            signal.signal(signal.SIGTERM, self.cancel_handler)
+        else:
+            signal.signal(signal.SIGINT, self.signal_handler)
         self._console.log(f"STARTUP ARGUMENTS : {kwargs}")
 
+    def plan_fetch(self):
+        """
+        Works out, from the enabled modes, which object types and rule types are read by the analysis and cleaning
+        phases, so that only those are downloaded and indexed :
+        - objects optimization and cleaning (default, --unused-only) : all object types and rule types
+        - --detect-shadow-rules (no objects optimization) : security rules only, with the Address and Service objects
+          used to resolve their fields (+ Tag objects if --tiebreak-tag is used, and Schedule objects if
+          --parse-schedules is used)
+
+        :return:
+        """
+
+        if self._detect_shadow_rules:
+            self._fetch_object_types = {"Address", "Service"}
+            if self._tiebreak_tag:
+                self._fetch_object_types.add("Tag")
+            if self._parse_schedules:
+                self._fetch_object_types.add("Schedule")
+            self._fetch_rule_types = [SecurityRule]
+        else:
+            self._fetch_object_types = set(OBJECT_TYPES_CLASSES)
+            self._fetch_rule_types = list(repl_map)
+        self._hitcount_rulebases = {x.__name__.replace('Rule', '').lower(): x.HIT_COUNT_STYLE for x in self._fetch_rule_types}
+
     def print_contexts(self):
         for l in self._objects:
             self._console.log(f"{l} ({self._objects[l]['context']}) --> {self._objects[l]['context'].children}")
@@ -172,7 +268,7 @@ class PaloCleaner:
 
         @functools.wraps(status_func)
         def wrapper(*xargs, **kwargs):
-            if self._no_report:
+            if self._no_report and not self._batch:
                 return status_func(*xargs, **kwargs)
             else:
                 return FalseStatus()
@@ -190,9 +286,22 @@ class PaloCleaner:
 
         res = input("\n\n  Do you really want to interrupt the running operations ? y/n ")
         if res == 'y':
+            self._cancel_event.set()
             raise KeyboardInterrupt
         pass
 
+    def cancel_handler(self, signum, frame):
+        """
+        Signal handler function used in batch mode for SIGINT and SIGTERM. The running operations are interrupted
+        without confirmation (the reports, cassette and caches are still written by the start() function)
+        :param signum: SIGNUM information about the interrupt signal handled
+        :param frame:
+        :return:
+        """
+
+        self._cancel_event.set()
+        raise KeyboardInterrupt
+
     def start(self):
         """
         First function called after __init__, which starts the processing
@@ -216,20 +325,68 @@ class PaloCleaner:
                 self._console.log("/!\\ No device-group filter provided while using unused-only list used, replicating unused-only list into the device-group filter")
                 self._dg_filter = self._unused_only
 
+            # the output of previous stages is used instead of downloading the configuration (no connection to Panorama
+            # is needed, unless changes have to be applied when resuming an interrupted run)
+            from_saved_output = (self._from_stage or self._resume) and not self._apply_cleaning
+
             # if the API user password has not been provided within the CLI start command, prompt the user
-            while self._panorama_password == "":
+            # (not needed when working offline from a configuration file or from the output of previous stages)
+            while self._panorama_password == "" and not self._config_file and not from_saved_output and not self._batch:
                 self._panorama_password = Prompt.ask(f"Please provide password for API user {self._panorama_user!r}",
                                                      password=True)
 
             self._console.print("\n\n")
             with self._console.status("Connecting to Panorama...", spinner="dots12") as status:
+                resumed_perimeter = None
                 try:
-                    self._panorama = Panorama(self._panorama_url, self._panorama_user, self._panorama_password)
-                    self.get_pano_dg_hierarchy()
-                    self._console.log("[ Panorama ] Connection established")
+                    if from_saved_output:
+                        # the configuration and hierarchy are loaded with the output of the previous stage (see
+                        # init_stage_artifacts). The Panorama object is only used as root of the configuration tree
+                        self._panorama = Panorama(self._panorama_url if self._panorama_url else "offline")
+                    elif self._config_file:
+                        # offline mode : the Panorama object is only used as root of the configuration tree
+                        # (no connection is established)
+                        self._config_snapshot = ConfigSnapshot.from_file(self._config_file)
+                        self._panorama = Panorama(self._panorama_url if self._panorama_url else "offline")
+                        self.get_pano_dg_hierarchy()
+                        self._console.log(f"[ Panorama ] Configuration loaded from file {self._config_file}")
+                    else:
+                        # all the API requests (Panorama and firewalls) go through a shared pooled / retrying transport
+                        self._api_transport = ApiTransport(retries=self._api_retries, cassette=self.init_session_cassette())
+                        self._api_transport.install()
+                        # the Panorama URL can include a non-default HTTPS port (ie : "panorama.local:8443")
+                        panorama_host, _, panorama_port = self._panorama_url.rpartition(":") if self._panorama_url.count(":") == 1 else (self._panorama_url, None, None)
+                        self._panorama = Panorama(panorama_host, self._panorama_user, self._panorama_password, port=int(panorama_port) if panorama_port else 443)
+                        # (when resuming an interrupted run, the configuration and hierarchy are loaded from its output)
+                        if not self._resume:
+                            if self._cache_folder:
+                                self.init_config_cache()
+                                if self._dns_resolver:
+                                    try:
+                                        self._dns_resolver.load()
+                                    except (OSError, ValueError, IndexError) as e:
+                                        self._console.log(f"[ Panorama ] Error while loading DNS resolutions cache from {self._cache_folder} : {e}. All FQDN will be resolved", style="red")
+                            if self._hitcounts_cache_ttl is not None and self._need_opstate:
+                                self.init_hitcount_cache()
+                            self.get_pano_dg_hierarchy()
+                        self._console.log("[ Panorama ] Connection established")
+                    if self._stages_folder:
+                        resumed_perimeter = self.init_stage_artifacts()
                 except PanXapiError as e:
                     self._console.log(f"[ Panorama ] Error while connecting to Panorama : {e.message}", style="red")
                     return 0
+                except CassetteError as e:
+                    self._console.log(f"[ Panorama ] {e}", style="red")
+                    return 0
+                except StageError as e:
+                    self._console.log(f"[ Panorama ] {e}", style="red")
+                    return 0
+                except (OSError, ValueError, ParseError) as e:
+                    if self._config_file and not from_saved_output:
+                        self._console.log(f"[ Panorama ] Error while loading configuration file {self._config_file} : {e}", style="red")
+                    else:
+                        self._console.log(f"[ Panorama ] Error while loading configuration : {e}", style="red")
+                    return 0
                 except Exception as e:
                     self._console.log("[ Panorama ] Unknown error occurred while connecting to Panorama", style="red")
                     return 0
@@ -245,7 +402,8 @@ class PaloCleaner:
                 # device-groups will be concerned by the cleaning process
                 status.update("Parsing device groups list")
                 hierarchy_tree = self._dg_hierarchy['shared'].get_tree()
-                time.sleep(1)
+                if not self._batch:
+                    time.sleep(1)
                 self._console.print("Discovered hierarchy tree is the following :")
                 self._console.print(
                     "( [red] + are directly included [/red] / [yellow] * are indirectly included [/yellow] / [green] - are not included [/green] )")
@@ -253,11 +411,15 @@ class PaloCleaner:
                     " F (Fully included = cleaned) / P (Partially included = not cleaned) "
                 )
                 self._console.print(Panel(hierarchy_tree))
-                time.sleep(1)
+                if not self._batch:
+                    time.sleep(1)
 
             # "perimeter" is a list containing the name only of each device-group included in the cleaning process
-            perimeter = [(dg.about()['name'], dg) for dg in self.get_devicegroups() if
-                         dg.about()['name'] in self._analysis_perimeter['direct'] + self._analysis_perimeter['indirect']]
+            if resumed_perimeter is not None:
+                perimeter = [(x, self._objects[x]['context']) for x in resumed_perimeter]
+            else:
+                perimeter = [(dg.name, dg) for dg in self.get_devicegroups() if
+                             dg.name in self._analysis_perimeter['direct'] + self._analysis_perimeter['indirect']]
 
             with Progress(
                     SpinnerColumn(spinner_name="dots12"),
@@ -268,270 +430,380 @@ class PaloCleaner:
                     TextColumn("[progress.description]{task.description}"),
                     console=self._console,
                     transient=True,
-                    disable=self._console.record
+                    disable=self._console.record or self._batch
             ) as progress:
-                self._console.print(
-                    Panel("[bold green]Downloading objects and rulebases",
-                          style="green"),
-                    justify="left")
-                download_task = progress.add_task("", total=len(perimeter) + 1)
-
-                # ----------------------------------------------------------------------------------
-                # --           Download of Panorama (shared) / predefined objects                 --
-                # ----------------------------------------------------------------------------------
-                progress.update(download_task, description="[ Panorama ] Downloading shared objects")
-                self.fetch_objects(self._panorama, 'shared')
-                self.fetch_objects(self._panorama, 'predefined')
-                self._console.log(f"[ Panorama ] Shared objects downloaded ({self.count_objects('shared')})")
-
-                # calling a function which will make sure that the tiebreak-tag exists (if requested as argument)
-                # and will create it if it does not
-                self.validate_tiebreak_tag()
-
-                progress.update(download_task, description="[ Panorama ] Downloading shared rulebases")
-                self.fetch_rulebase(self._panorama, 'shared')
-                self._console.log(f"[ Panorama ] Shared rulebases downloaded ({self.count_rules('shared')} rules found)")
-
-                progress.update(download_task, description="[ Panorama ] Downloading managed devices information")
-                self.get_panorama_managed_devices()
-                self._console.log(f"[ Panorama ] Managed devices information downloaded (found {len(self._panorama_devices)} devices)")
-
-                progress.update(download_task, advance=1)
-
-                # ----------------------------------------------------------------------------------
-                # --             Download of the device-groups objects                            --
-                # ----------------------------------------------------------------------------------
-                for (context_name, dg) in perimeter:
-                    progress.update(download_task, description=f"[ {context_name} ] Downloading objects")
-                    self.fetch_objects(dg, context_name)
-                    self._console.log(f"[ {context_name} ] Objects downloaded ({self.count_objects(context_name)})")
-                    progress.update(download_task, description=f"[ {context_name} ] Downloading rulebases")
-                    self.fetch_rulebase(dg, context_name)
-                    self._console.log(f"[ {context_name} ] Rulebases downloaded ({self.count_rules(context_name)} rules found)")
-
-                    # if opstate (hit counts) has to be cared, download on each device member of the device-group
-                    # if this device-group has no child device-group
-                    if self._need_opstate and not self._reversed_tree.get(context_name):
-                        progress.update(
-                            download_task,
-                            description=f"[ {context_name} ] Downloading hitcounts (connecting to devices)"
-                        )
-                        self.fetch_hitcounts(dg, context_name)
-                        self._console.log(f"[ {context_name} ] Hitcounts downloaded for all rulebases")
-
-                    progress.update(download_task, advance=1)
-                progress.remove_task(download_task)
-
-                # ----------------------------------------------------------------------------------
-                # --           If using groups-comparison, analyzing all existing groups          --
-                # ----------------------------------------------------------------------------------
-
-                if self._compare_groups:
-                    self._console.print(
-                        Panel("[bold green]Analyzing all groups for replacements", 
-                            style="green"),
-                        justify="left")
-                    # Processing AddressGroups at location "shared"
-                    shared_groups_task = progress.add_task("[Panorama] Processing AddressGroups", 
-                        total=len([g for g in self._objects["shared"]["Address"] if type(g) is panos.objects.AddressGroup]))
-                    self.addr_groups_processing("shared", progress, shared_groups_task)
-                    self._console.log("[ Panorama ] AddressGroups processed")
-                    progress.remove_task(shared_groups_task)
-
-                    # Processing AddressHroups for each location included in the analysis perimeter
-                    for (context_name, dg) in perimeter:
-                        addr_groups_task = progress.add_task(
-                            f"[{dg.about()['name']}] Processing AddressGroups", 
-                            total=len([g for g in self._objects[dg.about()['name']]["Address"] if type(g) is panos.objects.AddressGroup])
-                        )
-                        self.addr_groups_processing(dg.about()['name'], progress, addr_groups_task)
-                        self._console.log(f"[ {dg.about()['name']} ] AddressGroups processed")
-                        progress.remove_task(addr_groups_task)
-
-                # ----------------------------------------------------------------------------------
-                # --             Processing used objects set for shared + device-groups           --
-                # ----------------------------------------------------------------------------------
-                self._console.print(
-                    Panel("[bold green]Analyzing objects usage",
-                          style="green"),
-                    justify="left")
-                # Processing used objects set at location "shared"
-                shared_fetch_task = progress.add_task("[Panorama] Processing used objects location",
-                                                      total=self.count_rules('shared'))
-                self.fetch_used_obj_set("shared", progress, shared_fetch_task)
-                self._console.log("[ Panorama ] Used objects set processed")
-                progress.remove_task(shared_fetch_task)
-
-                # Processing used objects set for each location included in the analysis perimeter
-                for (context_name, dg) in perimeter:
-                    dg_fetch_task = progress.add_task(
-                        f"[{dg.about()['name']}] Processing used objects location",
-                        total=self.count_rules(dg.about()['name'])
-                    )
-                    self.fetch_used_obj_set(dg.about()['name'], progress, dg_fetch_task)
-                    self._console.log(f"[ {dg.about()['name']} ] Used objects set processed")
-                    progress.remove_task(dg_fetch_task)
-
-                # ----------------------------------------------------------------------------------
-                # --     Shadow group members detection (if enabled)                             --
-                # ----------------------------------------------------------------------------------
-                if self._detect_shadow_group_members:
-                    from ShadowObjectDetector import ShadowObjectDetector
-                    self._console.print(
-                        Panel("[bold yellow]Detecting shadow members in groups",
-                              style="yellow"),
-                        justify="left")
-
-                    shadow_grp_detector = ShadowObjectDetector(self)
-                    shadow_grp_task = progress.add_task("[ Panorama ] Detecting shadow group members",
-                                                        total=len(perimeter) + 1)
-
-                    shadow_grp_detector.analyze_groups_at_location("shared")
-                    progress.update(shadow_grp_task, advance=1)
-
-                    for (context_name, dg) in perimeter:
-                        progress.update(shadow_grp_task, description=f"[ {context_name} ] Detecting shadow group members")
-                        shadow_grp_detector.analyze_groups_at_location(context_name)
-                        progress.update(shadow_grp_task, advance=1)
-
-                    progress.remove_task(shadow_grp_task)
-
-                    # Display results
-                    tables_by_loc = shadow_grp_detector.get_tables_by_location()
-                    if tables_by_loc:
-                        for location, tables in tables_by_loc.items():
-                            self._console.print(Panel(f"[bold magenta]{location}[/]", style="magenta"))
-                            for table in tables:
-                                self._console.print(table)
-                                self._console.print("")
-                    else:
-                        self._console.log("No shadow group members detected.", style="green")
-
-                    # Apply group cleaning
-                    for (context_name, dg) in perimeter:
-                        shadow_grp_detector.apply_group_cleaning(context_name)
-                    shadow_grp_detector.apply_group_cleaning("shared")
-
-                    self._console.log(shadow_grp_detector.get_summary())
-
-                # ----------------------------------------------------------------------------------
-                # --              Shadow rule detection (if enabled)                              --
-                # ----------------------------------------------------------------------------------
-                if self._detect_shadow_rules:
-                    from ShadowRuleDetector import ShadowRuleDetector
-                    self._console.print(
-                        Panel("[bold yellow]Detecting shadow/redundant rules",
-                              style="yellow"),
-                        justify="left")
-
-                    shadow_detector = ShadowRuleDetector(self)
-
-                    # Analyze shared location
-                    shadow_task = progress.add_task("[ Panorama ] Detecting shadow rules",
-                                                    total=len(perimeter) + 1)
-                    shared_shadows = shadow_detector.analyze_location("shared")
-                    if shared_shadows:
-                        self._console.log(f"[ Panorama ] Found {len(shared_shadows)} shadow rule(s)")
-                    progress.update(shadow_task, advance=1)
-
-                    # Analyze each device-group
-                    for (context_name, dg) in perimeter:
-                        progress.update(shadow_task, description=f"[ {context_name} ] Detecting shadow rules")
-                        shadows = shadow_detector.analyze_location(context_name)
-                        if shadows:
-                            self._console.log(f"[ {context_name} ] Found {len(shadows)} shadow rule(s)")
-                        progress.update(shadow_task, advance=1)
-
-                    progress.remove_task(shadow_task)
-
-                    # Print tables grouped by location and shadowing rule
-                    tables_by_loc = shadow_detector.get_tables_by_location()
-                    if tables_by_loc:
-                        for location, tables in tables_by_loc.items():
-                            self._console.print(Panel(f"[bold magenta]{location}[/]", style="magenta"))
-                            for table in tables:
-                                self._console.print(table)
-                                self._console.print("")
-                    else:
-                        self._console.log("No shadow rules detected.", style="green")
-                else:
-                    # ----------------------------------------------------------------------------------
-                    # --       Starting objects optimization (from deepest DG to shared)              --
-                    # ----------------------------------------------------------------------------------
-                    self._console.print(
-                        Panel("[bold green] Optimizing objects duplicates",
-                            style="green"),
-                        justify="left")
-                    # starting objects optimization from the most "depth" device-groups, up to "shared"
-                    for depth, contexts in sorted(self._depthed_tree.items(), key=lambda x: x[0], reverse=True):
-                        for context_name in contexts:
-                            if context_name in self._analysis_perimeter['direct'] + self._analysis_perimeter['indirect']:
-                                # initialize the console with a new context name (used when splitting reports)
-                                self.init_console(context_name)
-                                self._console.print(Panel(f"  [bold magenta]{context_name}  ", style="magenta"),
-                                                justify="left")
-
-                                # Initializing a dict (on the global _replacements dict) which will contain information about the replacement
-                                # done for each object type at the current location
-                                self._replacements[context_name] = {'Address': dict(), 'Service': dict(), 'Tag': dict()}
-
-                                if context_name not in ['shared', 'predefined']:
-                                    self._panorama.add(self._objects[context_name]['context'])
-
-                                # if unused-only has not been specified (normal use-case), or if it has been used with protect-potential-replacements 
-                                # we need to start an objects optimization for the current context 
-                                # (note that the tiebreak tag will be added to choosen objects at this step)
-                                if self._unused_only is None or self._protect_potential_replacements:
-                                    # OBJECTS OPTIMIZATION
-                                    dg_optimize_task = progress.add_task(
-                                        f"[ {context_name} ] - Optimizing objects",
-                                        total=len(self._used_objects_sets[context_name])
-                                    )
-                                    self.optimize_objects(context_name, progress, dg_optimize_task)
-                                    self._console.log(f"[ {context_name} ] Objects optimization done")
-                                    progress.remove_task(dg_optimize_task)
-
-                                # if we have not specified an unused-only cleaning operation, we need to replace the non-optimal objects by their processed replacements (in groups, rules, etc)
-                                if self._unused_only is None:
-                                    # OBJECTS REPLACEMENT IN GROUPS
-                                    dg_replaceingroups_task = progress.add_task(
-                                        f"[ {context_name} ] Replacing objects in groups",
-                                        total=len(self._replacements[context_name]['Address']) + len(self._replacements[context_name]['Service'])
-                                    )
-                                    self.replace_object_in_groups(context_name, progress, dg_replaceingroups_task)
-                                    self._console.log(f"[ {context_name} ] Objects replaced in groups")
-                                    progress.remove_task(dg_replaceingroups_task)
-
-                                    # OBJECTS REPLACEMENT IN RULEBASES
-                                    dg_replaceinrules_task = progress.add_task(
-                                        f"[ {context_name} ] Replacing objects in rules",
-                                        total=self.count_rules(context_name)
-                                    )
-
-                                    self.replace_object_in_rulebase(context_name, progress, dg_replaceinrules_task)
-                                    self._console.log(f"[ {context_name} ] Objects replaced in rulebases")
-                                    progress.remove_task(dg_replaceinrules_task)
-
-                                # OBJECTS CLEANING (FOR FULLY INCLUDED DEVICE GROUPS ONLY)
-                                if context_name in self._analysis_perimeter['full']:
-                                    self.clean_local_object_set(context_name)
-                                    self._console.log(f"[ {context_name} ] Objects cleaned (fully included)")
-
-                                if context_name not in ['shared', 'predefined']:
-                                    self._panorama.remove(self._objects[context_name]['context'])
-
-
-            self.init_console("report")
-            # Display the cleaning operation result (display again the hierarchy tree, but with the _cleaning_counts
-            # information (deleted / replaced objects of each type for each device-group)
-            self._console.print(Panel(self._dg_hierarchy['shared'].get_tree(self._cleaning_counts)))
+                # the stages are run in order, starting from --from-stage (or from the resume point) if the output of the
+                # previous stages has been loaded from the stages folder. The output of each stage is saved on the stages
+                # folder if requested
+                stage_functions = {
+                    "fetch": self.run_fetch_stage,
+                    "index": self.run_index_stage,
+                    "usage": self.run_usage_stage,
+                    "optimize": self.run_optimize_stage,
+                }
+                first_stage = self._from_stage if self._from_stage else PIPELINE_STAGES[0]
+                if self._stage_artifacts and not self._resume:
+                    # the saved output of the stages which will be run again is outdated (when resuming, the output
+                    # of the next stages does not exist, and the checkpoint and journal are used)
+                    self._stage_artifacts.clear(first_stage)
+                for stage in PIPELINE_STAGES[PIPELINE_STAGES.index(first_stage):]:
+                    if stage in stage_functions:
+                        stage_functions[stage](perimeter, progress)
+                        if self._stage_artifacts:
+                            self.save_stage_artifact(stage, perimeter)
+
+            self.run_report_stage()
         except KeyboardInterrupt as e:
             self._console.log("PROCESS INTERRUPTED BY USER")
+            return 0
         finally:
+            if self._api_transport:
+                self._api_transport.uninstall()
+                if self._record_session:
+                    nb_interactions = self._api_transport.cassette.save()
+                    self._console.log(f"[ Panorama ] API session recorded to {self._record_session} ({nb_interactions} requests)")
             # If the --no-report argument was not used at startup, export the console content to an HTML report file
             if not self._no_report:
                 self._console.save_html(self._report_folder+'/report.html')
 
+    def run_fetch_stage(self, perimeter: [(str, DeviceGroup)], progress: rich.progress.Progress):
+        """
+        Pipeline stage "fetch" : downloads the objects and rulebases of shared and of each device-group of the
+        perimeter, the managed devices information and the rules hitcounts (and resolves the FQDN objects values if requested)
+
+        :param perimeter: (list) List of tuples (device-group name, DeviceGroup object) included in the analysis perimeter
+        :param progress: (rich.progress.Progress) The rich Progress object to update during progression
+        :return:
+        """
+
+        self._console.print(
+            Panel("[bold green]Downloading objects and rulebases",
+                  style="green"),
+            justify="left")
+        download_task = progress.add_task("", total=len(perimeter) + 1)
+        if self._fetch_rule_types != list(repl_map):
+            self._console.log(f"[ Panorama ] Only downloading objects ({', '.join(sorted(self._fetch_object_types))}) and rules ({', '.join(x.__name__ for x in self._fetch_rule_types)}) used by the enabled modes")
+
+        # when using --async-download, the objects and rulebases of all locations are downloaded concurrently
+        # first. They are then built from the downloaded subtrees by the fetch_objects / fetch_rulebase functions
+        if self._async_download and not self._config_snapshot:
+            progress.update(download_task, description="[ Panorama ] Downloading configuration of all locations")
+            self.prefetch_configuration([('shared', self._panorama)] + perimeter)
+
+        # ----------------------------------------------------------------------------------
+        # --           Download of Panorama (shared) / predefined objects                 --
+        # ----------------------------------------------------------------------------------
+        progress.update(download_task, description="[ Panorama ] Downloading shared objects")
+        self.fetch_objects(self._panorama, 'shared')
+        self.fetch_objects(self._panorama, 'predefined')
+        self._console.log(f"[ Panorama ] Shared objects downloaded ({self.count_objects('shared')})")
+
+        # calling a function which will make sure that the tiebreak-tag exists (if requested as argument)
+        # and will create it if it does not
+        self.validate_tiebreak_tag()
+
+        progress.update(download_task, description="[ Panorama ] Downloading shared rulebases")
+        self.fetch_rulebase(self._panorama, 'shared')
+        self._console.log(f"[ Panorama ] Shared rulebases downloaded ({self.count_rules('shared')} rules found)")
+        if self._config_snapshot:
+            # (the configuration of each location is not used anymore once its objects and rulebases are built)
+            self._config_snapshot.release('shared')
+
+        progress.update(download_task, description="[ Panorama ] Downloading managed devices information")
+        self.get_panorama_managed_devices()
+        self._console.log(f"[ Panorama ] Managed devices information downloaded (found {len(self._panorama_devices)} devices)")
+
+        progress.update(download_task, advance=1)
+
+        # ----------------------------------------------------------------------------------
+        # --             Download of the device-groups objects                            --
+        # ----------------------------------------------------------------------------------
+        # (device-groups are downloaded concurrently if --download-threads is higher than 1)
+        if self._opstate_deadline:
+            # the --opstate-deadline duration starts with the device-groups download
+            self._opstate_deadline = time.time() + self._opstate_deadline
+        jobs_queue = Queue()
+        for (context_name, dg) in perimeter:
+            jobs_queue.put((context_name, dg))
+        download_errors = list()
+        self.multithread_wrapper(self.download_devicegroups, nb_thread=self._download_threads if self._download_threads > 1 else 0)(
+            jobs_queue, download_errors, progress, download_task)
+        jobs_queue.join()
+        if download_errors:
+            # re-raising the first error which occurred on a download thread (same behavior than sequential download)
+            raise download_errors[0]
+
+        # hitcounts of the member firewalls of all device-groups are collected at once (each appliance is
+        # polled only once, for all its vsys)
+        if self._opstate_locations:
+            progress.update(download_task, description="[ Panorama ] Downloading hitcounts (connecting to devices)")
+            self.collect_firewalls_hitcounts()
+        progress.remove_task(download_task)
+
+        if self._config_cache:
+            refreshed, cached = self._config_cache.save()
+            self._console.log(f"[ Panorama ] Configuration cache updated ({refreshed} locations downloaded, {cached} loaded from cache)")
+        if self._dns_resolver:
+            self._dns_resolver.save()
+            self._console.log(f"[ Panorama ] {self._dns_resolver.get_summary()}")
+        if self._hitcount_cache:
+            self._hitcount_cache.save()
+            self._console.log(f"[ Panorama ] Hitcounts cache updated ({self._hitcount_cache.updates} appliances / device-groups collected, {self._hitcount_cache.hits} loaded from cache)")
+
+        if self._opstate_skipped:
+            self.print_opstate_skipped()
+
+        # the objects names referenced by the rules and groups are resolved using the _name_resolution table
+        self.build_name_resolution()
+
+    def run_index_stage(self, perimeter: [(str, DeviceGroup)], progress: rich.progress.Progress):
+        """
+        Pipeline stage "index" : analyzes the AddressGroups of all locations for groups comparison (only when using
+        --compare-groups)
+
+        :param perimeter: (list) List of tuples (device-group name, DeviceGroup object) included in the analysis perimeter
+        :param progress: (rich.progress.Progress) The rich Progress object to update during progression
+        :return:
+        """
+
+        # ----------------------------------------------------------------------------------
+        # --           If using groups-comparison, analyzing all existing groups          --
+        # ----------------------------------------------------------------------------------
+
+        if self._compare_groups:
+            self._console.print(
+                Panel("[bold green]Analyzing all groups for replacements", 
+                    style="green"),
+                justify="left")
+            # Processing AddressGroups at location "shared"
+            shared_groups_task = progress.add_task("[Panorama] Processing AddressGroups", 
+                total=len([g for g in self._objects["shared"]["Address"] if isinstance(g, panos.objects.AddressGroup)]))
+            self.addr_groups_processing("shared", progress, shared_groups_task)
+            self._console.log("[ Panorama ] AddressGroups processed")
+            progress.remove_task(shared_groups_task)
+
+            # Processing AddressHroups for each location included in the analysis perimeter
+            for (context_name, dg) in perimeter:
+                addr_groups_task = progress.add_task(
+                    f"[{dg.name}] Processing AddressGroups", 
+                    total=len([g for g in self._objects[dg.name]["Address"] if isinstance(g, panos.objects.AddressGroup)])
+                )
+                self.addr_groups_processing(dg.name, progress, addr_groups_task)
+                self._console.log(f"[ {dg.name} ] AddressGroups processed")
+                progress.remove_task(addr_groups_task)
+
+    def run_usage_stage(self, perimeter: [(str, DeviceGroup)], progress: rich.progress.Progress):
+        """
+        Pipeline stage "usage" : processes the used objects set of shared and of each device-group of the perimeter
+
+        :param perimeter: (list) List of tuples (device-group name, DeviceGroup object) included in the analysis perimeter
+        :param progress: (rich.progress.Progress) The rich Progress object to update during progression
+        :return:
+        """
+
+        # ----------------------------------------------------------------------------------
+        # --             Processing used objects set for shared + device-groups           --
+        # ----------------------------------------------------------------------------------
+        self._console.print(
+            Panel("[bold green]Analyzing objects usage",
+                  style="green"),
+            justify="left")
+        # Processing used objects set at location "shared"
+        shared_fetch_task = progress.add_task("[Panorama] Processing used objects location",
+                                              total=self.count_rules('shared'))
+        self.fetch_used_obj_set("shared", progress, shared_fetch_task)
+        self._console.log("[ Panorama ] Used objects set processed")
+        progress.remove_task(shared_fetch_task)
+
+        # Processing used objects set for each location included in the analysis perimeter
+        for (context_name, dg) in perimeter:
+            dg_fetch_task = progress.add_task(
+                f"[{dg.name}] Processing used objects location",
+                total=self.count_rules(dg.name)
+            )
+            self.fetch_used_obj_set(dg.name, progress, dg_fetch_task)
+            self._console.log(f"[ {dg.name} ] Used objects set processed")
+            progress.remove_task(dg_fetch_task)
+
+    def run_optimize_stage(self, perimeter: [(str, DeviceGroup)], progress: rich.progress.Progress):
+        """
+        Pipeline stage "optimize" : detects the shadow group members and the shadow rules (if requested), or optimizes,
+        replaces and cleans the objects of each location of the perimeter (from the deepest device-groups up to shared)
+
+        :param perimeter: (list) List of tuples (device-group name, DeviceGroup object) included in the analysis perimeter
+        :param progress: (rich.progress.Progress) The rich Progress object to update during progression
+        :return:
+        """
+
+        # ----------------------------------------------------------------------------------
+        # --     Shadow group members detection (if enabled)                             --
+        # ----------------------------------------------------------------------------------
+        # (shadow group members have already been cleaned when resuming after the optimization of some locations)
+        if self._detect_shadow_group_members and not (self._stage_artifacts and self._stage_artifacts.completed_locations):
+            from ShadowObjectDetector import ShadowObjectDetector
+            self._console.print(
+                Panel("[bold yellow]Detecting shadow members in groups",
+                      style="yellow"),
+                justify="left")
+
+            shadow_grp_detector = ShadowObjectDetector(self)
+            shadow_grp_task = progress.add_task("[ Panorama ] Detecting shadow group members",
+                                                total=len(perimeter) + 1)
+
+            shadow_grp_detector.analyze_groups_at_location("shared")
+            progress.update(shadow_grp_task, advance=1)
+
+            for (context_name, dg) in perimeter:
+                progress.update(shadow_grp_task, description=f"[ {context_name} ] Detecting shadow group members")
+                shadow_grp_detector.analyze_groups_at_location(context_name)
+                progress.update(shadow_grp_task, advance=1)
+
+            progress.remove_task(shadow_grp_task)
+
+            # Display results
+            tables_by_loc = shadow_grp_detector.get_tables_by_location()
+            if tables_by_loc:
+                for location, tables in tables_by_loc.items():
+                    self._console.print(Panel(f"[bold magenta]{location}[/]", style="magenta"))
+                    for table in tables:
+                        self._console.print(table)
+                        self._console.print("")
+            else:
+                self._console.log("No shadow group members detected.", style="green")
+
+            # Apply group cleaning
+            for (context_name, dg) in perimeter:
+                shadow_grp_detector.apply_group_cleaning(context_name)
+            shadow_grp_detector.apply_group_cleaning("shared")
+
+            self._console.log(shadow_grp_detector.get_summary())
+
+        # ----------------------------------------------------------------------------------
+        # --              Shadow rule detection (if enabled)                              --
+        # ----------------------------------------------------------------------------------
+        if self._detect_shadow_rules:
+            from ShadowRuleDetector import ShadowRuleDetector
+            self._console.print(
+                Panel("[bold yellow]Detecting shadow/redundant rules",
+                      style="yellow"),
+                justify="left")
+
+            shadow_detector = ShadowRuleDetector(self)
+
+            # Analyze shared location
+            shadow_task = progress.add_task("[ Panorama ] Detecting shadow rules",
+                                            total=len(perimeter) + 1)
+            shared_shadows = shadow_detector.analyze_location("shared")
+            if shared_shadows:
+                self._console.log(f"[ Panorama ] Found {len(shared_shadows)} shadow rule(s)")
+            progress.update(shadow_task, advance=1)
+
+            # Analyze each device-group
+            for (context_name, dg) in perimeter:
+                progress.update(shadow_task, description=f"[ {context_name} ] Detecting shadow rules")
+                shadows = shadow_detector.analyze_location(context_name)
+                if shadows:
+                    self._console.log(f"[ {context_name} ] Found {len(shadows)} shadow rule(s)")
+                progress.update(shadow_task, advance=1)
+
+            progress.remove_task(shadow_task)
+
+            # Print tables grouped by location and shadowing rule
+            tables_by_loc = shadow_detector.get_tables_by_location()
+            if tables_by_loc:
+                for location, tables in tables_by_loc.items():
+                    self._console.print(Panel(f"[bold magenta]{location}[/]", style="magenta"))
+                    for table in tables:
+                        self._console.print(table)
+                        self._console.print("")
+            else:
+                self._console.log("No shadow rules detected.", style="green")
+        else:
+            # ----------------------------------------------------------------------------------
+            # --       Starting objects optimization (from deepest DG to shared)              --
+            # ----------------------------------------------------------------------------------
+            self._console.print(
+                Panel("[bold green] Optimizing objects duplicates",
+                    style="green"),
+                justify="left")
+            # starting objects optimization from the most "depth" device-groups, up to "shared"
+            for depth, contexts in sorted(self._depthed_tree.items(), key=lambda x: x[0], reverse=True):
+                for context_name in contexts:
+                    if self._stage_artifacts and context_name in self._stage_artifacts.completed_locations:
+                        self._console.log(f"[ {context_name} ] Already optimized before the run was interrupted")
+                        continue
+                    if context_name in self._analysis_perimeter['direct'] + self._analysis_perimeter['indirect']:
+                        # initialize the console with a new context name (used when splitting reports)
+                        self.init_console(context_name)
+                        self._console.print(Panel(f"  [bold magenta]{context_name}  ", style="magenta"),
+                                        justify="left")
+
+                        # Initializing a dict (on the global _replacements dict) which will contain information about the replacement
+                        # done for each object type at the current location
+                        self._replacements[context_name] = {'Address': dict(), 'Service': dict(), 'Tag': dict()}
+
+                        if context_name not in ['shared', 'predefined']:
+                            self._panorama.add(self._objects[context_name]['context'])
+
+                        # if unused-only has not been specified (normal use-case), or if it has been used with protect-potential-replacements 
+                        # we need to start an objects optimization for the current context 
+                        # (note that the tiebreak tag will be added to choosen objects at this step)
+                        if self._unused_only is None or self._protect_potential_replacements:
+                            # OBJECTS OPTIMIZATION
+                            dg_optimize_task = progress.add_task(
+                                f"[ {context_name} ] - Optimizing objects",
+                                total=len(self._used_objects_sets[context_name])
+                            )
+                            self.optimize_objects(context_name, progress, dg_optimize_task)
+                            self._console.log(f"[ {context_name} ] Objects optimization done")
+                            progress.remove_task(dg_optimize_task)
+
+                        # if we have not specified an unused-only cleaning operation, we need to replace the non-optimal objects by their processed replacements (in groups, rules, etc)
+                        if self._unused_only is None:
+                            # OBJECTS REPLACEMENT IN GROUPS
+                            dg_replaceingroups_task = progress.add_task(
+                                f"[ {context_name} ] Replacing objects in groups",
+                                total=len(self._replacements[context_name]['Address']) + len(self._replacements[context_name]['Service'])
+                            )
+                            self.replace_object_in_groups(context_name, progress, dg_replaceingroups_task)
+                            self._console.log(f"[ {context_name} ] Objects replaced in groups")
+                            progress.remove_task(dg_replaceingroups_task)
+
+                            # OBJECTS REPLACEMENT IN RULEBASES
+                            dg_replaceinrules_task = progress.add_task(
+                                f"[ {context_name} ] Replacing objects in rules",
+                                total=self.count_rules(context_name)
+                            )
+
+                            self.replace_object_in_rulebase(context_name, progress, dg_replaceinrules_task)
+                            self._console.log(f"[ {context_name} ] Objects replaced in rulebases")
+                            progress.remove_task(dg_replaceinrules_task)
+
+                        # OBJECTS CLEANING (FOR FULLY INCLUDED DEVICE GROUPS ONLY)
+                        if context_name in self._analysis_perimeter['full']:
+                            self.clean_local_object_set(context_name)
+                            self._console.log(f"[ {context_name} ] Objects cleaned (fully included)")
+
+                        if context_name not in ['shared', 'predefined']:
+                            self._panorama.remove(self._objects[context_name]['context'])
+
+                        if self._stage_artifacts:
+                            self.save_checkpoint(context_name, perimeter)
+
+    def run_report_stage(self):
+        """
+        Pipeline stage "report" : displays the cleaning operation result
+
+        :return:
+        """
+
+        self.init_console("report")
+        # Display the cleaning operation result (display again the hierarchy tree, but with the _cleaning_counts
+        # information (deleted / replaced objects of each type for each device-group)
+        self._console.print(Panel(self._dg_hierarchy['shared'].get_tree(self._cleaning_counts)))
+        if self._api_transport:
+            self._console.log(f"[ Panorama ] {self._api_transport.get_summary()}")
+
     def init_console(self, context_name=None):
         """
         Initializes a new rich.Console object if the split_report argument has been specified at startup
@@ -543,16 +815,96 @@ class PaloCleaner:
         """
 
         if not context_name and not self._console:
-            self._console = Console(record=not self._no_report)
+            self._console = Console(record=not self._no_report, force_interactive=False if self._batch else None)
             self._console_context = "init"
         elif context_name and not self._no_report and self._split_report:
             self._console.save_html(self._report_folder+'/'+self._console_context+'.html')
-            self._console = Console(record=True)
+            self._console = Console(record=True, force_interactive=False if self._batch else None)
             self._console_context = context_name
         self._console.log = self.loglevel_decorator(self._console.log)
         self._console.status = self.status_decorator(self._console.status)
         rich.traceback.install(console=self._console)
 
+    def get_worker_device(self) -> Panorama:
+        """
+        Returns a Panorama object to be used by a download thread.
+        pan-os-python stores the last API response on the device XAPI object, which means that a given Panorama
+        object cannot be used by several threads at the same time. Each download thread thus gets its own Panorama
+        object (sharing the API key of the main one)
+
+        :return: (panos.panorama.Panorama) A Panorama object with a dedicated XAPI connection
+        """
+
+        # when working offline, no API call is done : the main Panorama object can be shared
+        if self._config_snapshot or not self._download_threads > 1:
+            return self._panorama
+        return Panorama(self._panorama.hostname, api_key=self._panorama.api_key, port=self._panorama.port)
+
+    def download_devicegroups(self, jobs_queue: Queue, download_errors: list, progress: rich.progress.Progress, task: rich.progress.TaskID, lock=None, thread_id=0):
+        """
+        Downloads objects, rulebases (and hitcounts if needed) of the device-groups found on the jobs_queue
+        Can be run by several threads at the same time (see multithread_wrapper), each device-group being downloaded
+        by a single thread
+
+        :param jobs_queue: (Queue) Queue of tuples (device-group name, DeviceGroup) to be downloaded
+        :param download_errors: (list) List to which exceptions raised while downloading are added
+        :param progress: (rich.progress.Progress) The rich Progress object to update during progression
+        :param task: (rich.progress.TaskID) The rich Task object to update during progression
+        :return:
+        """
+
+        worker_device = self.get_worker_device()
+
+        while True:
+            if jobs_queue.empty() or self.jobs_cancelled(jobs_queue):
+                break
+            context_name, dg = jobs_queue.get()
+            try:
+                # the DeviceGroup is attached to the Panorama object dedicated to the current thread while downloading
+                dg.parent = worker_device
+
+                progress.update(task, description=f"[ {context_name} ] Downloading objects")
+                self.fetch_objects(dg, context_name)
+                self._console.log(f"[ {context_name} ] Objects downloaded ({self.count_objects(context_name)})")
+                progress.update(task, description=f"[ {context_name} ] Downloading rulebases")
+                self.fetch_rulebase(dg, context_name)
+                self._console.log(f"[ {context_name} ] Rulebases downloaded ({self.count_rules(context_name)} rules found)")
+                if self._config_snapshot:
+                    self._config_snapshot.release(context_name)
+
+                # if opstate (hit counts) has to be cared, download on each device member of the device-group
+                # if this device-group has no child device-group
+                if self._need_opstate and not self._reversed_tree.get(context_name):
+                    progress.update(
+                        task,
+                        description=f"[ {context_name} ] Downloading hitcounts (connecting to devices)"
+                    )
+                    self.fetch_hitcounts(dg, context_name)
+            except Exception as e:
+                self._console.log(f"[ {context_name} ] [Thread-{thread_id}] Error while downloading device-group : {e}", style="red")
+                download_errors.append(e)
+            finally:
+                dg.parent = self._panorama
+                jobs_queue.task_done()
+                progress.update(task, advance=1)
+
+    def print_opstate_skipped(self):
+        """
+        Displays the list of appliances for which hitcounts could not be collected (see fetch_hitcounts)
+        Rules of the concerned device-groups are analyzed using the hitcounts of the other member appliances only
+
+        :return:
+        """
+
+        skipped_table = Table(title="Appliances skipped during hitcounts collection", style="red")
+        skipped_table.add_column("Device-group")
+        skipped_table.add_column("Appliance")
+        skipped_table.add_column("Vsys")
+        skipped_table.add_column("Reason")
+        for (fw_ip, fw_vsys), (location_name, reason) in sorted(self._opstate_skipped.items(), key=lambda x: (x[1][0], x[0][0])):
+            skipped_table.add_row(location_name, fw_ip, str(fw_vsys), reason)
+        self._console.log(skipped_table)
+
     def get_devicegroups(self) -> [DeviceGroup]:
         """
         Gets list of DeviceGroups from Panorama
@@ -564,6 +916,13 @@ class PaloCleaner:
         # Gets the DeviceGroup list from Panorama
         # Does not get full tree (only DeviceGroup name instances)
         # Retrieved DG are not added to Panorama as childs (add=False)
+        if self._config_snapshot:
+            dg_list = list()
+            for dg_name in self._config_snapshot.get_devicegroups_names():
+                dg = DeviceGroup(dg_name)
+                dg.parent = self._panorama
+                dg_list.append(dg)
+            return dg_list
         dg_list = DeviceGroup.refreshall(self._panorama, name_only=True, add=False)
         return dg_list
 
@@ -574,7 +933,14 @@ class PaloCleaner:
         """
         try:
             if not self._dg_hierarchy:
-                temp_pano_hierarchy = PanoramaDeviceGroupHierarchy(self._panorama).fetch()
+                if self._config_snapshot:
+                    temp_pano_hierarchy = self._config_snapshot.get_dg_hierarchy()
+                elif self._config_cache and (temp_pano_hierarchy := self._config_cache.get_hierarchy()) is not None:
+                    self._console.log("[ Panorama ] Device-groups hierarchy loaded from cache", level=2)
+                else:
+                    temp_pano_hierarchy = PanoramaDeviceGroupHierarchy(self._panorama).fetch()
+                    if self._config_cache:
+                        self._config_cache.set_hierarchy(temp_pano_hierarchy)
                 shared_dg = HierarchyDG('shared')
                 shared_dg.level = 0
                 self._dg_hierarchy['shared'] = shared_dg
@@ -599,6 +965,7 @@ class PaloCleaner:
 
                 self._analysis_perimeter = HierarchyDG.get_perimeter(self._dg_hierarchy)
                 self._depthed_tree = HierarchyDG.gen_depth_tree(self._dg_hierarchy)
+                self._dg_index = HierarchyDG.gen_index(self._dg_hierarchy)
 
         except Exception as e:
             self._console.log(f"[ Panorama ] Error occurred while parsing device groups : {e}", style="red")
@@ -611,6 +978,9 @@ class PaloCleaner:
         Commenting : OK (15062023)
         :return:
         """
+        # managed devices state is not part of the configuration, thus is not available offline
+        if self._config_snapshot:
+            return
         devices = self._panorama.refresh_devices(expand_vsys=False, include_device_groups=False)
         for fw in devices:
             if fw.state.connected:
@@ -654,6 +1024,351 @@ class PaloCleaner:
         finally:
             return counter
 
+    def refreshall(self, obj_class, parent, add=False):
+        """
+        Gets all instances of obj_class for the provided parent, either from the Panorama XML API, from the
+        configuration cache (--cache-folder), or from the configuration snapshot when working offline (--config-file)
+
+        :param obj_class: (panos.base.PanObject) The pan-os-python class to get instances of (ie : AddressObject)
+        :param parent: (Panorama, DeviceGroup or Rulebase) the panos object to use for polling
+        :param add: (bool) Whether the found instances have to be added as children of the parent
+        :return: (list) List of obj_class instances
+        """
+
+        if self._config_cache or self._prefetched or obj_class in ObjectRecords.RECORD_CLASSES:
+            # instances are built from the configuration subtree, which can be served by the cache (--cache-folder)
+            # or downloaded beforehand (--async-download). Objects are always built this way, as records (see ObjectRecords)
+            class_instance = obj_class()
+            class_instance.parent = parent
+            xpath = class_instance.xpath_nosuffix()
+            instances = self.objects_from_xml(obj_class, self.get_config_subtrees(parent, [xpath])[xpath], parent)
+            if add:
+                parent.removeall(cls=obj_class)
+                parent.extend(instances)
+            return instances
+        if self._config_snapshot:
+            return self._config_snapshot.refreshall(obj_class, parent, add=add)
+        return obj_class.refreshall(parent, add=add)
+
+    def refreshall_type(self, obj_type, parent, add=False):
+        """
+        Gets all instances of the classes of an object type (see OBJECT_TYPES_CLASSES) for the provided parent, if this
+        object type is used by the enabled modes (see plan_fetch)
+
+        :param obj_type: (str) The object type ("Address", "Tag", "Service" or "Schedule")
+        :param parent: (Panorama or DeviceGroup) the panos object to use for polling
+        :param add: (bool) Whether the found instances have to be added as children of the parent
+        :return: (list) List of instances (empty if the object type is not downloaded)
+        """
+
+        if obj_type not in self._fetch_object_types:
+            return list()
+        return [x for obj_class in OBJECT_TYPES_CLASSES[obj_type] for x in self.refreshall(obj_class, parent, add=add)]
+
+    def objects_from_xml(self, obj_class, xml, parent):
+        """
+        Builds the instances of obj_class for each entry of the provided XML configuration element
+        Objects and rules are built as records (see ObjectRecords)
+
+        :param obj_class: (panos.base.PanObject) The pan-os-python class to instantiate (ie : SecurityRule)
+        :param xml: (xml.etree.ElementTree.Element) The XML element containing the entries (ie : <rules>), or None
+        :param parent: (panos.base.PanObject) The parent of the created instances
+        :return: (list) List of obj_class instances
+        """
+
+        if obj_class in ObjectRecords.RECORD_CLASSES:
+            return ObjectRecords.build_from_xml(obj_class, xml, parent)
+        class_instance = obj_class()
+        class_instance.parent = parent
+        return class_instance.refreshall_from_xml(xml)
+
+    def get_config_subtrees(self, context, xpaths):
+        """
+        Gets the configuration elements matching the provided xpaths, using a single XML API request (xpaths union)
+        or from the configuration snapshot when working offline (--config-file)
+        If the union request is refused by the XML API, each xpath is requested separately
+        When using --cache-folder, elements are taken from the cache if the location has not been changed since the
+        last run, and downloaded elements are added to the cache
+        When using --async-download, elements already downloaded by prefetch_configuration() are used
+
+        :param context: (Panorama or DeviceGroup) the panos object to use for polling
+        :param xpaths: (list) List of absolute xpaths (ie : PreRulebase().xpath()), each of them ending with a distinct tag
+        :return: (dict) Dict where the key is the xpath and the value is the matching element (or None if not found)
+        """
+
+        if self._config_snapshot:
+            return {xpath: self._config_snapshot.find(xpath) for xpath in xpaths}
+
+        location_name = context.name if type(context) is DeviceGroup else 'shared'
+        if self._config_cache and (subtrees := self._config_cache.get(location_name, xpaths)) is not None:
+            return subtrees
+
+        if (prefetched := self._prefetched.get(location_name)) and all(xpath in prefetched for xpath in xpaths):
+            # prefetched elements are removed once used, to release memory
+            subtrees = {xpath: prefetched.pop(xpath) for xpath in xpaths}
+        else:
+            # elements are returned on the <result> tag of the response, and are identified by their tag name
+            xpaths_tags = {xpath.rsplit('/', 1)[-1]: xpath for xpath in xpaths}
+            try:
+                responses = [context.nearest_pandevice().xapi.get("|".join(xpaths))]
+            except PanXapiError as e:
+                self._console.log(f"[ {context} ] Multiple xpaths request refused ({e}). Requesting each xpath separately", level=2)
+                responses = [context.nearest_pandevice().xapi.get(xpath) for xpath in xpaths]
+
+            subtrees = {xpath: None for xpath in xpaths}
+            for response in responses:
+                for element in response.findall("./result/*"):
+                    if element.tag in xpaths_tags:
+                        subtrees[xpaths_tags[element.tag]] = element
+        if self._config_cache:
+            self._config_cache.put(location_name, subtrees)
+        return subtrees
+
+    def get_location_xpaths(self, context) -> [str]:
+        """
+        Returns the xpaths of the configuration subtrees from which the objects and rulebases of a location are built
+        (same xpaths than the ones requested by fetch_objects() and fetch_rulebase())
+
+        :param context: (Panorama or DeviceGroup) the panos object of the location
+        :return: (list) List of absolute xpaths
+        """
+
+        xpaths = list()
+        for obj_class in [x for obj_type in self._fetch_object_types for x in OBJECT_TYPES_CLASSES[obj_type]]:
+            class_instance = obj_class()
+            class_instance.parent = context
+            xpaths.append(class_instance.xpath_nosuffix())
+        for rb in [PreRulebase(), PostRulebase(), Rulebase()]:
+            rb.parent = context
+            xpaths.append(rb.xpath())
+        return xpaths
+
+    def prefetch_configuration(self, locations):
+        """
+        Downloads concurrently the objects and rulebases subtrees of all the provided locations (--async-download),
+        with a global limit of in-flight requests (--max-inflight-requests). The subtrees are stored on self._prefetched
+        and used by get_config_subtrees()
+        Locations which can be loaded from the configuration cache are not downloaded. Subtrees which could not be
+        downloaded are requested again by the usual (synchronous) download
+
+        :param locations: (list) List of tuples (location name, Panorama or DeviceGroup object)
+        :return:
+        """
+
+        jobs = dict()
+        for location_name, context in locations:
+            xpaths = self.get_location_xpaths(context)
+            if self._config_cache and self._config_cache.get(location_name, xpaths) is not None:
+                continue
+            jobs[location_name] = xpaths
+        if not jobs:
+            return
+
+        # asyncio is only loaded when the asynchronous download is requested
+        import AsyncDownloader
+        self._prefetched, failures, duration = AsyncDownloader.download_subtrees(
+            self._panorama.hostname, self._panorama.port, self._panorama.api_key, jobs,
+            self._max_inflight_requests, self._api_retries, self._api_transport
+        )
+        self._console.log(f"[ Panorama ] Configuration of {len(jobs)} locations downloaded in {duration:.1f}s ({sum(len(x) for x in jobs.values())} requests, {len(failures)} failed)")
+        for (location_name, xpath), error in failures.items():
+            self._console.log(f"[ {location_name} ] Error while downloading {xpath} : {error}. Will be downloaded again", style="red", level=2)
+
+    def init_session_cassette(self):
+        """
+        Initializes the SessionCassette on which the API requests are recorded (--record-session), or from which they
+        are replayed (--replay-session)
+        When replaying, the hitcounts timestamps limits are computed from the recording time, so that the same rules are
+        protected than on the recorded run
+
+        :return: (SessionCassette) The cassette, or None if the session is not recorded or replayed
+        """
+
+        if self._record_session:
+            return SessionCassette(self._record_session)
+        if not self._replay_session:
+            return None
+
+        cassette = SessionCassette(self._replay_session, replay=True, replay_latency=self._replay_latency == "original")
+        time_shift = int(cassette.recorded_at - time.time())
+        if self._max_change_timestamp:
+            self._max_change_timestamp += time_shift
+        if self._max_hit_timestamp:
+            self._max_hit_timestamp += time_shift
+        self._console.log(f"[ Panorama ] Replaying API session recorded on {time.strftime('%Y/%m/%d %H:%M:%S', time.localtime(cassette.recorded_at))} from {self._replay_session} ({self._replay_latency} latency)")
+        return cassette
+
+    def init_stage_artifacts(self):
+        """
+        Initializes the StageArtifacts on which the output of each pipeline stage is saved (--stages-folder)
+        When starting from a later stage (--from-stage), the datastructures are loaded from the artifact of the previous
+        stage, and the hitcounts timestamps limits are computed from the download time (as when replaying a session)
+        When resuming an interrupted run (--resume), they are loaded from the optimize stage checkpoint if it exists
+        (with the objects deleted after this checkpoint), or from the artifact of the last completed stage
+
+        :return: (list) The names of the device-groups of the analysis perimeter if loaded from an artifact, None otherwise
+        """
+
+        self._stage_artifacts = StageArtifacts(self._stages_folder, self._panorama, self._fetch_arguments)
+        from_checkpoint = False
+        if self._resume:
+            self._from_stage, from_checkpoint = self._stage_artifacts.get_resume_point()
+        if not self._from_stage:
+            return None
+
+        previous_stage = CHECKPOINT_NAME if from_checkpoint else PIPELINE_STAGES[PIPELINE_STAGES.index(self._from_stage) - 1]
+        perimeter, state = self._stage_artifacts.load(previous_stage)
+        if self._resume and self._from_stage == "optimize":
+            self._applied_deletions = self._stage_artifacts.load_journal()
+            self._console.log(f"[ Panorama ] Resuming optimize stage ({len(self._stage_artifacts.completed_locations)} locations already optimized, {len(self._applied_deletions)} objects deleted after the last checkpoint)")
+        for attribute, value in state.items():
+            setattr(self, attribute, value)
+        self._dg_index = HierarchyDG.gen_index(self._dg_hierarchy)
+        time_shift = int(self._stage_artifacts.fetched_at - time.time())
+        if self._max_change_timestamp:
+            self._max_change_timestamp += time_shift
+        if self._max_hit_timestamp:
+            self._max_hit_timestamp += time_shift
+        # the tiebreak tag can be changed when starting from a later stage
+        self.validate_tiebreak_tag()
+        self.build_name_resolution()
+        self._console.log(f"[ Panorama ] Starting from stage {self._from_stage} with the saved output {self._stage_artifacts.get_path(previous_stage)} (configuration downloaded on {time.strftime('%Y/%m/%d %H:%M:%S', time.localtime(self._stage_artifacts.fetched_at))})")
+        return perimeter
+
+    def save_stage_artifact(self, stage: str, perimeter: [(str, DeviceGroup)]):
+        """
+        Saves the output (datastructures) of a pipeline stage on the stages folder
+
+        :param stage: (str) The stage name
+        :param perimeter: (list) List of tuples (device-group name, DeviceGroup object) included in the analysis perimeter
+        :return:
+        """
+
+        start_time = time.time()
+        size = self._stage_artifacts.save(stage, [x[0] for x in perimeter], {x: getattr(self, x) for x in STATE_ATTRIBUTES})
+        self._console.log(f"[ Panorama ] Stage {stage} output saved to {self._stage_artifacts.get_path(stage)} ({size / 1000000:.1f} MB, {time.time() - start_time:.1f} seconds)")
+        if stage == "optimize":
+            # the checkpoint and journal are not needed anymore once the whole stage output is saved
+            self._stage_artifacts.clear("report")
+
+    def save_checkpoint(self, location_name: str, perimeter: [(str, DeviceGroup)]):
+        """
+        Called once the optimization of a location is completed (all its changes have been applied). Saves a checkpoint
+        of the optimize stage if the previous one is older than the checkpoint interval, and resets the journal of the
+        objects deleted since the previous checkpoint
+
+        :param location_name: (str) The name of the optimized location
+        :param perimeter: (list) List of tuples (device-group name, DeviceGroup object) included in the analysis perimeter
+        :return:
+        """
+
+        self._stage_artifacts.completed_locations.append(location_name)
+        if time.time() - self._stage_artifacts.saved_at < self._checkpoint_interval:
+            return
+        start_time = time.time()
+        self._stage_artifacts.save(CHECKPOINT_NAME, [x[0] for x in perimeter], {x: getattr(self, x) for x in STATE_ATTRIBUTES})
+        self._stage_artifacts.reset_journal()
+        self._console.log(f"[ {location_name} ] Checkpoint saved ({len(self._stage_artifacts.completed_locations)} locations optimized, {time.time() - start_time:.1f} seconds)", level=2)
+
+    def init_config_cache(self):
+        """
+        Loads the configuration cache of the Panorama (--cache-folder) and finds the locations changed since it has
+        been written, using the Panorama configuration logs.
+        If the configuration logs cannot be used, the cache is ignored for this run (all locations are downloaded)
+
+        :return:
+        """
+
+        self._config_cache = ConfigCache(self._cache_folder, self._panorama.hostname)
+        try:
+            self._config_cache.load()
+            changed_locations = self._config_cache.update_changed_locations(self._panorama)
+        except (OSError, ValueError, PanXapiError) as e:
+            self._console.log(f"[ Panorama ] Error while loading configuration cache from {self._cache_folder} : {e}. All locations will be downloaded", style="red")
+            return
+        if changed_locations is None:
+            self._console.log("[ Panorama ] Configuration cache is empty or outdated. All locations will be downloaded")
+        else:
+            self._console.log(f"[ Panorama ] Configuration cache loaded. Locations changed since last run : {sorted(x for x in changed_locations if x) or 'none'}")
+
+    def init_hitcount_cache(self):
+        """
+        Loads the hitcounts cache of the Panorama (--hitcounts-cache-ttl), stored on the --cache-folder
+        If the cache cannot be read, hitcounts are collected from all appliances
+
+        :return:
+        """
+
+        self._hitcount_cache = HitcountCache(self._cache_folder, self._panorama.hostname, self._hitcounts_cache_ttl * 3600,
+                                             force_refresh=self._refresh_hitcounts)
+        try:
+            self._hitcount_cache.load()
+        except (OSError, ValueError, KeyError) as e:
+            self._console.log(f"[ Panorama ] Error while loading hitcounts cache from {self._cache_folder} : {e}. Hitcounts will be collected from all appliances", style="red")
+            return
+        if self._refresh_hitcounts:
+            self._console.log("[ Panorama ] Hitcounts refresh requested. Hitcounts will be collected from all appliances")
+
+    @staticmethod
+    def hitcounts_to_cache(hitcounts):
+        """
+        Converts the hitcounts of rulebases to the format stored on the HitcountCache
+
+        :param hitcounts: (dict) Dict where the key is the rulebase name and the value is a dict of panos.policies.HitCount
+            (or AggregatedHitCount) per rule name
+        :return: (dict) Dict where the key is the rulebase name and the value is a dict of counters values per rule name
+        """
+
+        return {
+            rulebase: {rule: {x: getattr(counters, x) or 0 for x in HITCOUNT_COUNTERS} for rule, counters in rules.items()}
+            for rulebase, rules in hitcounts.items()
+        }
+
+    @staticmethod
+    def hitcounts_from_cache(hitcounts):
+        """
+        Converts the hitcounts of rulebases stored on the HitcountCache to AggregatedHitCount objects (see hitcounts_to_cache)
+
+        :param hitcounts: (dict) Dict where the key is the rulebase name and the value is a dict of counters values per rule name
+        :return: (dict) Dict where the key is the rulebase name and the value is a dict of AggregatedHitCount per rule name
+        """
+
+        return {
+            rulebase: {rule: AggregatedHitCount(**counters) for rule, counters in rules.items()}
+            for rulebase, rules in hitcounts.items()
+        }
+
+    def get_predefined_services(self, predef):
+        """
+        Gets the predefined services from the configuration snapshot when working offline (--config-file), or from
+        the configuration cache (--cache-folder) if it has been stored for the content version currently installed
+        on Panorama. Else, predefined services are downloaded and added to the cache
+
+        :param predef: (panos.predefined.Predefined) The Predefined instance (attached to Panorama) to be used as parent
+        :return: (list) List of predefined ServiceObject
+        """
+
+        service_instance = ServiceObject()
+        service_instance.parent = predef
+        xpath = service_instance.xpath_nosuffix()
+
+        if self._config_snapshot:
+            services_root = self._config_snapshot.find(xpath)
+        else:
+            content_version = self._panorama.show_system_info()["system"].get("app-version")
+            if (services_root := self._config_cache.get_predefined(content_version)) is not None:
+                self._console.log(f"[ Panorama ] Predefined services loaded from cache (content version {content_version})", level=2)
+            else:
+                services_root = self._panorama.xapi.get(xpath).find("./result/service")
+                self._config_cache.set_predefined(content_version, services_root)
+
+        services = list()
+        for entry in services_root if services_root is not None else list():
+            service = ServiceObject()
+            service.refresh(xml=entry)
+            services.append(service)
+        return services
+
     def fetch_objects(self, context, location_name):
         """
         Gets the list of objects (AddressObject,AddressGroup,Tag,ServiceObject,ServiceGroup) for the provided location
@@ -673,8 +1388,12 @@ class PaloCleaner:
             # if location_name is "predefined", only download Predefined objects type (normally only services)
             predef = Predefined()
             self._panorama.add(predef)
-            predef.refreshall()
-            self._objects[location_name]['Service'] = [v for k, v in predef.service_objects.items()]
+            if self._config_snapshot or self._config_cache:
+                self._objects[location_name]['Service'] = self.get_predefined_services(predef)
+            else:
+                # (predefined applications are not used, only services are downloaded)
+                predef.refreshall_services()
+                self._objects[location_name]['Service'] = [v for k, v in predef.service_objects.items()]
             # context object is stored on the dict for further usage
             self._objects[location_name]['context'] = context
             for obj_type in ['Address', 'Tag']:
@@ -689,8 +1408,8 @@ class PaloCleaner:
             self._objects[location_name]['context'] = context
 
             # download all AddressObjects and AddressGroups for the location, and add it to the 'Address' key
-            self._objects[location_name]['Address'] = AddressObject.refreshall(context, add=False) + \
-                                                      AddressGroup.refreshall(context, add=False)
+            # (object types which are not used by the enabled modes are not downloaded, see plan_fetch)
+            self._objects[location_name]['Address'] = self.refreshall_type("Address", context)
 
             # populate the _addr_namesearch structure which permits to find AddressObjects and AddressGroups by name
             self._addr_namesearch[location_name] = {x.name: x for x in self._objects[location_name]['Address']}
@@ -698,12 +1417,19 @@ class PaloCleaner:
 
             # initialize specific search structures
             self._addr_ipsearch[location_name] = dict()
+            self._addr_group_valuesearch[location_name] = dict()
             self._tag_objsearch[location_name] = dict()
             self._schedule_namesearch[location_name] = dict()
 
-            # populate IP and tag search structures for all Address objects (AddressObject and AddressGroup)
+            # all distinct FQDN values of the location are resolved concurrently before populating the search structures
+            # (names already resolved at another location are found on the resolver cache)
+            if self._dns_resolver:
+                self._dns_resolver.resolve_all(obj.value for obj in self._objects[location_name]['Address']
+                                               if isinstance(obj, panos.objects.AddressObject) and obj.type == "fqdn")
+
+            # populate IP, group value and tag search structures for all Address objects (AddressObject and AddressGroup)
             for obj in self._objects[location_name]['Address']:
-                if type(obj) is panos.objects.AddressObject:
+                if isinstance(obj, panos.objects.AddressObject):
                     # call to hostify_address to remove /32 for host addresses (keeps mask for subnets)
                     addr, dns_res = PaloCleanerTools.hostify_address(obj.value, self._dns_resolver)
 
@@ -714,13 +1440,20 @@ class PaloCleaner:
                         if dns_res not in self._addr_ipsearch[location_name].keys():
                             self._addr_ipsearch[location_name][dns_res] = list()
                         self._addr_ipsearch[location_name][dns_res].append(obj)
-                        self._dns_resolutions[dns_res] = addr
+                        # _dns_resolutions is shared between all locations (can be populated concurrently)
+                        with self._datastructures_lock:
+                            self._dns_resolutions[dns_res] = addr
 
                     if addr not in self._addr_ipsearch[location_name].keys():
                         self._addr_ipsearch[location_name][addr] = list()
                     self._addr_ipsearch[location_name][addr].append(obj)
 
-                if type(obj) in [panos.objects.AddressObject, panos.objects.AddressGroup]:
+                elif isinstance(obj, panos.objects.AddressGroup) and (group_key := PaloCleanerTools.get_group_key(obj)):
+                    # add the group to the _addr_group_valuesearch structure which permits to find all AddressGroups
+                    # for a given location having the same static members or DAG condition
+                    self._addr_group_valuesearch[location_name].setdefault(group_key, list()).append(obj)
+
+                if isinstance(obj, (panos.objects.AddressObject, panos.objects.AddressGroup)):
                     # if the object has tags, add it to the _tag_objsearch structure which permits to find all
                     # AddressObjects and AddressGroups at a given location having a certain tag
                     # (a given object is added to each self._tag_objsearch[location_name][t] for each tag it uses)
@@ -733,20 +1466,19 @@ class PaloCleaner:
             self._console.log(f"[ {location_name} ] Objects ipsearch structures initialized", level=2)
 
             # download all Tag objects for the location, and add it to the 'Tag' key
-            self._objects[location_name]['Tag'] = Tag.refreshall(context, add=False)
+            self._objects[location_name]['Tag'] = self.refreshall_type("Tag", context)
             # populate the _tag_namesearch structure which permits to find Tags by name
             self._tag_namesearch[location_name] = {x.name: x for x in self._objects[location_name]['Tag']}
             self._console.log(f"[ {location_name} ] Tags namesearch structure initialized", level=2)
 
             # download all ServiceObject and ServiceGroups for the location, and add it to the 'Service' key
-            self._objects[location_name]['Service'] = ServiceObject.refreshall(context, add=False) + \
-                                                      ServiceGroup.refreshall(context, add=False)
+            self._objects[location_name]['Service'] = self.refreshall_type("Service", context)
             # populate the _service_namesearch structure which permits to find Services by name
             self._service_namesearch[location_name] = {x.name: x for x in self._objects[location_name]['Service']}
             self._console.log(f"[ {location_name} ] Services namesearch structures initialized", level=2)
 
             # download all ScheduleObject and add it to the Schedules key, + populate name search structure
-            self._objects[location_name]['Schedule'] = ScheduleObject.refreshall(context)
+            self._objects[location_name]['Schedule'] = self.refreshall_type("Schedule", context, add=True)
             self._schedule_namesearch[location_name] = {x.name: x for x in self._objects[location_name]['Schedule']}
             self._console.log(f"[ {location_name} ] Schedules namesearch structures initialized", level=2)
 
@@ -754,7 +1486,7 @@ class PaloCleaner:
         # Services by "stringified" value (see PaloCleanerTools.stringify_service())
         self._service_valuesearch[location_name] = dict()
         for obj in self._objects[location_name]['Service']:
-            if type(obj) is ServiceObject:
+            if isinstance(obj, ServiceObject):
                 serv_string = PaloCleanerTools.stringify_service(obj)
                 if serv_string not in self._service_valuesearch[location_name].keys():
                     self._service_valuesearch[location_name][serv_string] = list()
@@ -778,24 +1510,33 @@ class PaloCleaner:
         # create a "context" key on the current location dict which will contain the current location DeviceGroup object
         self._rulebases[location_name]['context'] = context
 
-        for ruletype in repl_map:
-            rulebases = [PreRulebase(), PostRulebase()]
-
-            # SecurityRule type has a "Default Rule" section, which is not considered PreRulebase() nor PostRulebase()
-            if ruletype is SecurityRule:
-                rulebases += [Rulebase()]
+        # add the rulebases to the context and get their whole subtrees at once
+        # (instead of one refreshall() request per RuleType / Rulebase tuple)
+        rulebases = [PreRulebase(), PostRulebase(), Rulebase()]
+        for rb in rulebases:
+            context.add(rb)
+        rulebases_subtrees = self.get_config_subtrees(context, [rb.xpath() for rb in rulebases])
 
+        # (rule types which are not used by the enabled modes are not downloaded, see plan_fetch)
+        for ruletype in self._fetch_rule_types:
             for rb in rulebases:
-                # add the current rulebase to the context
-                context.add(rb)
-
-                # get all rules for the given RuleType / Rulebase tuple
-                self._rulebases[location_name][rb.__class__.__name__+"_"+ruletype.__name__] = ruletype.refreshall(
-                    rb,
-                    add=False)
+                # SecurityRule type has a "Default Rule" section, which is not considered PreRulebase() nor PostRulebase()
+                if type(rb) is Rulebase and ruletype is not SecurityRule:
+                    continue
 
-                # Remove rulebase from DG
-                context.remove(rb)
+                # find the rules root element for the given RuleType / Rulebase tuple on the rulebase subtree
+                # and build all rules from it
+                ruletype_instance = ruletype()
+                ruletype_instance.parent = rb
+                rules_root = None
+                if (rb_subtree := rulebases_subtrees.get(rb.xpath())) is not None:
+                    rules_root = rb_subtree.find("." + ruletype_instance.xpath_nosuffix()[len(rb.xpath()):])
+                self._rulebases[location_name][rb.__class__.__name__+"_"+ruletype.__name__] = \
+                    self.objects_from_xml(ruletype, rules_root, rb)
+
+        # Remove rulebases from DG
+        for rb in rulebases:
+            context.remove(rb)
         #self._rulebases[location_name]['context'].children=list()
 
     def fetch_hitcounts(self, context, location_name):
@@ -807,6 +1548,12 @@ class PaloCleaner:
         If no devices are running PAN-OS 9+ for the concerned device-group, the rule_modification_timestamps
         is get from Panorama
 
+        Member firewalls of the device-group are registered on self._opstate_members, and polled once all
+        device-groups have been downloaded (see collect_firewalls_hitcounts)
+
+        When using --hitcounts-source panorama, the hitcounts aggregated by Panorama from the member devices are used
+        instead (see get_panorama_hitcounts). Firewalls are polled only if Panorama cannot provide them
+
         Commenting : OK (15062023)
 
         :param context: (panos.DeviceGroup) DeviceGroup object
@@ -814,27 +1561,33 @@ class PaloCleaner:
         :return:
         """
 
-        # get the Firewall() objects instance for the current context
-        dg_firewalls = Firewall.refreshall(context)
-        rulebases = [x.__name__.replace('Rule', '').lower() for x in repl_map]
-        interest_counters = ["last_hit_timestamp", "rule_modification_timestamp"]
-        # 23022022 - Seems that hit timestamps can only be get from device
-        # while last modification timestamp has to be get from Panorama
-        #interest_counters = ["last_hit_timestamp"]
-        self._hitcounts[location_name] = ({x: dict() for x in rulebases})
-        min_member_major_version = 0
-
-        def populate_hitcounts(rulebase_name, opstate):
-            for rule, counters in opstate.items():
-                if not (res := self._hitcounts[location_name][rulebase_name].get(rule)):
-                    self._hitcounts[location_name][rulebase_name][rule] = {
-                        x: countval if (countval := getattr(counters, x)) else 0 for x in interest_counters}
-                else:
-                    for ic in interest_counters:
-                        if (countval := getattr(counters, ic)):
-                            self._hitcounts[location_name][rulebase_name][rule][ic] = max(res[ic], countval)
+        self._hitcounts[location_name] = ({x: dict() for x in self._hitcount_rulebases})
+
+        if self._hitcounts_source == "panorama":
+            if self._hitcount_cache and (cached_hitcounts := self._hitcount_cache.get_device_group(location_name, self._hitcount_rulebases)) is not None:
+                for rulebase, ans in self.hitcounts_from_cache(cached_hitcounts).items():
+                    if rulebase in self._hitcount_rulebases:
+                        self.populate_hitcounts(location_name, rulebase, ans)
+                self._console.log(f"[ {location_name} ] Hitcounts aggregated by Panorama loaded from cache", level=2)
+                return
+            try:
+                if (panorama_hitcounts := self.get_panorama_hitcounts(context, location_name, self._hitcount_rulebases)):
+                    for rulebase, ans in panorama_hitcounts.items():
+                        self.populate_hitcounts(location_name, rulebase, ans)
+                    if self._hitcount_cache:
+                        self._hitcount_cache.put_device_group(location_name, self.hitcounts_to_cache(panorama_hitcounts))
+                    self._console.log(f"[ {location_name} ] Hitcounts aggregated by Panorama downloaded", level=2)
+                    return
+                self._console.log(f"[ {location_name} ] No hitcounts aggregated by Panorama. Getting hitcounts from member firewalls")
+            except (PanDeviceError, PanXapiError) as e:
+                self._console.log(f"[ {location_name} ] Cannot get hitcounts aggregated by Panorama ({e}). Getting hitcounts from member firewalls",
+                                  style="red")
 
-        for fw in dg_firewalls:
+        # member firewalls of the device-group are registered, and will be polled once all device-groups have been
+        # downloaded (see collect_firewalls_hitcounts), so that each appliance is polled only once for all its vsys
+        with self._datastructures_lock:
+            self._opstate_locations[location_name] = context
+        for fw in Firewall.refreshall(context):
             # get the device information from _panorama_devices using the firewall appliance serial number
             device = self._panorama_devices.get(getattr(fw, "serial"))
             if device:
@@ -842,39 +1595,227 @@ class PaloCleaner:
                 fw_ip = system_settings.ip_address
 
                 # if the current firewall instance has not been ignored using the --ignore-appliances-opstate argument
-                # connect to it to get the opstate values
+                # register it to get the opstate values
                 if fw_ip not in self._ignore_opstate_ip:
-                    fw_vsys = getattr(fw, "vsys")
-                    fw_conn = Firewall(fw_ip, self._panorama_user, self._panorama_password, vsys=fw_vsys)
-                    # TODO : timeout connection + retry ?
-                    self._console.log(f"[ {location_name} ] Connecting to firewall {fw_ip} on vsys {fw_vsys}")
-                    fw_panos_version = fw_conn.refresh_system_info().version
-                    if (current_major_version := int(fw_panos_version.split('.')[0])) > min_member_major_version:
-                        min_member_major_version = current_major_version
-                    self._console.log(f"[ {location_name} ] Detected PAN-OS version on {fw_ip} : {fw_panos_version}",
-                                      level=2)
-                    rb = Rulebase()
-                    fw_conn.add(rb)
-                    # iterat through each rulebase to get opstate information
-                    for rulebase in rulebases:
-                        ans = rb.opstate.hit_count.refresh(rulebase, all_rules=True)
-                        # call to the populate_hitcounts() function to populate information on the _hitcounts structure
-                        populate_hitcounts(rulebase, ans)
+                    with self._datastructures_lock:
+                        self._opstate_members.setdefault(fw_ip, dict()).setdefault(getattr(fw, "vsys"), list()).append(location_name)
             else:
                 self._console.log(f"[ {location_name} ] Appliance with SN {getattr(fw, 'serial')} has not been found !",
                                   style="red")
+        self._console.log(f"[ {location_name} ] Member firewalls registered for hitcounts collection", level=2)
 
-        if min_member_major_version < 9:
-            # if we did not found any member firewall with PANOS >= 9, we need to get the rule modification timestamp
-            # from Panorama for this context
-            self._console.log(
-                f"[ {location_name} ] Not found any member with PAN-OS version >= 9. Getting rule modification timestamp from Panorama",
-                level=2)
-            for rb_type in [PreRulebase(), PostRulebase()]:
-                context.add(rb_type)
-                for rulebase in rulebases:
-                    ans = rb_type.opstate.hit_count.refresh(rulebase, all_rules=True)
-                    populate_hitcounts(rulebase, ans)
+    def populate_hitcounts(self, location_name, rulebase_name, opstate):
+        """
+        Merges the hitcounts of a rulebase on the _hitcounts structure of a location
+        The most recent timestamps are kept when hitcounts are received from several appliances
+
+        :param location_name: (string) The location name (= DeviceGroup name)
+        :param rulebase_name: (string) The rulebase name used on the _hitcounts structure (ie : "security")
+        :param opstate: (dict) Dict where the key is the rule name and the value is a panos.policies.HitCount (or AggregatedHitCount)
+        :return:
+        """
+
+        for rule, counters in opstate.items():
+            if not (res := self._hitcounts[location_name][rulebase_name].get(rule)):
+                self._hitcounts[location_name][rulebase_name][rule] = {
+                    x: countval if (countval := getattr(counters, x)) else 0 for x in HITCOUNT_COUNTERS}
+            else:
+                for ic in HITCOUNT_COUNTERS:
+                    if (countval := getattr(counters, ic)):
+                        self._hitcounts[location_name][rulebase_name][rule][ic] = max(res[ic], countval)
+
+    def collect_firewalls_hitcounts(self):
+        """
+        Gets the hitcounts from the member firewalls registered by fetch_hitcounts() for all device-groups, and
+        routes them to the _hitcounts structure of each device-group
+        Each appliance is connected only once per run (single API key generation and system information request), and
+        the hitcounts of all its vsys are collected on this connection, whatever the device-groups they belong to
+
+        Appliances are polled concurrently (--opstate-threads), with a timeout on each API request (--opstate-timeout),
+        a bounded number of retries (--opstate-retries) and a global deadline (--opstate-deadline).
+        Appliances which could not be polled are skipped and listed on self._opstate_skipped
+        When using --hitcounts-cache-ttl, appliances whose hitcounts have been cached by a previous run are not polled
+
+        If no member firewall running PAN-OS 9+ has been polled for a device-group, the rule_modification_timestamps
+        of its rules are get from Panorama
+
+        :return:
+        """
+
+        # highest PAN-OS major version of the polled member firewalls, per device-group
+        members_major_version = {x: 0 for x in self._opstate_locations}
+        merge_lock = Lock()
+        cached_members = list()
+
+        def merge_appliance_hitcounts(fw_vsys_locations, fw_panos_version, fw_hitcounts):
+            """
+            Routes the hitcounts of each vsys of an appliance to the device-groups it belongs to
+
+            :param fw_vsys_locations: (dict) Dict {vsys: [locations names]} of the appliance
+            :param fw_panos_version: (string) The PAN-OS version of the appliance
+            :param fw_hitcounts: (dict) Dict of hitcounts per vsys, then per rulebase name, then per rule name
+            :return:
+            """
+
+            with merge_lock:
+                current_major_version = int(fw_panos_version.split('.')[0])
+                for fw_vsys, locations in fw_vsys_locations.items():
+                    for location_name in locations:
+                        members_major_version[location_name] = max(members_major_version[location_name], current_major_version)
+                        for rulebase, ans in fw_hitcounts[fw_vsys].items():
+                            if rulebase in self._hitcount_rulebases:
+                                self.populate_hitcounts(location_name, rulebase, ans)
+
+        def collect_opstate(jobs_queue, lock=None, thread_id=0):
+            """
+            Connects to each appliance found on the jobs_queue to get its PAN-OS version and hitcounts for all
+            rulebases of all its registered vsys. Failed appliances are retried up to --opstate-retries times, and are
+            skipped if still failing or if the --opstate-deadline has been reached.
+            Hitcounts of an appliance are merged in the _hitcounts structure only once they have all been collected
+
+            :param jobs_queue: (Queue) Queue of tuples (firewall IP address, dict {vsys: [locations names]}) to be polled
+            :return:
+            """
+
+            while True:
+                if jobs_queue.empty() or self.jobs_cancelled(jobs_queue):
+                    break
+                fw_ip, fw_vsys_locations = jobs_queue.get()
+                locations_str = ", ".join(sorted({x for locations in fw_vsys_locations.values() for x in locations}))
+                vsys_str = ", ".join(str(x) for x in fw_vsys_locations)
+                try:
+                    if self._hitcount_cache and (cached := self._hitcount_cache.get_appliance(fw_ip, list(fw_vsys_locations), self._hitcount_rulebases)):
+                        self._console.log(f"[ {locations_str} ] Hitcounts of firewall {fw_ip} for vsys {vsys_str} loaded from cache", level=2)
+                        merge_appliance_hitcounts(fw_vsys_locations, cached[0], {x: self.hitcounts_from_cache(y) for x, y in cached[1].items()})
+                        with merge_lock:
+                            cached_members.append(fw_ip)
+                        continue
+
+                    skip_reason = None
+                    for attempt in range(self._opstate_retries + 1):
+                        # the API requests timeout cannot exceed the remaining time before the global deadline
+                        timeout = self._opstate_timeout
+                        if self._opstate_deadline:
+                            if (remaining := self._opstate_deadline - time.time()) <= 0:
+                                skip_reason = "hitcounts collection deadline reached" + (f" after {attempt} failed attempts" if attempt else "")
+                                break
+                            timeout = max(1, min(timeout, math.ceil(remaining)))
+                        try:
+                            self._console.log(f"[ {locations_str} ] Connecting to firewall {fw_ip} for vsys {vsys_str}" +
+                                              (f" (retry {attempt}/{self._opstate_retries})" if attempt else ""))
+                            fw_conn = Firewall(fw_ip, self._panorama_user, self._panorama_password, timeout=timeout)
+                            fw_panos_version = fw_conn.refresh_system_info().version
+                            self._console.log(f"[ {locations_str} ] Detected PAN-OS version on {fw_ip} : {fw_panos_version}",
+                                              level=2)
+                            # get opstate information of each rulebase, for each vsys
+                            fw_hitcounts = {fw_vsys: self.get_firewall_hitcounts(fw_conn, fw_vsys) for fw_vsys in fw_vsys_locations}
+                        except Exception as e:
+                            skip_reason = f"{type(e).__name__} : {e}"
+                            self._console.log(f"[ {locations_str} ] Error while getting hitcounts from {fw_ip} : {skip_reason}",
+                                              style="red")
+                            continue
+
+                        # route the hitcounts of each vsys to the device-groups it belongs to
+                        merge_appliance_hitcounts(fw_vsys_locations, fw_panos_version, fw_hitcounts)
+                        if self._hitcount_cache:
+                            self._hitcount_cache.put_appliance(fw_ip, fw_panos_version, {x: self.hitcounts_to_cache(y) for x, y in fw_hitcounts.items()})
+                        skip_reason = None
+                        break
+                    else:
+                        skip_reason = f"{self._opstate_retries + 1} failed attempts (last error : {skip_reason})"
+
+                    if skip_reason:
+                        self._console.log(f"[ {locations_str} ] Skipping hitcounts of firewall {fw_ip} : {skip_reason}",
+                                          style="red")
+                        with self._datastructures_lock:
+                            for fw_vsys, locations in fw_vsys_locations.items():
+                                self._opstate_skipped[(fw_ip, fw_vsys)] = (", ".join(locations), skip_reason)
+                finally:
+                    jobs_queue.task_done()
+
+        # one job per physical appliance
+        jobs_queue = Queue()
+        for fw_ip, fw_vsys_locations in self._opstate_members.items():
+            jobs_queue.put((fw_ip, fw_vsys_locations))
+
+        # appliances are polled concurrently if --opstate-threads is higher than 1
+        self.multithread_wrapper(collect_opstate, nb_thread=min(self._opstate_threads, jobs_queue.qsize()) if self._opstate_threads > 1 else 0)(jobs_queue)
+        jobs_queue.join()
+        self._console.log(f"[ Panorama ] Hitcounts collected from {len(self._opstate_members)} firewalls ({sum(len(x) for x in self._opstate_members.values())} vsys)" +
+                          (f", {len(cached_members)} of them loaded from cache" if cached_members else ""))
+
+        for location_name, context in self._opstate_locations.items():
+            if members_major_version[location_name] < 9:
+                # if we did not found any member firewall with PANOS >= 9, we need to get the rule modification timestamp
+                # from Panorama for this context
+                self._console.log(
+                    f"[ {location_name} ] Not found any member with PAN-OS version >= 9. Getting rule modification timestamp from Panorama",
+                    level=2)
+                for rb_type in [PreRulebase(), PostRulebase()]:
+                    context.add(rb_type)
+                    for rulebase, style in self._hitcount_rulebases.items():
+                        ans = rb_type.opstate.hit_count.refresh(style, all_rules=True)
+                        self.populate_hitcounts(location_name, rulebase, ans)
+                    context.remove(rb_type)
+
+    def get_firewall_hitcounts(self, fw_conn, fw_vsys):
+        """
+        Gets the hitcounts of all rules of a vsys of a firewall, with one "show rule-hit-count" operational command
+        per rule type (same command than panos.policies.RulebaseHitCount.refresh, for the provided vsys)
+
+        :param fw_conn: (panos.firewall.Firewall) The connected Firewall object
+        :param fw_vsys: (string) The vsys name (None for single vsys firewalls)
+        :return: (dict) Dict of hitcounts (panos.policies.HitCount) per rulebase name, then per rule name
+        """
+
+        if fw_conn.retrieve_panos_version() < (8, 1, 0):
+            raise PanDeviceError("Rule hit count is supported in PAN-OS 8.1+")
+
+        hitcounts = dict()
+        for rulebase, style in self._hitcount_rulebases.items():
+            cmd = ET.Element("show")
+            sub = ET.SubElement(ET.SubElement(ET.SubElement(cmd, "rule-hit-count"), "vsys"), "vsys-name")
+            sub = ET.SubElement(ET.SubElement(sub, "entry", {"name": fw_vsys or "vsys1"}), "rule-base")
+            ET.SubElement(ET.SubElement(ET.SubElement(sub, "entry", {"name": style}), "rules"), "all")
+            res = fw_conn.op(ET.tostring(cmd, encoding="utf-8"), cmd_xml=False)
+            hitcounts[rulebase] = {
+                x.get("name"): HitCount(None, name=x.get("name"), elm=x)
+                for x in res.findall("./result/rule-hit-count/vsys/entry/rule-base/entry/rules/entry")
+            }
+        return hitcounts
+
+    def get_panorama_hitcounts(self, context, location_name, rulebases):
+        """
+        Gets the rules hitcounts of a device-group aggregated by Panorama from the member devices, with one
+        "show rule-hit-count" operational command per rulebase (pre / post) and rule type
+        The last_hit_timestamp of a rule is the most recent one among all member devices (device-vsys)
+
+        :param context: (panos.DeviceGroup) DeviceGroup object
+        :param location_name: (string) The location name (= DeviceGroup name)
+        :param rulebases: (dict) Dict where the key is the rulebase name used on the _hitcounts structure, and the
+            value is the associated hit count style (ie : {"policybasedforwarding": "pbf"})
+        :return: (dict) Dict of hitcounts per rulebase name, then per rule name. Empty if no member device reported hitcounts
+        """
+
+        hitcounts = {x: dict() for x in rulebases}
+        device_reported = False
+        for rb_type in ["pre-rulebase", "post-rulebase"]:
+            for rulebase, style in rulebases.items():
+                cmd = ET.Element("show")
+                sub = ET.SubElement(ET.SubElement(ET.SubElement(cmd, "rule-hit-count"), "device-group"), "entry", {"name": location_name})
+                sub = ET.SubElement(ET.SubElement(ET.SubElement(sub, rb_type), "entry", {"name": style}), "rules")
+                ET.SubElement(sub, "all")
+                res = context.nearest_pandevice().op(ET.tostring(cmd, encoding="utf-8"), cmd_xml=False)
+
+                for rule in res.findall("./result/rule-hit-count/device-group/entry/rule-base/entry/rules/entry"):
+                    devices_counters = rule.findall("./device-vsys/entry")
+                    device_reported |= bool(devices_counters)
+                    last_hit_timestamp = max([int(x.findtext("last-hit-timestamp") or 0) for x in devices_counters], default=0)
+                    rule_modification_timestamp = int(rule.findtext("rule-modification-timestamp") or 0) or \
+                        max([int(x.findtext("rule-modification-timestamp") or 0) for x in devices_counters], default=0)
+                    hitcounts[rulebase][rule.get("name")] = AggregatedHitCount(last_hit_timestamp, rule_modification_timestamp)
+
+        return hitcounts if device_reported else dict()
 
     def validate_tiebreak_tag(self):
         """
@@ -892,50 +1833,87 @@ class PaloCleaner:
                 tiebreak_tag = Tag(name=self._tiebreak_tag[0])
                 self._objects['shared']['Tag'].append(tiebreak_tag)
                 self._tag_namesearch['shared'][self._tiebreak_tag[0]] = tiebreak_tag
+                self.update_name_resolution("Tag", self._tiebreak_tag[0], 'shared')
                 if self._apply_cleaning:
                     self._panorama.add(tiebreak_tag).create()
                     self._panorama.remove(tiebreak_tag)
 
-    def get_relative_object_location(self, obj_name, reference_location, obj_type="Address", find_all=False, iterative_call=False):
+    def get_namesearch(self, obj_type: str) -> dict:
+        """
+        Returns the namesearch datastructure of an object type
+
+        :param obj_type: (str) The object type (Address, Tag, Service or Schedule)
+        :return: (dict) The namesearch datastructure (per location, then per object name). None for unknown types
+        """
+
+        return {
+            "Address": self._addr_namesearch,
+            "Tag": self._tag_namesearch,
+            "Service": self._service_namesearch,
+            "Schedule": self._schedule_namesearch,
+        }.get(obj_type)
+
+    def build_name_resolution(self):
+        """
+        Builds the _name_resolution table, which permits to find (for each location) the nearest location where an
+        object name is defined, without walking the hierarchy for each referenced object.
+        The table is built with one top-down pass on the hierarchy : each location inherits the resolutions of its
+        parent, overlaid with its own objects (predefined services are found after the shared ones)
+
+        :return:
+        """
+
+        for obj_type in ["Address", "Tag", "Service", "Schedule"]:
+            namesearch = self.get_namesearch(obj_type)
+            resolution = dict()
+            if obj_type == "Service" and 'predefined' in namesearch:
+                resolution['predefined'] = {k: ((v, 'predefined'),) for k, v in namesearch['predefined'].items()}
+            for location_name in self._dg_index.get_subtree('shared'):
+                if location_name not in namesearch:
+                    continue
+                location_resolution = dict(resolution.get(self._dg_index.get_parent(location_name) or 'predefined', dict()))
+                for obj_name, obj in namesearch[location_name].items():
+                    location_resolution[obj_name] = ((obj, location_name),) + location_resolution.get(obj_name, tuple())
+                resolution[location_name] = location_resolution
+            self._name_resolution[obj_type] = resolution
+
+    def update_name_resolution(self, obj_type: str, obj_name: str, location_name: str):
+        """
+        Updates the _name_resolution table after an object has been added to the namesearch datastructure of a
+        location (for this location and its downward locations)
+
+        :param obj_type: (str) The object type
+        :param obj_name: (str) The name of the added object
+        :param location_name: (str) The location where the object has been added
+        :return:
+        """
+
+        namesearch = self.get_namesearch(obj_type)
+        resolution = self._name_resolution.get(obj_type, dict())
+        for dg_name in self._dg_index.get_subtree(location_name):
+            if dg_name in resolution:
+                resolution[dg_name][obj_name] = tuple(
+                    (namesearch[x][obj_name], x) for x in self._dg_index.get_ancestors(dg_name)
+                    if obj_name in namesearch.get(x, dict())
+                ) + resolution.get('predefined', dict()).get(obj_name, tuple())
+
+    def get_relative_object_location(self, obj_name, reference_location, obj_type="Address", find_all=False):
         """
         Find referenced object by location (permits to get the referenced object on current location if
-        existing at this level, or on upper levels of the device-groups hierarchy)
+        existing at this level, or on upper levels of the device-groups hierarchy), using the _name_resolution table
         Commenting : OK (15062023)
-        TODO : comment iterative_call parameter
 
         :param obj_name: (string) Name of the object to find
         :param reference_location: (string) Where to start to find the object (device-group name or 'shared')
         :param obj_type: (string) Type of object to look for (default = AddressGroup or AddressObject)
+        :param find_all: (bool) Returns the list of all the objects having this name, from the reference_location up to
+            shared (and predefined), instead of the nearest one
         :return: (AddressObject, string) Found object (or group), and its location name
         """
 
-        # Initialize return variables
-        found_tuples = list()
-        found_object = None
-
-        # For each object at the reference_location level, find any object having the searched name
-        if obj_type == "Address":
-            found_object = self._addr_namesearch[reference_location].get(obj_name, None)
-        elif obj_type == "Tag":
-            found_object = self._tag_namesearch[reference_location].get(obj_name, None)
-        elif obj_type == "Service":
-            found_object = self._service_namesearch[reference_location].get(obj_name, None)
-        elif obj_type == "Schedule":
-            found_object = self._schedule_namesearch[reference_location].get(obj_name, None)
-
-        if found_object:
-            found_tuples.append((found_object, reference_location))
-
-        # if no object is found at current reference_location, find the upward device-group on the hierarchy
-        # and call the current function recursively with this upward level as reference_location
-        if (not found_tuples or find_all) and reference_location not in ['shared', 'predefined']:
-            upward_dg = self._dg_hierarchy[reference_location].parent.name
-            found_tuples += self.get_relative_object_location(obj_name, upward_dg, obj_type, find_all, iterative_call=True)
-        elif (not found_tuples or find_all) and (obj_type == "Service" and reference_location == 'shared'):
-            upward_dg = "predefined"
-            found_tuples += self.get_relative_object_location(obj_name, upward_dg, obj_type, find_all, iterative_call=True)
-
-        # log an error message if the requested object has not been found at this step
+        found_tuples = self._name_resolution.get(obj_type, dict()).get(reference_location, dict()).get(obj_name)
+
+        # log an error message if the requested object has not been found
         if not found_tuples:
             self._console.log(
                 f"[ {reference_location} ] ERROR Unable to find object {obj_name} (type {obj_type}) here and above",
@@ -943,14 +1921,9 @@ class PaloCleaner:
             )
 
         # finally return the tuple of the found object and its location
-        if iterative_call:
-            return found_tuples
-        elif find_all:
-            return found_tuples
-        else:
-            if not found_tuples:
-                return (None, None)
-            return found_tuples[0]
+        if find_all:
+            return list(found_tuples or tuple())
+        return found_tuples[0] if found_tuples else (None, None)
 
     def gen_condition_expression(self, condition_string: str, search_location: str):
         """
@@ -995,34 +1968,35 @@ class PaloCleaner:
 
     def get_relative_object_location_by_tag(self, dag_condition, reference_location, dag_name):
         """
-        Recursive function, used to find all objects matching a DAG statement
+        Finds all objects matching a DAG statement, from the reference location up to the shared location
 
         :param dag_condition: The AddressGroup.dynamic_value
-        :param reference_location: The location where to find matching objects for this recursive iteration
+        :param reference_location: The location from where to find matching objects
         :param dag_name: The name of the DAG being analyzed (only used for logging purposes if exception is matched)
         :return: list((obj, location)): List of tuples of (Object, location) matching the DAG statement
         """
 
         found_objects = list()
-        condition_expr, tags_list = self.gen_condition_expression(dag_condition, reference_location)
-        expr_result = dict()
-        try:
-            exec(condition_expr, locals(), expr_result)
-        except Exception as e:
-            self._console.log(f"[ {reference_location} ] Exception {e} while executing DAG {dag_name} match condition {dag_condition} (transformed to {condition_expr}", style="red")
-        found_objects += [(x, reference_location) for x in expr_result['cond_expr_result']]
-
-        if reference_location != 'shared':
-            upward_dg = self._dg_hierarchy[reference_location].parent.name
-            found_objects += self.get_relative_object_location_by_tag(dag_condition, upward_dg, dag_name)
-
-        found_tags = set()
-        for t in tags_list:
-            tag_research = self.get_relative_object_location(t, reference_location, obj_type="Tag", find_all=False, iterative_call=False)
-            if tag_research != (None, None):
-                found_tags.add(tag_research)
-
-        found_objects.extend(found_tags)
+        found_tags_per_location = list()
+        for current_location in self._dg_index.get_ancestors(reference_location):
+            condition_expr, tags_list = self.gen_condition_expression(dag_condition, current_location)
+            expr_result = dict()
+            try:
+                exec(condition_expr, locals(), expr_result)
+            except Exception as e:
+                self._console.log(f"[ {current_location} ] Exception {e} while executing DAG {dag_name} match condition {dag_condition} (transformed to {condition_expr}", style="red")
+            found_objects += [(x, current_location) for x in expr_result['cond_expr_result']]
+
+            found_tags = set()
+            for t in tags_list:
+                tag_research = self.get_relative_object_location(t, current_location, obj_type="Tag", find_all=False)
+                if tag_research != (None, None):
+                    found_tags.add(tag_research)
+            found_tags_per_location.append(found_tags)
+
+        # the tags found at the upward locations are listed first
+        for found_tags in reversed(found_tags_per_location):
+            found_objects.extend(found_tags)
         return found_objects
 
     def flatten_object(self, used_object: panos.objects, object_location: str, usage_base: str, referencer_type: str = None, referencer_name: str = None, resolved_cache=None):
@@ -1082,14 +2056,14 @@ class PaloCleaner:
 
             # if the resolved object is a "simple" object (not needing recursive search), just display a log indicating
             # that search is over for this one
-            if type(used_object) in [panos.objects.AddressObject, panos.objects.ServiceObject, panos.objects.Tag, panos.objects.ScheduleObject]:
+            if isinstance(used_object, (panos.objects.AddressObject, panos.objects.ServiceObject, panos.objects.Tag, panos.objects.ScheduleObject)):
                 self._console.log(
                         f"[ {usage_base} ] {'*' * recursion_level} Object {used_object.name!r} ({used_object.__class__.__name__}) (ref by {referencer_type} {referencer_name}) has been found on location {object_location}",
                         style="green", level=3)
 
             # if the resolved object needs recursive search for members (AddressGroup), let's go
             # here for an AddressGroup
-            elif type(used_object) is panos.objects.AddressGroup:
+            elif isinstance(used_object, panos.objects.AddressGroup):
                 # in case of a static group, just call the flatten_object function recursively for each member
                 # (which can be only at the group level or above)
                 if used_object.static_value:
@@ -1159,8 +2133,8 @@ class PaloCleaner:
                         # (group might not be used at its location but only below, and it could have unexpected results !!)
                         # TODO : find a solution to make sure that the same replacement object will be choosen there !!!
                         if not object_location in self._used_objects_sets:
-                            self._used_objects_sets[object_location] = set()
-                        self._used_objects_sets[object_location].update(set(group_protection_flattened))
+                            self._used_objects_sets[object_location] = UsedObjectsSet(self._used_objects_registry)
+                        self._used_objects_sets[object_location].update(group_protection_flattened)
 
 
                 # in case of a dynamic group, the group condition is converted to an executable Python statement,
@@ -1179,7 +2153,7 @@ class PaloCleaner:
                         usage_base,
                         used_object.name
                     ):
-                        if type(referenced_object) is panos.objects.Tag:
+                        if isinstance(referenced_object, panos.objects.Tag):
                             # The get_relative_object_location_by_tag function not only returns the list of AddressObjects referenced on DAGs
                             # It also returns the list of tags used on the DAG condition, to make sure they are not deleted even if not used by any referenced AddressObject at this time
                             # Thus those tags need to be added to the _used_objects_sets for the corresponding location (tags are protected at all locations between the DAG usage location and the shared level)
@@ -1232,7 +2206,7 @@ class PaloCleaner:
                                         style="yellow", level=3)
 
             # or here for ServiceGroup
-            elif type(used_object) is panos.objects.ServiceGroup:
+            elif isinstance(used_object, panos.objects.ServiceGroup):
                 if used_object.value:
                     self._console.log(
                             f"[ {usage_base} ] {'*' * recursion_level} Object {used_object.name!r} (ServiceGroup) has been found on location {object_location}", level=3)
@@ -1273,7 +2247,7 @@ class PaloCleaner:
             # IE : EDL at the time of writing this comment
 
             if not isinstance(used_object, type(None)):
-                if type(used_object) not in [panos.objects.Tag, panos.objects.ScheduleObject]:
+                if not isinstance(used_object, (panos.objects.Tag, panos.objects.ScheduleObject)):
                     if used_object.tag:
                         for tag in used_object.tag:
                             self._console.log(
@@ -1318,8 +2292,8 @@ class PaloCleaner:
         :return:
         """
 
-        # Initialized the location obj set list which will contain all objects used at this location
-        location_obj_set = list()
+        # Initialized the location obj set which will contain all objects used at this location
+        location_obj_set = UsedObjectsSet(self._used_objects_registry)
 
         # This dict contains a list of names for each object type, for which the location has been already found
         # This considerably improves processing time, avoiding to search again an object which has been already found
@@ -1373,10 +2347,13 @@ class PaloCleaner:
                 # Use the repl_map descriptor to find the different types of objects which can be found on the current
                 # rule based on its type.
                 # Initializes a dict where the key is the object type, and the value is an empty list
-                rule_objects = {x: [] for x in repl_map.get(type(r))}
+                rule_objects = {x: [] for x in repl_map.get(ObjectRecords.get_panos_class(r))}
 
                 # for each object type / field name in the repl_map descriptor for the current rule type
-                for obj_type, obj_fields in repl_map.get(type(r)).items():
+                for obj_type, obj_fields in repl_map.get(ObjectRecords.get_panos_class(r)).items():
+                    # object types which have not been downloaded (see plan_fetch) are not resolved
+                    if obj_type not in self._fetch_object_types:
+                        continue
                     # for each rule field using the current object type
                     for field in obj_fields:
                         # if the rule field is a string value, add the object to the rule_objects dict (on the
@@ -1388,7 +2365,7 @@ class PaloCleaner:
                         else:
                             # if the rule is a PolicyBasedForwarding rule, the object type can vary...
                             # handling this specific case
-                            if type(r) is PolicyBasedForwarding:
+                            if isinstance(r, PolicyBasedForwarding):
                                 if type(to_add := getattr(r, field[0])) is str:
                                     rule_objects[obj_type].append(to_add)
                                 elif type(to_add) is list:
@@ -1407,7 +2384,7 @@ class PaloCleaner:
                             # r.name = the rule name
                             # resolved_cache = the already resolved objects cache which will be updated
 
-                            location_obj_set += (
+                            location_obj_set.update(
                                 flattened := self.flatten_object(
                                     *self.get_relative_object_location(obj, location_name, obj_type),
                                     location_name,
@@ -1419,7 +2396,7 @@ class PaloCleaner:
 
                             # if we are using the group-compare feature and the current object is an AddressObject used directly on a rule, remove its flag
                             # to indicate it is not only a group member
-                            if self._compare_groups and len(flattened) == 1 and type(flattened[0][0]) is panos.objects.AddressObject:
+                            if self._compare_groups and len(flattened) == 1 and isinstance(flattened[0][0], panos.objects.AddressObject):
                                 self._console.log(f"[ {location_name} ] Marking object {flattened[0]} as not only a group member (used directly on rule {r.name!r})", level=2)
                                 flattened[0][0].group_member_only = False
 
@@ -1440,7 +2417,7 @@ class PaloCleaner:
                                             # one for the replacement process
                                             new_addr_obj.description = "palocleaner_temp_addressobject"
                                             self._addr_ipsearch[location_name][ref_val].append(new_addr_obj)
-                                            location_obj_set += [(new_addr_obj, location_name)]
+                                            location_obj_set.add((new_addr_obj, location_name))
                                             self._console.log(
                                                 f"[ {location_name} ] * Created AddressObject for address {obj} (with val {ref_val}) used on rule {r.name!r}",
                                                 style="yellow")
@@ -1471,7 +2448,7 @@ class PaloCleaner:
                         elif obj not in ['any', 'application-default']:
                             self._console.log(f"[ {location_name} ] * {obj_type} Object {obj!r} already resolved in current context",
                                                   style="yellow", level=3)
-                            if self._compare_groups and type(resolved_cache[obj_type][obj]) is panos.objects.AddressObject:
+                            if self._compare_groups and isinstance(resolved_cache[obj_type][obj], panos.objects.AddressObject):
                                 try:
                                     resolved_cache[obj_type][obj].group_member_only = False
                                     self._console.log(f"[ {location_name} ] Marking object {obj!r} (already resolved in cache) as not only a group member (used directly on rule {r.name!r})", level=2)
@@ -1481,7 +2458,7 @@ class PaloCleaner:
                 progress.update(task, advance=1)
 
         # add the processed object set for the current location to the global _used_objects_set dict
-        self._used_objects_sets[location_name] = set(location_obj_set)
+        self._used_objects_sets[location_name] = location_obj_set
 
     def addr_groups_processing(self, location_name, progress, task):
         """
@@ -1495,12 +2472,12 @@ class PaloCleaner:
         if not location_name in self._group_sizesearch:
             self._group_sizesearch[location_name] = dict()
 
-        for addr_group in [g for g in self._objects[location_name]["Address"] if type(g) is panos.objects.AddressGroup]:
+        for addr_group in [g for g in self._objects[location_name]["Address"] if isinstance(g, panos.objects.AddressGroup)]:
             addr_group.init_group_comparison()
             flat_addr_group = self.flatten_object(addr_group, location_name, location_name, "AGprocessor", "AGprocessor")
 
             for obj, loc in flat_addr_group:
-                if type(obj) is panos.objects.AddressObject:
+                if isinstance(obj, panos.objects.AddressObject):
                     if addr_group.add_range(*PaloCleanerTools.hostify_address(obj.value)):
                         # if the obj.value cannot be added to the group members, not adding the group membership to the object itself
                         # it can be because of the value not being an IPv4 / IPv6 address, but an FQDN (not yet supported)
@@ -1514,6 +2491,24 @@ class PaloCleaner:
                 self._group_sizesearch[location_name][addr_group.ip_count] = list()
             self._group_sizesearch[location_name][addr_group.ip_count].append(addr_group)
 
+    def update_addr_group_valuesearch(self, location_name: str, addr_group: panos.objects.AddressGroup, previous_group_key):
+        """
+        Moves an AddressGroup on the _addr_group_valuesearch structure after its members have been changed
+
+        :param location_name: (str) The location of the AddressGroup
+        :param addr_group: (panos.objects.AddressGroup) The changed AddressGroup
+        :param previous_group_key: (tuple) The canonical value of the group before the change (see PaloCleanerTools.get_group_key)
+        :return:
+        """
+
+        valuesearch = self._addr_group_valuesearch[location_name]
+        if previous_group_key in valuesearch and addr_group in valuesearch[previous_group_key]:
+            valuesearch[previous_group_key].remove(addr_group)
+            if not valuesearch[previous_group_key]:
+                del valuesearch[previous_group_key]
+        if (group_key := PaloCleanerTools.get_group_key(addr_group)):
+            valuesearch.setdefault(group_key, list()).append(addr_group)
+
     def find_upward_obj_tag(self, base_location_name: str, obj: panos.objects.Tag):
         """
         This function finds all Tag objects on upward locations (from the base_location_name) having
@@ -1525,20 +2520,13 @@ class PaloCleaner:
         """
 
         found_upward_objects = list()
-        current_location_search = base_location_name
 
-        # This boolean is used to stop the search loop when the "shared" location has been reached
-        reached_max = False
-        while not reached_max:
-            if current_location_search == "shared":
-                reached_max = True
+        # Search from the base location up to the "shared" location
+        for current_location_search in self._dg_index.get_ancestors(base_location_name):
             # Get the list of all matching Tag objects at the current search location
             if (found_obj :=self._tag_namesearch[current_location_search].get(obj.name)):
                 # add each of them to the result list as a tuple (Tag, current location name)
                 found_upward_objects.append((found_obj, current_location_search))
-            # Find the next search location (upward device group)
-            upward_dg = self._dg_hierarchy[current_location_search].parent
-            current_location_search = "shared" if not upward_dg else upward_dg.name
 
         return found_upward_objects
 
@@ -1558,13 +2546,9 @@ class PaloCleaner:
 
         # Initializes the list of found duplicates objects
         found_upward_objects = list()
-        current_location_search = base_location_name
 
-        # This boolean is used to stop the search loop when the "shared" location has been reached
-        reached_max = False
-        while not reached_max:
-            if current_location_search == "shared":
-                reached_max = True
+        # Search from the base location up to the "shared" location
+        for current_location_search in self._dg_index.get_ancestors(base_location_name):
             # Get the list of all matching Address objects at the current search location
             for obj in self._addr_ipsearch[current_location_search].get(obj_addr, list()):
                 # add each of them to the result list as a tuple (AddressObject, current location name)
@@ -1572,9 +2556,6 @@ class PaloCleaner:
             if dns_res:
                 for obj in self._addr_ipsearch[current_location_search].get(dns_res, list()):
                     found_upward_objects.append((obj, current_location_search))
-            # Find the next search location (upward device group)
-            upward_dg = self._dg_hierarchy[current_location_search].parent
-            current_location_search = "shared" if not upward_dg else upward_dg.name
 
         return found_upward_objects
 
@@ -1600,52 +2581,27 @@ class PaloCleaner:
 
         # Initializes the list of found duplicates objects
         found_upward_objects = list()
-        current_location_search = base_location_name
+        # canonical value (members set or normalized DAG condition) of the group, see PaloCleanerTools.get_group_key
+        ref_group_key = PaloCleanerTools.get_group_key(ref_obj_group)
         if ref_obj_group.static_value and self._compare_groups:
             percent_diff = ref_obj_group.ip_count * (self._groups_percent_match / 100)
             min_compare_size = math.floor(ref_obj_group.ip_count - percent_diff)
             max_compare_size = math.ceil(ref_obj_group.ip_count + percent_diff)
             self._console.log(f"[ {base_location_name} ] AddressGroup {ref_obj_group.name} size is {ref_obj_group.ip_count}. It could be replaced by groups between {min_compare_size} and {max_compare_size} (± {self._groups_percent_match} %)", level=2)
 
-        # This boolean is used to stop the search loop when the "shared" location has been reached
-        reached_max = False
-        while not reached_max:
-            if current_location_search == "shared":
-                reached_max = True
-            # Iterate over the list of all Address objects at the current search location
-            for obj in self._objects[current_location_search]['Address']:
-                # If the current object has the AddressGroup type
-                #if type(obj) is panos.objects.AddressGroup and obj != ref_obj_group:
-                if type(obj) is panos.objects.AddressGroup:
-                    # If this is a static group
-                    if ref_obj_group.static_value and obj.static_value:
-                        # And if it has the same members values
-                        if sorted(ref_obj_group.static_value) == sorted(obj.static_value):
-                            # Then add this object to the list of found duplicates as a tuple
-                            # (AddressGroup, current location name)
-                            found_upward_objects.append(
-                                {
-                                    "replacement": (obj, current_location_search), 
-                                    "replacement_type": "exact_match", 
-                                    "match_percent": 100, 
-                                    "left_diff": 0, 
-                                    "right_diff": 0
-                                })
-
-                    # If this is a dynamic group
-                    elif ref_obj_group.dynamic_value and obj.dynamic_value:
-                        # And if it has the same condition expression
-                        if ref_obj_group.dynamic_value == obj.dynamic_value:
-                            # Then add this object to the list of found duplicates as a tuple
-                            # (AddressGroup, current location name)
-                            found_upward_objects.append(
-                                {
-                                    "replacement": (obj, current_location_search), 
-                                    "replacement_type": "exact_match", 
-                                    "match_percent": 100, 
-                                    "left_diff": 0, 
-                                    "right_diff": 0
-                                })
+        # Search from the base location up to the "shared" location
+        for current_location_search in self._dg_index.get_ancestors(base_location_name):
+            # Get the list of all AddressGroups having the same static members or DAG condition at the current
+            # search location, and add each of them to the list of found duplicates
+            for obj in self._addr_group_valuesearch[current_location_search].get(ref_group_key, list()):
+                found_upward_objects.append(
+                    {
+                        "replacement": (obj, current_location_search), 
+                        "replacement_type": "exact_match", 
+                        "match_percent": 100, 
+                        "left_diff": 0, 
+                        "right_diff": 0
+                    })
 
             # searching for potential replacement groups by size, using the self._group_sizesearch structure 
             if ref_obj_group.static_value and self._compare_groups:
@@ -1669,10 +2625,6 @@ class PaloCleaner:
                                 "left_diff": left_diff, 
                                 "right_diff": right_diff
                             })
-            # Find the next search location (upward device group)
-            upward_dg = self._dg_hierarchy[current_location_search].parent
-            # If the result of the upward device-group name is "None", it means that the upward device-group is "shared"
-            current_location_search = "shared" if not upward_dg else upward_dg.name
 
         #self._console.log(f"[ {base_location_name} ] {ref_obj_group} could be replaced by one of {found_upward_objects}")
         return found_upward_objects
@@ -1691,26 +2643,18 @@ class PaloCleaner:
 
         # Initializes the list of found duplicates objects
         found_upward_objects = list()
-        current_location_search = base_location_name
 
-        # This boolean is used to stop the search loop when the "shared" location has been reached
-        reached_max = False
-        while not reached_max:
-            if current_location_search == "shared":
-                reached_max = True
+        # Search from the base location up to the "shared" location
+        for current_location_search in self._dg_index.get_ancestors(base_location_name):
             # Iterate over the list of all Service objects at the current search location
             for obj in self._objects[current_location_search]['Service']:
                 # If the current object has the ServiceGroup type
-                if type(obj) is panos.objects.ServiceGroup:
+                if isinstance(obj, panos.objects.ServiceGroup):
                     # If the static members of this ServiceGroup are the same thant the reference group object
                     if sorted(obj_group.value) == sorted(obj.value):
                         # Then add this object to the list of found duplicates as a tuple
                         # (ServiceGroup, current location name)
                         found_upward_objects.append((obj, current_location_search))
-            # Find the next search location (upward device group)
-            upward_dg = self._dg_hierarchy[current_location_search].parent
-            # If the result of the upward device-group name is "None", it means that the upward device-group is "shared"
-            current_location_search = "shared" if not upward_dg else upward_dg.name
 
         return found_upward_objects
 
@@ -1730,21 +2674,13 @@ class PaloCleaner:
 
         # Initializes the list of found duplicates objects
         found_upward_objects = list()
-        current_location_search = base_location_name
 
-        # This boolean is used to stop the search loop when the "shared" location has been reached
-        reached_max = False
-        while not reached_max:
-            if current_location_search == "shared":
-                reached_max = True
+        # Search from the base location up to the "shared" location
+        for current_location_search in self._dg_index.get_ancestors(base_location_name):
             # Get the list of all matching Service objects at the current search location
             for obj in self._service_valuesearch[current_location_search].get(obj_service_string, list()):
                 # Add each of them to the result list as a tuple (ServiceObject, current location name)
                 found_upward_objects.append((obj, current_location_search))
-            # Find the next search location (upward device group)
-            upward_dg = self._dg_hierarchy[current_location_search].parent
-            # If the result of the upward device-group name is "None", it means that the upward device-group is "shared"
-            current_location_search = "shared" if not upward_dg else upward_dg.name
 
         return found_upward_objects
 
@@ -1768,7 +2704,7 @@ class PaloCleaner:
         # will be chosen, which can leads to some randomness
         if self._tiebreak_tag_set:
             last_tag_intersection_set_length = 0
-            for o in sorted(obj_list, key=lambda x: x[0].about()['name']):
+            for o in sorted(obj_list, key=lambda x: x[0].name):
                 try:
                     if (tag_intersect := self._tiebreak_tag_set.intersection(o[0].tag)):
                         ti_len = len(tag_intersect)
@@ -1781,7 +2717,7 @@ class PaloCleaner:
                     pass
 
         if choosen_object:
-            self._console.log(f"[ {base_location} ] Object {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen by tiebreak. Intersection set : {last_tag_intersection_set_length}", level=2)  
+            self._console.log(f"[ {base_location} ] Object {choosen_object[0].name} (context {choosen_object[1]}) choosen by tiebreak. Intersection set : {last_tag_intersection_set_length}", level=2)  
 
         # If the tiebreak tag was not used to find the "best" object
         # if some replacements objects are tag-referenced (used on DAG) and if we decided to favorise those ones, they'll be chosen first
@@ -1789,7 +2725,7 @@ class PaloCleaner:
             for x in obj_list:
                 if x in self._tag_referenced and not choosen_object:
                     choosen_object = x
-                    self._console.log(f"[ {base_location} ] Object {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as tag-referenced", level=2)
+                    self._console.log(f"[ {base_location} ] Object {choosen_object[0].name} (context {choosen_object[1]}) choosen as tag-referenced", level=2)
                     break
 
         # else continue with the normal process
@@ -1802,7 +2738,7 @@ class PaloCleaner:
             interm_obj = [x for x in obj_list if x[1] != 'shared' and getattr(x[0], 'description') != 'palocleaner_temp_addressobject']
             # create a list of objects having name with multiple "." and ending with "corp" or "com" (probably FQDN)
             fqdn_obj = [x for x in obj_list if
-                        len(x[0].about()['name'].split('.')) > 1 and x[0].about()['name'].split('.')[-1] in ['corp', 'com'] and getattr(x[0], 'description') != 'palocleaner_temp_addressobject']
+                        len(x[0].name.split('.')) > 1 and x[0].name.split('.')[-1] in ['corp', 'com'] and getattr(x[0], 'description') != 'palocleaner_temp_addressobject']
             # find objects being both shared and with FQDN-like naming
             shared_fqdn_obj = list(set(shared_obj) & set(fqdn_obj))
             interm_fqdn_obj = list(set(interm_obj) & set(fqdn_obj))
@@ -1815,12 +2751,12 @@ class PaloCleaner:
                     if PaloCleanerTools.tag_counter(shared_fqdn_obj[0]) > PaloCleanerTools.tag_counter(shared_fqdn_obj[1]):
                         choosen_object = shared_fqdn_obj[0]
                         self._console.log(
-                            f"[ {base_location} ] Object {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's a shared object with FQDN naming, and highest number of tags",
+                            f"[ {base_location} ] Object {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's a shared object with FQDN naming, and highest number of tags",
                             level=2)
                 if not choosen_object:
-                    choosen_object = sorted(shared_fqdn_obj, key=lambda x: x[0].about()['name'])[0]
+                    choosen_object = sorted(shared_fqdn_obj, key=lambda x: x[0].name)[0]
                     self._console.log(
-                        f"[ {base_location} ] Object {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's a shared object with FQDN naming",
+                        f"[ {base_location} ] Object {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's a shared object with FQDN naming",
                         level=2)
             # else return the first found shared object after sorting by name
             if shared_obj and not choosen_object:
@@ -1829,44 +2765,44 @@ class PaloCleaner:
                     if PaloCleanerTools.tag_counter(shared_obj[0]) > PaloCleanerTools.tag_counter(shared_obj[1]):
                         choosen_object = shared_obj[0]
                         self._console.log(
-                            f"[ {base_location} ] Object {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's a shared object, and highest number of tags",
+                            f"[ {base_location} ] Object {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's a shared object, and highest number of tags",
                             level=2)
                 if not choosen_object:
-                    choosen_object = sorted(shared_obj, key=lambda x: x[0].about()['name'])[0]
+                    choosen_object = sorted(shared_obj, key=lambda x: x[0].name)[0]
                     self._console.log(
-                        f"[ {base_location} ] Object {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's a shared object",
+                        f"[ {base_location} ] Object {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's a shared object",
                         level=2)
                 """
-                for o in sorted(shared_obj, key=lambda x: x[0].about()['name']):
+                for o in sorted(shared_obj, key=lambda x: x[0].name):
                     if not choosen_object:
-                    #if o[0].about()['name'] not in [x[0].about()['name'] for x in interm_obj] and not choosen_object:
+                    #if o[0].name not in [x[0].name for x in interm_obj] and not choosen_object:
                         choosen_object = o
-                        self._console.log(f"[ {base_location} ] Object {o[0].about()['name']} (context {o[1]}) choosen as it's a shared object", level=2)
+                        self._console.log(f"[ {base_location} ] Object {o[0].name} (context {o[1]}) choosen as it's a shared object", level=2)
                 """
             # Repeat the same logic for intermediate device-groups
             if interm_fqdn_obj and not choosen_object:
                 temp_object_level = 999
                 # This code will permit to keep the "highest" device-group level matching object
                 # (nearest to the "shared" location)
-                for o in sorted(interm_fqdn_obj, key=lambda x: x[0].about()['name']):
+                for o in sorted(interm_fqdn_obj, key=lambda x: x[0].name):
                     location_level = self._dg_hierarchy[o[1]].level
                     if location_level < temp_object_level:
                         temp_object_level = location_level
                         choosen_object = o
-                self._console.log(f"[ {base_location} ] Object {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's an intermediate object with FQDN naming (level = {temp_object_level})", level=2)
+                self._console.log(f"[ {base_location} ] Object {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's an intermediate object with FQDN naming (level = {temp_object_level})", level=2)
             if interm_obj and not choosen_object:
                 temp_object_level = 999
-                for o in sorted(interm_obj, key=lambda x: x[0].about()['name']):
+                for o in sorted(interm_obj, key=lambda x: x[0].name):
                     location_level = self._dg_hierarchy[o[1]].level
                     if location_level < temp_object_level:
                         temp_object_level = location_level
                         choosen_object = o
-                self._console.log(f"[ {base_location} ] Object {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's an intermediate object (level = {temp_object_level})", level=2)
+                self._console.log(f"[ {base_location} ] Object {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's an intermediate object (level = {temp_object_level})", level=2)
         # If no best replacement object has been found at this point, display an alert and return the first one in the
         # input list (can lead to random results)
         if not choosen_object:
             self._console.log(f"[ {base_location} ] ERROR : Unable to choose an object in the following list for address {obj_list[0][0].value} : {obj_list}. Returning the first one by default", style="red")
-            choosen_object = sorted(obj_list, key=lambda x: x[0].about()['name'])[0]
+            choosen_object = sorted(obj_list, key=lambda x: x[0].name)[0]
 
         already_replaced_by = [v for k, v in self._replacements[base_location]["Address"].items() if v["source"] == choosen_object]
         if already_replaced_by:
@@ -1896,17 +2832,17 @@ class PaloCleaner:
                     if not self._bulk_operations:
                         try:
                             self._console.log(
-                                f"[ {base_location} ] Adding tiebreak tag {self._tiebreak_tag[0]} to {choosen_object[0].__class__.__name__} {choosen_object[0].about()['name']} on context {choosen_object[1]} ")
+                                f"[ {base_location} ] Adding tiebreak tag {self._tiebreak_tag[0]} to {choosen_object[0].__class__.__name__} {choosen_object[0].name} on context {choosen_object[1]} ")
                             choosen_object[0].apply()
                         except Exception as e:
-                            self._console.log(f"[ {base_location} ] ERROR when adding tiebreak tag to object {choosen_object[0].about()['name']} : {e}", style="red")
+                            self._console.log(f"[ {base_location} ] ERROR when adding tiebreak tag to object {choosen_object[0].name} : {e}", style="red")
                     else:
                         self._console.log(
-                            f"[ {base_location} ] Tiebreak tag {self._tiebreak_tag[0]} application to {choosen_object[0].__class__.__name__} {choosen_object[0].about()['name']} added to bulk operation pool for context {choosen_object[1]} ")
+                            f"[ {base_location} ] Tiebreak tag {self._tiebreak_tag[0]} application to {choosen_object[0].__class__.__name__} {choosen_object[0].name} added to bulk operation pool for context {choosen_object[1]} ")
                         self._objects[choosen_object[1]]['context'].add(choosen_object[0])
                 else:
                      self._console.log(
-                            f"[ {base_location} ] Tiebreak tag {self._tiebreak_tag[0]} would be applied to {choosen_object[0].__class__.__name__} {choosen_object[0].about()['name']} for context {choosen_object[1]} ")
+                            f"[ {base_location} ] Tiebreak tag {self._tiebreak_tag[0]} would be applied to {choosen_object[0].__class__.__name__} {choosen_object[0].name} for context {choosen_object[1]} ")
 
         # Remove tiebreak tags to not choosen objects 
         for obj_tuple in obj_list:
@@ -1940,12 +2876,12 @@ class PaloCleaner:
         temp_object_level = 999
         # This code will permit to keep the "highest" device-group level matching object (nearest to the "shared" location)
         for o in obj_list:
-            location_level = [k for k, v in self._depthed_tree.items() if o[1] in v][0]
+            location_level = self._dg_index.get_level(o[1])
             if location_level < temp_object_level:
                 temp_object_level = location_level
                 choosen_object = o
         self._console.log(
-            f"[ {base_location} ] Tag {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's the highest level location (level = {temp_object_level})", level=2)
+            f"[ {base_location} ] Tag {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's the highest level location (level = {temp_object_level})", level=2)
 
         return choosen_object
 
@@ -1968,13 +2904,13 @@ class PaloCleaner:
         # Not that if several objects have the tiebreak tag (which is not supposed to happen), the first one of the list
         # will be chosen, which can leads to some randomness
         if self._tiebreak_tag_set:
-            for o in sorted(obj_list, key=lambda x: x[0].about()['name']):
+            for o in sorted(obj_list, key=lambda x: x[0].name):
                 if not choosen_object:
                     try:
                         if (tag_intersect := self._tiebreak_tag_set.intersection(o[0].tag)):
                             choosen_object = o
                             self._console.log(
-                                f"[ {base_location} ] Service {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen by tiebreak. Intersection set : {tag_intersect}", level=2)
+                                f"[ {base_location} ] Service {choosen_object[0].name} (context {choosen_object[1]}) choosen by tiebreak. Intersection set : {tag_intersect}", level=2)
                     except:
                         # This exception is matched when checking if the tiebreak tag is on the list of tags of an
                         # object which has no tags
@@ -1999,46 +2935,46 @@ class PaloCleaner:
 
             # If shared and well-named objects are found, return the first one
             if shared_standard_obj and not choosen_object:
-                for o in sorted(shared_standard_obj, key=lambda x: x[0].about()['name']):
-                    if o[0].about()['name'] not in [x[0].about()['name'] for x in interm_standard_obj]:
+                for o in sorted(shared_standard_obj, key=lambda x: x[0].name):
+                    if o[0].name not in [x[0].name for x in interm_standard_obj]:
                         choosen_object = o
                         self._console.log(
-                                f"[ {base_location} ] Service {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's a shared object with standard naming", level=2)
+                                f"[ {base_location} ] Service {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's a shared object with standard naming", level=2)
             # Else return the first found shared object
             if shared_obj and not choosen_object:
-                #for o in sorted(shared_obj, key=lambda x: x[0].about()['name']):
-                #    if o[0].about()['name'] not in [x[0].about()['name'] for x in interm_obj]:
+                #for o in sorted(shared_obj, key=lambda x: x[0].name):
+                #    if o[0].name not in [x[0].name for x in interm_obj]:
                 #        choosen_object = o
                 #        self._console.log(
-                #                f"[ {base_location} ] Service {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's a shared object", level=2)
-                choosen_object = sorted(shared_obj, key=lambda x: x[0].about()['name'])[0]
-                self._console.log(f"[ {base_location} ] Service {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's a shared object", level=2)
+                #                f"[ {base_location} ] Service {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's a shared object", level=2)
+                choosen_object = sorted(shared_obj, key=lambda x: x[0].name)[0]
+                self._console.log(f"[ {base_location} ] Service {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's a shared object", level=2)
             # Repeat the same logic for intermediate device-groups
             if interm_standard_obj and not choosen_object:
                 temp_object_level = 999
                 # This code will permit to keep the "highest" device-group level matching object
                 # (nearest to the "shared" location)
-                for o in sorted(interm_standard_obj, key=lambda x: x[0].about()['name']):
-                    location_level = [k for k, v in self._depthed_tree.items() if o[1] in v][0]
+                for o in sorted(interm_standard_obj, key=lambda x: x[0].name):
+                    location_level = self._dg_index.get_level(o[1])
                     if location_level < temp_object_level:
                         temp_object_level = location_level
                         choosen_object = o
                 self._console.log(
-                        f"[ {base_location} ] Service {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's an intermediate object with standard naming (level = {temp_object_level})", level=2)
+                        f"[ {base_location} ] Service {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's an intermediate object with standard naming (level = {temp_object_level})", level=2)
             if interm_obj and not choosen_object:
                 temp_object_level = 999
-                for o in sorted(interm_obj, key=lambda x: x[0].about()['name']):
-                    location_level = [k for k, v in self._depthed_tree.items() if o[1] in v][0]
+                for o in sorted(interm_obj, key=lambda x: x[0].name):
+                    location_level = self._dg_index.get_level(o[1])
                     if location_level < temp_object_level:
                         temp_object_level = location_level
                         choosen_object = o
                 self._console.log(
-                        f"[ {base_location} ] Service {choosen_object[0].about()['name']} (context {choosen_object[1]}) choosen as it's an intermediate object (level = {temp_object_level})", level=2)
+                        f"[ {base_location} ] Service {choosen_object[0].name} (context {choosen_object[1]}) choosen as it's an intermediate object (level = {temp_object_level})", level=2)
         # If no best replacement object has been found at this point, display an alert and return the first one in the
         # input list (can lead to random results)
         if not choosen_object:
             self._console.log(f"ERROR : Unable to choose an object in the following list for service {PaloCleanerTools.stringify_service(obj_list[0][0])} : {obj_list}. Returning the first one by default", style="red")
-            choosen_object = sorted(obj_list, key=lambda x: x[0].about()['name'])[0]
+            choosen_object = sorted(obj_list, key=lambda x: x[0].name)[0]
 
         # If an object has not been chosen using the tiebreak tag, but the tiebreak tag adding has been requested,
         # then add the tiebreak tag to the chosen object so that it will remain the preferred one for next executions
@@ -2060,15 +2996,15 @@ class PaloCleaner:
                     if not self._bulk_operations:
                         try:
                             self._console.log(
-                                f"[ {base_location} ] Adding tiebreak tag {self._tiebreak_tag[0]} to {choosen_object[0].__class__.__name__} {choosen_object[0].about()['name']} on context {choosen_object[1]}")
+                                f"[ {base_location} ] Adding tiebreak tag {self._tiebreak_tag[0]} to {choosen_object[0].__class__.__name__} {choosen_object[0].name} on context {choosen_object[1]}")
                             choosen_object[0].apply()
                         except Exception as e:
-                            self._console.log(f"[ {base_location} ] ERROR when adding tiebreak tag to object {choosen_object[0].about()['name']} : {e}", style="red")
+                            self._console.log(f"[ {base_location} ] ERROR when adding tiebreak tag to object {choosen_object[0].name} : {e}", style="red")
                     else:
-                        self._console.log(f"[ {base_location} ] Tiebreak tag {self._tiebreak_tag[0]} application to {choosen_object[0].__class__.__name__} {choosen_object[0].about()['name']} added to bulk operation pool for context {choosen_object[1]} ")
+                        self._console.log(f"[ {base_location} ] Tiebreak tag {self._tiebreak_tag[0]} application to {choosen_object[0].__class__.__name__} {choosen_object[0].name} added to bulk operation pool for context {choosen_object[1]} ")
                         self._objects[choosen_object[1]]['context'].add(choosen_object[0])
                 else:
-                    self._console.log(f"[ {base_location} ] Tiebreak tag {self._tiebreak_tag[0]} would be applied to {choosen_object[0].__class__.__name__} {choosen_object[0].about()['name']} for context {choosen_object[1]} ")
+                    self._console.log(f"[ {base_location} ] Tiebreak tag {self._tiebreak_tag[0]} would be applied to {choosen_object[0].__class__.__name__} {choosen_object[0].name} for context {choosen_object[1]} ")
 
         # Returns the chosen object among the provided list
         return choosen_object
@@ -2189,13 +3125,13 @@ class PaloCleaner:
                 self._console.log(f"[ {base_location} ] ERROR !!!!!! Not using {o} as replacement for {base_obj_tuple}, because already identified as replaced by {replaced_by}")
 
         if choosen_by_alias and choosen_by_diff:
-            self._console.log(f"[ {base_location} ] AddressGroup {choosen_object['replacement'][0].about()['name']} (context {choosen_object['replacement'][1]}) choosen by alias and matching percentage : {last_match_percent} % and DG level : {last_diff_dg_level}")
+            self._console.log(f"[ {base_location} ] AddressGroup {choosen_object['replacement'][0].name} (context {choosen_object['replacement'][1]}) choosen by alias and matching percentage : {last_match_percent} % and DG level : {last_diff_dg_level}")
         elif choosen_by_diff:
-            self._console.log(f"[ {base_location} ] AddressGroup {choosen_object['replacement'][0].about()['name']} (context {choosen_object['replacement'][1]}) choosen by matching percentage : {last_match_percent} % and DG level : {last_diff_dg_level}")
+            self._console.log(f"[ {base_location} ] AddressGroup {choosen_object['replacement'][0].name} (context {choosen_object['replacement'][1]}) choosen by matching percentage : {last_match_percent} % and DG level : {last_diff_dg_level}")
         elif choosen_by_tag:
-            self._console.log(f"[ {base_location} ] AddressGroup {choosen_object['replacement'][0].about()['name']} (context {choosen_object['replacement'][1]}) choosen by tag intersection : {tag_intersect} and DG level : {last_exact_dg_level}")
+            self._console.log(f"[ {base_location} ] AddressGroup {choosen_object['replacement'][0].name} (context {choosen_object['replacement'][1]}) choosen by tag intersection : {tag_intersect} and DG level : {last_exact_dg_level}")
         else:
-            self._console.log(f"[ {base_location} ] AddressGroup {choosen_object['replacement'][0].about()['name']} (context {choosen_object['replacement'][1]}) choosen by DG level : {last_exact_dg_level}")
+            self._console.log(f"[ {base_location} ] AddressGroup {choosen_object['replacement'][0].name} (context {choosen_object['replacement'][1]}) choosen by DG level : {last_exact_dg_level}")
 
         # Returns the best matching AddressGroup among the provided list
         # This function returns the select dict in the input list of dicts (different format than other object selection functions)
@@ -2242,6 +3178,12 @@ class PaloCleaner:
             Tag: self.find_upward_obj_tag
         }
 
+        # the used objects of the current location are split by type with a single pass on the used objects set
+        # (which is not modified during the optimization)
+        used_objects_by_type = dict()
+        for (o, l) in self._used_objects_sets[location_name]:
+            used_objects_by_type.setdefault(ObjectRecords.get_panos_class(o), list()).append((o, l))
+
         # for each object type in the list below
         # TODO : find best replacement for servicegroup ?
 
@@ -2249,28 +3191,27 @@ class PaloCleaner:
             #self._console.log(f"[ {location_name} ] Child for DeviceGroup {self._objects[location_name]['context']} when optimizing {obj_type} is {self._objects[location_name]['context'].children}")
 
             # for each object of the current type found at the current location
-            #for (obj, location) in [(o, l) for (o, l) in self._used_objects_sets[location_name] if type(o) is obj_type]:
-            for (obj, location) in [(o, l) for (o, l) in self._used_objects_sets[location_name] if type(o) is obj_type]:
+            for (obj, location) in used_objects_by_type.get(obj_type, list()):
                 # call the function able to find the best replacement object, for the current object type
                 # (the proper function is get from the find_maps dict defined above)
-                upward_objects = find_maps.get(type(obj))(location_name, obj)
+                upward_objects = find_maps.get(obj_type)(location_name, obj)
 
                 # If there are more than 1 found object (as the current one will always be found)
                 # We need to find the best one (keep the current one or use one of the other duplicates ?)
                 if len(upward_objects) > 1:
                     replacement_type = None
                     # If the object type is AddressObject, find the best replacement using the find_best_replacement_addr_obj function
-                    if type(obj) is AddressObject:
+                    if isinstance(obj, AddressObject):
                         replacement_obj, replacement_obj_location = self.find_best_replacement_addr_obj(upward_objects,
                                                                                                         location_name, (obj, location))
                         replacement_type = "exact_match"
                     # Else if the type is ServiceObject, find the best replacement using the find_best_replacement_service_obj function
-                    elif type(obj) is ServiceObject:
+                    elif isinstance(obj, ServiceObject):
                         replacement_obj, replacement_obj_location = self.find_best_replacement_service_obj(upward_objects,
                                                                                                            location_name)
                         replacement_type = "exact_match"
                     # Else if the type is AddressGroup and the group-comparison mode is enabled, find the best replacement using the find_best_replacement_addr_group_obj function
-                    elif type(obj) is AddressGroup and self._compare_groups:
+                    elif isinstance(obj, AddressGroup) and self._compare_groups:
                         repl_info = self.find_best_replacement_addr_group_obj(upward_objects, location_name, (obj, location))
                         if repl_info:
                             if repl_info.get('blocked') is not None:
@@ -2287,7 +3228,7 @@ class PaloCleaner:
                                 replacement_right_diff = repl_info['right_diff']
                         else:
                             replacement_obj = obj
-                    elif type(obj) is Tag:
+                    elif isinstance(obj, Tag):
                         replacement_obj, replacement_obj_location = self.find_best_replacement_tag_obj(upward_objects, location_name)
                         replacement_type = "exact_match"
                     else:
@@ -2299,11 +3240,11 @@ class PaloCleaner:
                     #if replacement_obj != obj and "saga" in replacement_obj.name:
                         if replacement_type == "exact_match":
                             self._console.log(
-                                f"[ {location_name} ] Replacing {obj.about()['name']!r} ({obj.__class__.__name__}) at location {location} by {replacement_obj.about()['name']!r} at location {replacement_obj_location}",
+                                f"[ {location_name} ] Replacing {obj.name!r} ({obj.__class__.__name__}) at location {location} by {replacement_obj.name!r} at location {replacement_obj_location}",
                                 style="green", level=2)
                         else:
                             self._console.log(
-                                f"[ {location_name} ] Replacing {obj.about()['name']!r} ({obj.__class__.__name__}) at location {location} by {replacement_obj.about()['name']!r} at location {replacement_obj_location}. Match is {replacement_match_percent} %. L/R diff is {replacement_left_diff}/{replacement_right_diff}")
+                                f"[ {location_name} ] Replacing {obj.name!r} ({obj.__class__.__name__}) at location {location} by {replacement_obj.name!r} at location {replacement_obj_location}. Match is {replacement_match_percent} %. L/R diff is {replacement_left_diff}/{replacement_right_diff}")
 
                         # Populating the global _replacements dict (for the current location, current object type) with
                         # the details about the current object name, current object instance and location, and replacement
@@ -2314,15 +3255,15 @@ class PaloCleaner:
                         # "globally_blocked" is used to identify replacements which cannot be at all proceeded at the concerned location : all rules concerned are blocked 
                         # which in this case means that the replacement object does not need to be considered as used as this location (used for cleaning of the used objects set)
 
-                        if type(obj) is AddressObject:
-                            self._replacements[location_name]['Address'][obj.about()['name']] = {
+                        if isinstance(obj, AddressObject):
+                            self._replacements[location_name]['Address'][obj.name] = {
                                 'source': (obj, location),
                                 'replacement': (replacement_obj, replacement_obj_location),
                                 'blocked': False, 
                                 'globally_blocked': None
                             }
-                        elif type(obj) is AddressGroup and self._compare_groups:
-                            self._replacements[location_name]['Address'][obj.about()['name']] = {
+                        elif isinstance(obj, AddressGroup) and self._compare_groups:
+                            self._replacements[location_name]['Address'][obj.name] = {
                                 'source': (obj, location), 
                                 'replacement': (replacement_obj, replacement_obj_location),
                                 'blocked': False,
@@ -2331,23 +3272,23 @@ class PaloCleaner:
                                 'replacement_match': replacement_match_percent, 
                                 'left_right_diff': (replacement_left_diff, replacement_right_diff)
                             }
-                        elif type(obj) is AddressGroup:
-                            self._replacements[location_name]['Address'][obj.about()['name']] = {
+                        elif isinstance(obj, AddressGroup):
+                            self._replacements[location_name]['Address'][obj.name] = {
                                 'source': (obj, location), 
                                 'replacement': (replacement_obj, replacement_obj_location),
                                 'blocked': False,
                                 'globally_blocked': None,
                                 'replacement_type': replacement_type
                             }
-                        elif type(obj) in [ServiceObject, ServiceGroup]:
-                            self._replacements[location_name]['Service'][obj.about()['name']] = {
+                        elif isinstance(obj, (ServiceObject, ServiceGroup)):
+                            self._replacements[location_name]['Service'][obj.name] = {
                                 'source': (obj, location),
                                 'replacement': (replacement_obj, replacement_obj_location),
                                 'blocked': False, 
                                 'globally_blocked': None
                             }
-                        elif type(obj) is Tag:
-                            self._replacements[location_name]['Tag'][obj.about()['name']] = {
+                        elif isinstance(obj, Tag):
+                            self._replacements[location_name]['Tag'][obj.name] = {
                                 'source': (obj, location), 
                                 'replacement': (replacement_obj, replacement_obj_location),
                                 'blocked': False,
@@ -2359,7 +3300,7 @@ class PaloCleaner:
             # applying bulk operation update (apply tiebreak tag to objects modified by find_best_replacement_addr_obj()
             # or find_best_replacement_service_obj()
             # There should be only objects of type obj_type as children at this point, but filtering on it anyway
-            if self._bulk_operations and (bulk_targets := [x for x in self._objects[location_name]['context'].children if type(x) is obj_type]):
+            if self._bulk_operations and (bulk_targets := [x for x in self._objects[location_name]['context'].children if isinstance(x, obj_type)]):
                 self._console.log(f"[ {location_name} ] Applying bulk operation for {obj_type} updates (tiebreak-tag add) ({len(bulk_targets)} objects targeted)")
                 if self._apply_cleaning:
                     try:
@@ -2375,19 +3316,42 @@ class PaloCleaner:
                 any(self._objects[location_name]['context'].remove(x) for x in bulk_targets)
 
         # Remove ScheduleObject from the current context (to be reviewed, not sure) 
-        rem_sched = [x for x in self._objects[location_name]['context'].children if type(x) is ScheduleObject]
+        rem_sched = [x for x in self._objects[location_name]['context'].children if isinstance(x, ScheduleObject)]
         any(self._objects[location_name]['context'].remove(x) for x in rem_sched)
 
         if self._objects[location_name]['context'].children:
             self._console.log(f"[ {location_name} ] WARNING : {len(self._objects[location_name]['context'].children)} objects still on context children list. Should be empty at this point. PLEASE INVESTIGATE !")
 
-    def multithread_wrapper(self, wrapped_func):
+    def jobs_cancelled(self, jobs_queue: Queue) -> bool:
+        """
+        Checks, before a worker thread takes a new job, if the running operations have been interrupted.
+        If so, the remaining jobs are drained from the queue (so that jobs_queue.join() returns) without being processed,
+        ensuring that no change is applied once the interruption has been reported.
+
+        :param jobs_queue: (Queue) the jobs queue from which the worker thread is taking its jobs
+        :return: (bool) True if the operations have been interrupted, False otherwise
+        """
+
+        if not self._cancel_event.is_set():
+            return False
+        while True:
+            try:
+                jobs_queue.get_nowait()
+            except Empty:
+                break
+            jobs_queue.task_done()
+        return True
+
+    def multithread_wrapper(self, wrapped_func, nb_thread=None):
+        # nb_thread permits to use a different number of threads than the one provided with --multithread
+        nb_thread = self._nb_thread if nb_thread is None else nb_thread
+
         @functools.wraps(wrapped_func)
         def wrapper(*xargs, **kwargs):
-            if self._nb_thread:
+            if nb_thread:
                 lock = Lock()
                 kwargs['lock'] = lock
-                for n in range(self._nb_thread):
+                for n in range(nb_thread):
                     try:
                         kwargs['thread_id'] = n + 1
                         t = Thread(target=wrapped_func, args=(*xargs,), kwargs=kwargs, daemon=True)
@@ -2431,7 +3395,7 @@ class PaloCleaner:
             """
 
             while True:
-                if jobs_queue.empty():
+                if jobs_queue.empty() or self.jobs_cancelled(jobs_queue):
                     break
 
                 try:
@@ -2456,7 +3420,7 @@ class PaloCleaner:
                                 tag_instance, tag_location = self.get_relative_object_location(tag, location_name,
                                                                                                obj_type="tag")
                                 self._console.log(
-                                    f"[ Panorama ] [Thread-{thread_id}] Creating tag {tag!r} (copy from {tag_location}), to be used on ({replacement_obj_instance.about()['name']} at location {replacement_obj_location})")
+                                    f"[ Panorama ] [Thread-{thread_id}] Creating tag {tag!r} (copy from {tag_location}), to be used on ({replacement_obj_instance.name} at location {replacement_obj_location})")
                                 # if the cleaning application has been requested, create the new tag on Panorama
                                 # (this operation is never done using bulk XML API calls)
                                 if self._apply_cleaning:
@@ -2472,61 +3436,69 @@ class PaloCleaner:
                                 self._objects['shared']['Tag'].append(tag_instance)
                                 self._used_objects_sets['shared'].add((tag_instance, 'shared'))
                                 self._tag_namesearch['shared'][tag] = tag_instance
+                                self.update_name_resolution("Tag", tag, 'shared')
 
                             tag_changed = False
                             # add the new tag to the replacement object
                             if self._nb_thread: lock.acquire()
-                            if replacement_obj_instance.tag:
-                                if not tag in replacement_obj_instance.tag:
-                                    replacement_obj_instance.tag.append(tag)
+                            try:
+                                if replacement_obj_instance.tag:
+                                    if not tag in replacement_obj_instance.tag:
+                                        replacement_obj_instance.tag.append(tag)
+                                        tag_changed = True
+                                else:
+                                    replacement_obj_instance.tag = [tag]
                                     tag_changed = True
-                            else:
-                                replacement_obj_instance.tag = [tag]
-                                tag_changed = True
-                                self._console.log(
-                                    f"[ {replacement_obj_location} ] [Thread-{thread_id}] Adding tag {tag} to object {replacement_obj_instance.about()['name']!r} ({replacement_obj_instance.__class__.__name__})",
-                                    style="yellow")
+                                    self._console.log(
+                                        f"[ {replacement_obj_location} ] [Thread-{thread_id}] Adding tag {tag} to object {replacement_obj_instance.name!r} ({replacement_obj_instance.__class__.__name__})",
+                                        style="yellow")
 
-                            if tag_changed:
-                                if self._apply_cleaning and not self._bulk_operations:
-                                    try:
-                                        self._console.log(
-                                            f"[ {location_name} ] [Thread-{thread_id}] Adding tag {tag} to object {replacement_obj_instance.about()['name']!r} ({replacement_obj_instance.__class__.__name__}) on context {replacement_obj_location}",
-                                            style="yellow")
-                                        replacement_obj_instance.apply()
-                                    except Exception as e:
-                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] ERROR when adding tag {tag} to object {replacement_obj_instance.about()['name']!r} ({replacement_obj_instance.__class__.__name__}) on context {replacement_obj_location}", style="red")
-                                else:
-                                    if replacement_obj_instance not in self._objects[replacement_obj_location]['context'].children:
-                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Tag {tag} application to object {replacement_obj_instance.about()['name']!r} ({replacement_obj_instance.__class__.__name__}) added to bulk operation pool for context {replacement_obj_location}")
-                                        self._objects[replacement_obj_location]['context'].add(replacement_obj_instance)
+                                if tag_changed:
+                                    if self._apply_cleaning and not self._bulk_operations:
+                                        try:
+                                            self._console.log(
+                                                f"[ {location_name} ] [Thread-{thread_id}] Adding tag {tag} to object {replacement_obj_instance.name!r} ({replacement_obj_instance.__class__.__name__}) on context {replacement_obj_location}",
+                                                style="yellow")
+                                            replacement_obj_instance.apply()
+                                        except Exception as e:
+                                            self._console.log(f"[ {location_name} ] [Thread-{thread_id}] ERROR when adding tag {tag} to object {replacement_obj_instance.name!r} ({replacement_obj_instance.__class__.__name__}) on context {replacement_obj_location}", style="red")
                                     else:
-                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Tag {tag} application to object {replacement_obj_instance.about()['name']!r} ({replacement_obj_instance.__class__.__name__}) : object already in bulk operation pool for context {replacement_obj_location}")
-
-                            if self._nb_thread: lock.release()
+                                        if replacement_obj_instance not in self._objects[replacement_obj_location]['context'].children:
+                                            self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Tag {tag} application to object {replacement_obj_instance.name!r} ({replacement_obj_instance.__class__.__name__}) added to bulk operation pool for context {replacement_obj_location}")
+                                            self._objects[replacement_obj_location]['context'].add(replacement_obj_instance)
+                                        else:
+                                            self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Tag {tag} application to object {replacement_obj_instance.name!r} ({replacement_obj_instance.__class__.__name__}) : object already in bulk operation pool for context {replacement_obj_location}")
+                            finally:
+                                if self._nb_thread: lock.release()
 
                     # for each Address type object in the current location objects
                     for checked_object in self._objects[location_name]['Address']:
                         # if the type of the current object is a static AddressGroup
-                        if type(checked_object) is panos.objects.AddressGroup and checked_object.static_value:
+                        if isinstance(checked_object, panos.objects.AddressGroup) and checked_object.static_value:
                             changed = False
                             # on the line below, we are checking if the replacement object exists in the list of static members of the found AddressGroups at the current location
                             # and we are also avoiding replacement of a group by itself in the case of a single-member group (alias group)
-                            matched = source_obj_instance.about()['name'] in checked_object.static_value and not (len(checked_object.static_value) == 1 and type(source_obj_instance) is panos.objects.AddressGroup)
-                            if matched and source_obj_instance.about()['name'] != replacement_obj_instance.about()['name']:
-                                checked_object.static_value.remove(source_obj_instance.about()['name'])
+                            matched = source_obj_instance.name in checked_object.static_value and not (len(checked_object.static_value) == 1 and isinstance(source_obj_instance, panos.objects.AddressGroup))
+                            if matched and source_obj_instance.name != replacement_obj_instance.name:
                                 # acquiring lock to avoid multiple threads to try to change a static group members list at the same time 
+                                # (the group value before the change is read under the same lock, for the _addr_group_valuesearch update)
                                 if self._nb_thread: lock.acquire()
-                                if not replacement_obj_instance.about()['name'] in checked_object.static_value:
-                                    checked_object.static_value.append(replacement_obj_instance.about()['name'])
-                                if self._nb_thread: lock.release()
+                                try:
+                                    previous_group_key = PaloCleanerTools.get_group_key(checked_object)
+                                    checked_object.static_value.remove(source_obj_instance.name)
+                                    if not replacement_obj_instance.name in checked_object.static_value:
+                                        checked_object.static_value.append(replacement_obj_instance.name)
+                                    # the group is moved to its new members set on the _addr_group_valuesearch structure
+                                    self.update_addr_group_valuesearch(location_name, checked_object, previous_group_key)
+                                finally:
+                                    if self._nb_thread: lock.release()
                                 changed = True
                             try:
                                 # If the current object to be replaced has been matched as a member of a static group at the
                                 # current location level, add it to the replacements_done tracking dict
                                 if matched:
                                     self._console.log(
-                                        f"[ {location_name} ] [Thread-{thread_id}] Replacing {source_obj_instance.about()['name']!r} ({source_obj_location}) by {replacement_obj_instance.about()['name']!r} ({replacement_obj_location}) on {checked_object.about()['name']!r} ({checked_object.__class__.__name__})",
+                                        f"[ {location_name} ] [Thread-{thread_id}] Replacing {source_obj_instance.name!r} ({source_obj_location}) by {replacement_obj_instance.name!r} ({replacement_obj_location}) on {checked_object.name!r} ({checked_object.__class__.__name__})",
                                         style="yellow", level=2)
                                     # create a list (if not existing already) for the current static group object
                                     # which will contain the list of all replacements done on this group
@@ -2534,14 +3506,14 @@ class PaloCleaner:
                                     if checked_object.name not in replacements_done:
                                         replacements_done[checked_object.name] = list()
                                     # then append the current replacement information to this list (as a tuple format)
-                                    replacements_done[checked_object.name].append((source_obj_instance.about()['name'],
+                                    replacements_done[checked_object.name].append((source_obj_instance.name,
                                                                                    source_obj_location,
-                                                                                   replacement_obj_instance.about()['name'],
+                                                                                   replacement_obj_instance.name,
                                                                                    replacement_obj_location))
                                     if self._nb_thread: lock.release()
                             except Exception as e:
                                 self._console.log(
-                                    f"[ {location_name} ] [Thread-{thread_id}] Unknown error while replacing {source_obj_instance.about()['name']!r} by {replacement_obj_instance.about()['name']!r} on {checked_object.about()['name']!r} ({checked_object.__class__.__name__}) : {e}",
+                                    f"[ {location_name} ] [Thread-{thread_id}] Unknown error while replacing {source_obj_instance.name!r} by {replacement_obj_instance.name!r} on {checked_object.name!r} ({checked_object.__class__.__name__}) : {e}",
                                     style="red")
 
                             # if the cleaning application has been requested, update the modified group on Panorama
@@ -2551,11 +3523,11 @@ class PaloCleaner:
                                     try:
                                         checked_object.apply()
                                         self._console.log(
-                                            f"[ {location_name} ] [Thread-{thread_id}] Updated group {checked_object.about()['name']} ({checked_object.__class__.__name__}) for replacing {source_obj_instance.about()['name']!r} by {replacement_obj_instance.about()['name']!r}")
+                                            f"[ {location_name} ] [Thread-{thread_id}] Updated group {checked_object.name} ({checked_object.__class__.__name__}) for replacing {source_obj_instance.name!r} by {replacement_obj_instance.name!r}")
                                     except Exception as e:
-                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] ERROR when updating group {checked_object.about()['name']} ({checked_object.__class__.__name__}) for replacing {source_obj_instance.about()['name']!r} by {replacement_obj_instance.about()['name']!r} : {e}")
+                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] ERROR when updating group {checked_object.name} ({checked_object.__class__.__name__}) for replacing {source_obj_instance.name!r} by {replacement_obj_instance.name!r} : {e}")
                     self._console.log(
-                        f"[ {location_name} ] [Thread-{thread_id}] Finished replacement of {source_obj_instance.about()['name']!r} ({source_obj_location}) by {replacement_obj_instance.about()['name']!r} ({replacement_obj_location}). {jobs_queue.qsize()} replacements remaining on queue", 
+                        f"[ {location_name} ] [Thread-{thread_id}] Finished replacement of {source_obj_instance.name!r} ({source_obj_location}) by {replacement_obj_instance.name!r} ({replacement_obj_location}). {jobs_queue.qsize()} replacements remaining on queue", 
                         level=2
                     )
 
@@ -2566,8 +3538,6 @@ class PaloCleaner:
                 finally:
                     jobs_queue.task_done()
                     progress.update(task, advance=1)
-                    if self._nb_thread and lock.locked():
-                        lock.release()
 
         @self.multithread_wrapper
         def replace_in_service_groups(jobs_queue, progress, task, lock=None, thread_id=0):
@@ -2580,7 +3550,7 @@ class PaloCleaner:
             """
 
             while True:
-                if jobs_queue.empty():  # TODO MANAGE EXCPETION
+                if jobs_queue.empty() or self.jobs_cancelled(jobs_queue):  # TODO MANAGE EXCPETION
                     break
                 try:
                     replacement_name, replacement = jobs_queue.get()
@@ -2595,20 +3565,20 @@ class PaloCleaner:
                     # for each ServiceObject type object in the current location objects
                     for checked_object in self._objects[location_name]['Service']:
                         # if the type of the current object is a ServiceGroup
-                        if type(checked_object) is panos.objects.ServiceGroup and checked_object.value:
+                        if isinstance(checked_object, panos.objects.ServiceGroup) and checked_object.value:
                             changed = False
-                            matched = source_obj_instance.about()['name'] in checked_object.value
-                            if matched and source_obj_instance.about()['name'] != replacement_obj_instance.about()['name']:
-                                checked_object.value.remove(source_obj_instance.about()['name'])
+                            matched = source_obj_instance.name in checked_object.value
+                            if matched and source_obj_instance.name != replacement_obj_instance.name:
+                                checked_object.value.remove(source_obj_instance.name)
                                 if self._nb_thread: lock.acquire()
-                                if not replacement_obj_instance.about()['name'] in checked_object.value:
-                                    checked_object.value.append(replacement_obj_instance.about()['name'])
+                                if not replacement_obj_instance.name in checked_object.value:
+                                    checked_object.value.append(replacement_obj_instance.name)
                                 if self._nb_thread: lock.release()
                                 changed = True
                             try:
                                 if matched:
                                     self._console.log(
-                                        f"[ {location_name} ] [Thread-{thread_id}] Replacing {source_obj_instance.about()['name']!r} ({source_obj_location}) by {replacement_obj_instance.about()['name']!r} ({replacement_obj_location}) on {checked_object.about()['name']!r} ({checked_object.__class__.__name__})",
+                                        f"[ {location_name} ] [Thread-{thread_id}] Replacing {source_obj_instance.name!r} ({source_obj_location}) by {replacement_obj_instance.name!r} ({replacement_obj_location}) on {checked_object.name!r} ({checked_object.__class__.__name__})",
                                         style="yellow", level=2)
                                     # create a list (if not existing already) for the current static group object
                                     # which will contain the list of all replacements done on this group
@@ -2616,14 +3586,14 @@ class PaloCleaner:
                                     if checked_object.name not in replacements_done:
                                         replacements_done[checked_object.name] = list()
                                     # then append the current replacement information to this list (as a tuple format)
-                                    replacements_done[checked_object.name].append((source_obj_instance.about()['name'],
+                                    replacements_done[checked_object.name].append((source_obj_instance.name,
                                                                                    source_obj_location,
-                                                                                   replacement_obj_instance.about()['name'],
+                                                                                   replacement_obj_instance.name,
                                                                                    replacement_obj_location))
                                     if self._nb_thread: lock.release()
                             except Exception as e:
                                 self._console.log(
-                                    f"[ {location_name} ] Unknown error while replacing {source_obj_instance.about()['name']!r} by {replacement_obj_instance.about()['name']!r} on {checked_object.about()['name']!r} ({checked_object.__class__.__name__}) : {e}",
+                                    f"[ {location_name} ] Unknown error while replacing {source_obj_instance.name!r} by {replacement_obj_instance.name!r} on {checked_object.name!r} ({checked_object.__class__.__name__}) : {e}",
                                     style="red")
 
                             # if the cleaning application has been requested, update the modified group on Panorama
@@ -2631,18 +3601,18 @@ class PaloCleaner:
                                 if self._apply_cleaning and not self._bulk_operations:
                                     try:
                                         checked_object.apply()
-                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Updated group {checked_object.about()['name']} ({checked_object.__class__.__name__}) for replacing {source_obj_instance.about()['name']!r} by {replacement_obj_instance.about()['name']!r}")
+                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Updated group {checked_object.name} ({checked_object.__class__.__name__}) for replacing {source_obj_instance.name!r} by {replacement_obj_instance.name!r}")
                                     except Exception as e:
-                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] ERROR when updating group {checked_object.about()['name']} ({checked_object.__class__.__name__}) for replacing {source_obj_instance.about()['name']!r} by {replacement_obj_instance.about()['name']!r} : {e}")
+                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] ERROR when updating group {checked_object.name} ({checked_object.__class__.__name__}) for replacing {source_obj_instance.name!r} by {replacement_obj_instance.name!r} : {e}")
                                 else:
                                     if checked_object not in self._objects[location_name]['context'].children:
                                         self._objects[location_name]['context'].add(checked_object)
-                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Update of group {checked_object.about()['name']} ({checked_object.__class__.__name__}) added to bulk operation pool for context {location_name}")
+                                        self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Update of group {checked_object.name} ({checked_object.__class__.__name__}) added to bulk operation pool for context {location_name}")
                                     else:
                                         self._console.log(
-                                            f"[ {location_name} ] [Thread-{thread_id}] Update of group {checked_object.about()['name']} ({checked_object.__class__.__name__}) : object already in bulk operation pool for context {location_name}")
+                                            f"[ {location_name} ] [Thread-{thread_id}] Update of group {checked_object.name} ({checked_object.__class__.__name__}) : object already in bulk operation pool for context {location_name}")
                     self._console.log(
-                        f"[ {location_name} ] [Thread-{thread_id}] Finished replacement of {source_obj_instance.about()['name']!r} ({source_obj_location}) by {replacement_obj_instance.about()['name']!r} ({replacement_obj_location}). {jobs_queue.qsize()} replacements remaining on queue", 
+                        f"[ {location_name} ] [Thread-{thread_id}] Finished replacement of {source_obj_instance.name!r} ({source_obj_location}) by {replacement_obj_instance.name!r} ({replacement_obj_location}). {jobs_queue.qsize()} replacements remaining on queue", 
                         level=2
                     )
                 except Exception as e:
@@ -2674,9 +3644,9 @@ class PaloCleaner:
         # THIS SHOULD NEVER BE USED AS GROUP UPDATES ARE NOT DONE THROUGH BULK XML CALLS 
         if self._bulk_operations:
             # extract objects types in DG childrens
-            child_obj_types = {type(x) for x in self._objects[location_name]['context'].children if "Group" in str(type(x))}
+            child_obj_types = {ObjectRecords.get_panos_class(x) for x in self._objects[location_name]['context'].children if "Group" in str(type(x))}
             for curr_type in child_obj_types:
-                bulk_targets = [x for x in self._objects[location_name]['context'].children if type(x) is curr_type]
+                bulk_targets = [x for x in self._objects[location_name]['context'].children if isinstance(x, curr_type)]
                 self._console.log(
                     f"[ {location_name} ] Applying bulk operation for {bulk_targets[0].__class__.__name__} updates ({len(bulk_targets)} objects targeted). THIS SHOULD NOT BE USED !!!", style="red")
                 if self._apply_cleaning:
@@ -2771,7 +3741,7 @@ class PaloCleaner:
             any_change_done = False
 
             # For each type of object (Address, Service, Tag...) which can be found on the current rule's type
-            for obj_type in repl_map.get(type(rule)):
+            for obj_type in repl_map.get(ObjectRecords.get_panos_class(rule)):
 
                 # We don't replace schedules. We just want to analyze them to detect outdated schedules and associated rules, and delete unused ones
                 if obj_type == "Schedule":
@@ -2782,7 +3752,7 @@ class PaloCleaner:
 
                 # iterate over each field containing the current object type, also getting the field_type from the repl_map
                 # (fields can be string values or [list of strings])
-                for field_name, field_type in [(x[0], list) if type(x) is list else (x, str) for x in repl_map[type(rule)][obj_type]]:
+                for field_name, field_type in [(x[0], list) if type(x) is list else (x, str) for x in repl_map[ObjectRecords.get_panos_class(rule)][obj_type]]:
 
                     # initialize a list of replacements done on each field of the rule (here with the current field)
                     replacements_done[obj_type][field_name] = list()
@@ -2817,7 +3787,7 @@ class PaloCleaner:
                                 replacement_obj_instance, replacement_obj_location = replacement['replacement']
                                 # Checking if the name of the replacement object is different than the actual one
                                 # (and storing the name of the replacement object on the repl_name variable)
-                                if o != (repl_name := replacement_obj_instance.about()['name']):
+                                if o != (repl_name := replacement_obj_instance.name):
                                     # Add the replacement information to the replacements_done dict (for reporting)
                                     # replacement type 2 = removed
                                     # replacement type 3 = added
@@ -2827,7 +3797,7 @@ class PaloCleaner:
                                     # blocking cases where duplicates objects are used on a field of the rule and would
                                     # be replaced by the same target object
                                     if repl_name not in field_values + items_to_add:
-                                        if type(replacement_obj_instance) is AddressGroup and self._compare_groups:
+                                        if isinstance(replacement_obj_instance, AddressGroup) and self._compare_groups:
                                             repl_string = f"{repl_name} ({replacement_obj_location}) (M:{replacement['replacement_match']}% L/R:{replacement['left_right_diff']})"
                                         else:
                                             repl_string = f"{repl_name} ({replacement_obj_location})"
@@ -2973,7 +3943,7 @@ class PaloCleaner:
                     """
                     
                     while True:
-                        if jobs_queue.empty():
+                        if jobs_queue.empty() or self.jobs_cancelled(jobs_queue):
                             break
                         try:
                             r = jobs_queue.get()
@@ -3013,7 +3983,7 @@ class PaloCleaner:
                                 # regarding opstate timestamps), protect the rule objects from deletion
                                 """
                                 if not editable_rule or "noopstate" in r.name:
-                                    for obj_type, fields in repl_map[type(r)].items():
+                                    for obj_type, fields in repl_map[ObjectRecords.get_panos_class(r)].items():
                                         for f in fields:
                                             field_values = getattr(r, f[0])
                                             field_values = [field_values] if type(field_values) is str else field_values
@@ -3028,7 +3998,7 @@ class PaloCleaner:
                                 else:
                                     modified_rules.value += 1
                                 """
-                                for obj_type, fields in repl_map[type(r)].items():
+                                for obj_type, fields in repl_map[ObjectRecords.get_panos_class(r)].items():
                                     for f in [x[0] if type(x) is list else x for x in fields]:
                                         field_values = getattr(r, f)
                                         field_values = [field_values] if type(field_values) is str else field_values
@@ -3057,7 +4027,7 @@ class PaloCleaner:
 
                                     # For each object type (Address, Service, Tag...) / field name for the current rule
                                     # type (as defined on the repl_map descriptor)
-                                    for obj_type, fields in repl_map.get(type(r)).items():
+                                    for obj_type, fields in repl_map.get(ObjectRecords.get_panos_class(r)).items():
                                         if obj_type == "Schedule":
                                             continue
                                         # For each field name for the current object type
@@ -3216,7 +4186,7 @@ class PaloCleaner:
         # (which means that we don't want to delete anything at this level, but we need to make sure that used objects at this level will be protected upward, if the upward device-group is on the list)
         optimized_only = True if (self._unused_only is not None and len(self._unused_only) > 0 and location_name not in self._unused_only) else False
 
-        blocked_groups = set([y['source'][0] for x, y in self._replacements.get(location_name, dict()).get("Address", dict()).items() if y.get('blocked') == True and type( y.get('source', (None, None)) [0]) is panos.objects.AddressGroup])
+        blocked_groups = set([y['source'][0] for x, y in self._replacements.get(location_name, dict()).get("Address", dict()).items() if y.get('blocked') == True and isinstance(y.get('source', (None, None))[0], panos.objects.AddressGroup)])
 
         # removing replaced objects from used_objects_set for current location_name
         for obj_type in self._replacements.get(location_name, list()):
@@ -3226,7 +4196,7 @@ class PaloCleaner:
                     # current location (if not using the --unused-only argument),
                     # and replace it with the replacement object 
                     if self._unused_only is None: 
-                        if not self._compare_groups or not type(infos['source'][0]) is panos.objects.AddressObject or not hasattr(infos['source'][0], "group_membership"):
+                        if not self._compare_groups or not isinstance(infos['source'][0], panos.objects.AddressObject) or not hasattr(infos['source'][0], "group_membership"):
                             # This is matched if compare-groups is not enabled, if the current object is not an AddressObject, or if this is an AddressObject which is not member of any group
                             if not infos['blocked'] and not infos.get('replacement_type', '') == 'alias':
                                 self._used_objects_sets[location_name].remove(infos['source'])
@@ -3238,7 +4208,7 @@ class PaloCleaner:
                             # (groups marked as "blocked" by opstate checks)
                             self._used_objects_sets[location_name].remove(infos['source'])
                             self._console.log(f"[ {location_name} ] Object {infos['source']} removed from used objects : not used in any group nor rule", level=2)
-                        elif type(infos['source'][0]) is panos.objects.AddressObject:
+                        elif isinstance(infos['source'][0], panos.objects.AddressObject):
                             # TODO : warning here also for groups members of groups ? <<<<<<<<<<<<<--------------- /!\
                             self._console.log(f"[ {location_name} ] Object {infos['source']} cannot be deleted because of membership of groups {blocked_membership} which are protected", level=2)
                         else:
@@ -3262,7 +4232,7 @@ class PaloCleaner:
                             for x in replacements_dependencies_set:
                                 # TODO : what for groups members of groups ? <------- /!\ 
                                 # (removing the group_member_only only for AddressObjects here)
-                                if self._compare_groups and type(infos['replacement'][0]) is panos.objects.AddressGroup and type(x[0]) is panos.objects.AddressObject and hasattr(x[0], "group_member_only"):
+                                if self._compare_groups and isinstance(infos['replacement'][0], panos.objects.AddressGroup) and isinstance(x[0], panos.objects.AddressObject) and hasattr(x[0], "group_member_only"):
                                     x[0].group_member_only = False
                                 if not infos['globally_blocked'] or self._protect_potential_replacements:
                                     # if the replacement is not globally_blocked (has been effectively replaced on at least one unprotected rule), 
@@ -3285,10 +4255,10 @@ class PaloCleaner:
             to_remove_from_obj_set = list()
             # Checking all remaining address objects in the current _used_objects_set that are flagged as group_member_only and which are not explicitly part of the _replacement dict
             # It can be the case for objects used only on groups, which groups are being replaced. Those objects need to be removed from the _used_object_set for deletion
-            still_used_groups = set([x[0] for x in self._used_objects_sets[location_name] if type(x[0]) is panos.objects.AddressGroup])
+            still_used_groups = set([x[0] for x in self._used_objects_sets[location_name] if isinstance(x[0], panos.objects.AddressGroup)])
 
             for used_obj_tuple in self._used_objects_sets[location_name]:
-                if type(used_obj_tuple[0]) is panos.objects.AddressObject and hasattr(used_obj_tuple[0], "group_member_only") and used_obj_tuple[0].group_member_only == True:
+                if isinstance(used_obj_tuple[0], panos.objects.AddressObject) and hasattr(used_obj_tuple[0], "group_member_only") and used_obj_tuple[0].group_member_only == True:
                     # TODO : what happens if there are "blocked groups", but a given object is part of still used groups ? (else statement below)
                     #print(f"{used_obj_tuple} group membership is : {used_obj_tuple[0].group_membership}")
 
@@ -3325,10 +4295,10 @@ class PaloCleaner:
         # _used_objects_set of the parent.
         # This will permit to protect used objects on the childs of the hierarchy to be deleted when they exist but are
         # not used on the parents
-        upward_dg = self._dg_hierarchy[location_name].parent
-        upward_dg_name = "shared" if not upward_dg else upward_dg.name
+        upward_dg_name = self._dg_index.get_parent(location_name) or "shared"
         self._console.log(f"[ {location_name} ] Found parent DG is {upward_dg_name}", level=3)
-        self._used_objects_sets[upward_dg_name] = self._used_objects_sets[upward_dg_name].union([x for x in self._used_objects_sets[location_name] if not x[1]==location_name])
+        # (the parent bitset is updated with a single bitwise operation, the objects of the current location being masked out)
+        self._used_objects_sets[upward_dg_name].update_upward(self._used_objects_sets[location_name], location_name)
 
         if optimized_only:
             return None
@@ -3336,7 +4306,7 @@ class PaloCleaner:
         @self.multithread_wrapper
         def delete_local_objects_mthread(jobs_queue: Queue, dg: DeviceGroup, lock=None, thread_id=0):
             while True:
-                if jobs_queue.empty():
+                if jobs_queue.empty() or self.jobs_cancelled(jobs_queue):
                     break
                 try:
                     obj = jobs_queue.get()
@@ -3347,13 +4317,19 @@ class PaloCleaner:
                         continue
 
                     if self._apply_cleaning and not (obj, location_name) in self._used_objects_sets[location_name]:
-                        delete_ok = False
+                        # objects deleted by an interrupted run after its last checkpoint are not deleted again
+                        delete_ok = (location_name, obj.__class__.__name__, obj.name) in self._applied_deletions
+                        if delete_ok:
+                            self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Object {obj.name} ({obj.__class__.__name__}) has already been deleted before the run was interrupted")
+                            self._cleaning_counts[location_name][shortened_obj_type]['removed'] += 1
                         while not delete_ok:
                             try:
                                 self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Trying to delete object {obj.name} ({obj.__class__.__name__})")
                                 dg.add(obj)
                                 obj.delete()
                                 self._console.log(f"[ {location_name} ] [Thread-{thread_id}] Object {obj.name} ({obj.__class__.__name__}) has been successfuly deleted ")
+                                if self._stage_artifacts:
+                                    self._stage_artifacts.journal_deletion(location_name, obj.__class__.__name__, obj.name)
                                 self._cleaning_counts[location_name][shortened_obj_type]['removed'] += 1
                                 delete_ok = True
                             except panos.errors.PanDeviceXapiError as e:
@@ -3384,7 +4360,9 @@ class PaloCleaner:
                                                 self._console.log(f"[ {location_name} ] [Thread-{thread_id}] {obj.name} ({obj.__class__.__name__}) is still used on another AddressGroup : {group_dependency['groupname']} at location {group_dependency['location']}. Removing this dependency for cleaning.")
                                                 referencer_group, referencer_group_location = self.get_relative_object_location(group_dependency['groupname'], group_dependency['location'])
                                                 self._panorama.add(self._objects[group_dependency['location']]['context'])
+                                                previous_group_key = PaloCleanerTools.get_group_key(referencer_group)
                                                 referencer_group.static_value.remove(obj.name)
+                                                self.update_addr_group_valuesearch(referencer_group_location, referencer_group, previous_group_key)
                                                 referencer_group.apply()
                                                 self._panorama.remove(self._objects[group_dependency['location']]['context'])
                                             except Exception as e:
@@ -3448,7 +4426,7 @@ class PaloCleaner:
         def delete_local_objects_bulk(jobs_queue: Queue, dg: DeviceGroup, lock=None, thread_id=0):
 
             while True:
-                if jobs_queue.empty():
+                if jobs_queue.empty() or self.jobs_cancelled(jobs_queue):
                     break
                 try:
                     obj_item = jobs_queue.get()
@@ -3458,7 +4436,7 @@ class PaloCleaner:
                     # FIRST PASS: Identify all protected objects and populate _indirect_protect
                     # This ensures that members of protected groups are marked before deciding on deletion
                     for o in self._objects[location_name][obj_type]:
-                        if type(o) is obj_instance:
+                        if isinstance(o, obj_instance):
                             try:
                                 if o.tag:
                                     tag_match = set(o.tag).intersection(self._protect_tags)
@@ -3492,7 +4470,7 @@ class PaloCleaner:
                     objects_to_delete = []
 
                     for o in self._objects[location_name][obj_type]:
-                        if type(o) is obj_instance:
+                        if isinstance(o, obj_instance):
                             self._console.log(f"[ {location_name} ] Checking tag protection of object {o.name} ({obj_instance.__name__})", level=2)
 
                             # Check if protected by tag or indirect_protect
@@ -3601,7 +4579,7 @@ class PaloCleaner:
                 # FIRST PASS: Identify all protected objects and populate _indirect_protect
                 # This ensures that members of protected groups are marked before queuing for deletion
                 for obj in self._objects[location_name][list(obj_item.keys())[0]]:
-                    if type(obj) is obj_item[list(obj_item.keys())[0]]:
+                    if isinstance(obj, obj_item[list(obj_item.keys())[0]]):
                         shortened_obj_type = PaloCleanerTools.shorten_object_type(obj.__class__.__name__)
                         try:
                             if obj.tag:
@@ -3632,7 +4610,7 @@ class PaloCleaner:
 
                 # SECOND PASS: Queue objects for deletion, now that _indirect_protect is fully populated
                 for obj in self._objects[location_name][list(obj_item.keys())[0]]:
-                    if type(obj) is obj_item[list(obj_item.keys())[0]]:
+                    if isinstance(obj, obj_item[list(obj_item.keys())[0]]):
                         shortened_obj_type = PaloCleanerTools.shorten_object_type(obj.__class__.__name__)
                         add_to_queue = True
 
@@ -1,18 +1,20 @@
 import panos.objects
 import ipaddress
-import dns.exception
+import re
 from datetime import datetime
 
 schedule_date_format = "%Y/%m/%d@%H:%M"
 
-def hostify_address(address: str, dns_resolver: str = None) -> str:
+def hostify_address(address: str, dns_resolver=None) -> str:
     """
     Used to remove /32 at the end of an IP address
+    If a FqdnResolver is provided, FQDN values are resolved (from its cache if they have already been resolved)
 
     Commenting : OK (15062023)
 
     :param address: (string) IP address to be modified
-    :return: (string) Host IP address (instead of network /32)
+    :param dns_resolver: (FqdnResolver) The resolver to be used for FQDN values (None to not resolve them)
+    :return: (tuple) Host IP address (instead of network /32), and the IP address resolved for a FQDN value (or None)
     """
 
     # removing /32 mask for hosts
@@ -31,17 +33,7 @@ def hostify_address(address: str, dns_resolver: str = None) -> str:
             except Exception as e:
                 pass
         if dns_resolver:
-            try:
-                answer = dns_resolver.resolve(address, 'A')
-                if len(answer) == 1:
-                    print(f"Resolved {address} to {answer[0].to_text()}")
-                    return address, answer[0].to_text()
-                else:
-                    print(f"{address} resolves with {len(answer)} records. Not taking resolution into account")
-                    return address, None
-            except Exception as e:
-                print(f"Unable to resolve {address}")
-                return address, None
+            return address, dns_resolver.resolve(address)
     return address, None
 
 
@@ -60,6 +52,86 @@ def stringify_service(service: panos.objects.ServiceObject) -> str:
     return service.protocol.lower() + "/" + str(service.source_port) + "/" + str(service.destination_port)
 
 
+def normalize_dag_condition(condition: str) -> str:
+    """
+    Returns the canonical version of a DAG (dynamic AddressGroup) match condition, so that conditions matching the
+    same objects can be found by value : the order of the tags on each and / or operation, the quoting of the tags,
+    the case of the AND / OR operators and the redundant parenthesis are ignored
+    IE : "'tag2' AND (tag1)" and "tag1 and tag2" both becomes and('tag1','tag2')
+    If the condition cannot be parsed (or uses a negation), it is returned without its leading and trailing spaces
+
+    :param condition: (str) The AddressGroup.dynamic_value
+    :return: (str) The canonical version of the condition
+    """
+
+    # tokens are parenthesis, quoted tags, and unquoted tags or operators
+    tokens = re.findall(r"[()]|'[^']*'|\"[^\"]*\"|[^\s()'\"]+", condition)
+    position = 0
+
+    def parse_operation(operator, parse_operand):
+        # parses a sequence of operands separated by the operator, and returns the sorted list of canonical operands
+        # (nested operations using the same operator are flattened)
+        nonlocal position
+        operands = list()
+        while True:
+            operand = parse_operand()
+            operands += operand[1] if operand[0] == operator else [operand]
+            if position < len(tokens) and tokens[position].lower() == operator:
+                position += 1
+            else:
+                break
+        if len(operands) == 1:
+            return operands[0]
+        return operator, sorted(operands, key=repr)
+
+    def parse_tag():
+        nonlocal position
+        if position >= len(tokens) or tokens[position].lower() in ("and", "or", ")"):
+            raise ValueError(f"Unexpected end of condition {condition!r}")
+        # negations are not normalized, the conditions using them are kept as is
+        if tokens[position].lower() == "not":
+            raise ValueError(f"Unsupported operator {tokens[position]!r} on condition {condition!r}")
+        token = tokens[position]
+        position += 1
+        if token == "(":
+            operand = parse_operation("or", lambda: parse_operation("and", parse_tag))
+            if position >= len(tokens) or tokens[position] != ")":
+                raise ValueError(f"Unbalanced parenthesis on condition {condition!r}")
+            position += 1
+            return operand
+        return "tag", token.strip("'\"")
+
+    def stringify(operand):
+        if operand[0] == "tag":
+            return repr(operand[1])
+        return operand[0] + "(" + ",".join(stringify(x) for x in operand[1]) + ")"
+
+    try:
+        canonical = parse_operation("or", lambda: parse_operation("and", parse_tag))
+        if position != len(tokens):
+            raise ValueError(f"Unexpected token {tokens[position]!r} on condition {condition!r}")
+    except ValueError:
+        return condition.strip()
+    return stringify(canonical)
+
+
+def get_group_key(group: panos.objects.AddressGroup):
+    """
+    Returns the canonical value of an AddressGroup (for search purposes) : the set of its members for a static group,
+    or its normalized match condition for a dynamic group (see normalize_dag_condition())
+
+    :param group: (panos.objects.AddressGroup) An AddressGroup object
+    :return: (tuple) ("static", frozenset of members names) or ("dynamic", normalized condition). None if the group
+        has no members nor condition
+    """
+
+    if group.static_value:
+        return "static", frozenset(group.static_value)
+    if group.dynamic_value:
+        return "dynamic", normalize_dag_condition(group.dynamic_value)
+    return None
+
+
 def tag_counter(obj: (panos.objects.PanObject, str)) -> int:
     """
     Returns the number of tags assigned to an object. Returns 0 if the tag attribute value is None
@@ -0,0 +1,207 @@
+"""
+Pipeline stages module for PaloCleaner
+
+The processing is split in successive stages, each of them saving its output (the PaloCleaner datastructures) into an
+artifact file on the stages folder (--stages-folder) :
+- fetch : download of the objects, rulebases, managed devices and hitcounts (and FQDN resolution)
+- index : groups analysis for groups comparison (--compare-groups)
+- usage : used objects sets of each location
+- optimize : objects optimization / replacement / cleaning (or shadow rules detection), bottom-up in the hierarchy
+- report : display of the results (no artifact)
+A run can start from any stage (--from-stage), loading the artifact of the previous stage instead of running the
+earlier stages again (ie : to change the --tiebreak-tag or --groups-comparison-percent-match values without downloading
+and analyzing the whole configuration again).
+
+During the optimize stage, a checkpoint (artifact of the locations already optimized) is written after a device-group
+is optimized (at most once per --checkpoint-interval), and the objects deleted since the last checkpoint are written to a
+journal, so that an interrupted run can be resumed (--resume) from the last checkpoint, without deleting the same
+objects again.
+
+Artifacts are gzip compressed pickle files. The Panorama object (holding the API credentials) is never written : it is
+replaced by a reference, resolved to the Panorama object of the run loading the artifact.
+"""
+
+import gzip
+import json
+import os
+import pickle
+import time
+from threading import Lock
+
+ARTIFACT_VERSION = 4
+# Ordered list of the pipeline stages
+PIPELINE_STAGES = ("fetch", "index", "usage", "optimize", "report")
+# PaloCleaner attributes saved on the artifacts (datastructures built by the stages)
+STATE_ATTRIBUTES = (
+    "_analysis_perimeter", "_depthed_tree", "_reversed_tree", "_dg_hierarchy", "_objects", "_rulebases",
+    "_addr_namesearch", "_tag_namesearch", "_addr_ipsearch", "_addr_group_valuesearch", "_tag_objsearch",
+    "_schedule_namesearch", "_service_namesearch", "_service_valuesearch", "_group_sizesearch",
+    "_used_objects_registry", "_used_objects_sets",
+    "_tag_referenced", "_replacements", "_hitcounts", "_cleaning_counts", "_indirect_protect", "_dns_resolutions",
+)
+# Startup arguments changing the downloaded data. They must have the same value than on the run which wrote the artifacts
+FETCH_ARGUMENTS = (
+    "panorama_url", "config_file", "device_groups", "unused_only", "hitcounts_source", "ignore_appliances_opstate",
+    "dns_resolver", "compare_groups", "detect_shadow_rules", "parse_schedules",
+)
+# Reference replacing the Panorama object on the artifacts
+PANORAMA_REFERENCE = "panorama"
+# Name of the checkpoint artifact written after each device-group of the optimize stage
+CHECKPOINT_NAME = "optimize-checkpoint"
+# Name of the journal file of the objects deleted since the last checkpoint (JSON lines)
+JOURNAL_FILE = "optimize-journal.jsonl"
+
+
+class StageError(Exception):
+    """Raised when a stage artifact cannot be loaded, or does not match the current run"""
+    pass
+
+
+class StageArtifacts:
+    """Artifacts files of the pipeline stages, stored on the stages folder"""
+
+    def __init__(self, stages_folder: str, panorama, fetch_arguments: dict):
+        """
+        StageArtifacts class initialization function
+
+        :param stages_folder: (str) Path to the folder where the artifacts files are stored
+        :param panorama: (panos.panorama.Panorama) The Panorama object of the run (replaced by a reference on the artifacts)
+        :param fetch_arguments: (dict) The values of the FETCH_ARGUMENTS for the current run (plus the "opstate" boolean,
+            indicating if hitcounts are collected)
+        """
+
+        self._stages_folder = stages_folder
+        self._panorama = panorama
+        self._fetch_arguments = fetch_arguments
+        self._journal_lock = Lock()         # Lock protecting the journal file (objects are deleted by several threads)
+        self.fetched_at = time.time()       # Timestamp of the fetch stage (read from the artifact when starting from a later stage)
+        self.completed_locations = list()   # Locations already optimized (read from the checkpoint when resuming)
+        self.saved_at = time.time()         # Timestamp of the last artifact (or checkpoint) written
+
+    def get_path(self, stage: str) -> str:
+        return os.path.join(self._stages_folder, f"{stage}.pickle.gz")
+
+    def get_resume_point(self) -> (str, bool):
+        """
+        Finds the stage from which an interrupted run can be resumed : the optimize stage if a checkpoint exists, or
+        the stage following the last stage whose artifact exists
+
+        :return: (tuple) The stage name, and a boolean indicating if the checkpoint must be loaded
+        """
+
+        if os.path.exists(self.get_path(CHECKPOINT_NAME)):
+            return "optimize", True
+        for stage in reversed(PIPELINE_STAGES[:-1]):
+            if os.path.exists(self.get_path(stage)):
+                return PIPELINE_STAGES[PIPELINE_STAGES.index(stage) + 1], False
+        raise StageError(f"No stage output found on {self._stages_folder} : nothing to resume")
+
+    def clear(self, first_stage: str):
+        """
+        Removes the artifacts of first_stage and of the next stages (and the checkpoint and journal), which are
+        outdated once first_stage is run again
+
+        :param first_stage: (str) The name of the first stage run
+        :return:
+        """
+
+        for name in PIPELINE_STAGES[PIPELINE_STAGES.index(first_stage):-1] + (CHECKPOINT_NAME,):
+            if os.path.exists(self.get_path(name)):
+                os.remove(self.get_path(name))
+        self.reset_journal()
+
+    def save(self, stage: str, perimeter: [str], state: dict) -> int:
+        """
+        Writes the artifact of a stage (or the checkpoint, with the list of completed locations)
+
+        :param stage: (str) The stage name (or CHECKPOINT_NAME)
+        :param perimeter: (list) Names of the device-groups included in the analysis perimeter
+        :param state: (dict) The STATE_ATTRIBUTES values
+        :return: (int) The size of the artifact file (in bytes)
+        """
+
+        panorama = self._panorama
+
+        class ArtifactPickler(pickle.Pickler):
+            def persistent_id(self, obj):
+                return PANORAMA_REFERENCE if obj is panorama else None
+
+        os.makedirs(self._stages_folder, exist_ok=True)
+        header = {
+            "version": ARTIFACT_VERSION,
+            "stage": stage,
+            "fetched_at": self.fetched_at,
+            "fetch_arguments": self._fetch_arguments,
+            "perimeter": perimeter,
+            "completed_locations": self.completed_locations if stage == CHECKPOINT_NAME else list(),
+        }
+        # the artifact is written on a temporary file first, so that an interrupted run does not leave a truncated one
+        with gzip.open(self.get_path(stage) + ".tmp", "wb", compresslevel=1) as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            ArtifactPickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(state)
+        os.replace(self.get_path(stage) + ".tmp", self.get_path(stage))
+        self.saved_at = time.time()
+        return os.path.getsize(self.get_path(stage))
+
+    def load(self, stage: str) -> ([str], dict):
+        """
+        Loads the artifact of a stage (or the checkpoint), after checking that it has been written with the same
+        FETCH_ARGUMENTS
+
+        :param stage: (str) The stage name (or CHECKPOINT_NAME)
+        :return: (tuple) The names of the device-groups included in the analysis perimeter, and the STATE_ATTRIBUTES values
+        """
+
+        panorama = self._panorama
+
+        class ArtifactUnpickler(pickle.Unpickler):
+            def persistent_load(self, pid):
+                if pid != PANORAMA_REFERENCE:
+                    raise pickle.UnpicklingError(f"Unknown reference {pid}")
+                return panorama
+
+        try:
+            with gzip.open(self.get_path(stage), "rb") as f:
+                header = pickle.load(f)
+                if header.get("version") != ARTIFACT_VERSION or header.get("stage") != stage:
+                    raise StageError(f"{self.get_path(stage)} is not a version {ARTIFACT_VERSION} artifact of stage {stage}")
+                changed = [k for k, v in self._fetch_arguments.items() if header["fetch_arguments"].get(k) != v]
+                if changed:
+                    raise StageError(f"Stage {stage} artifact has been written with different values of {', '.join(changed)}. Run again from stage fetch")
+                state = ArtifactUnpickler(f).load()
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, KeyError) as e:
+            raise StageError(f"Cannot load stage {stage} artifact {self.get_path(stage)} : {e}")
+        self.fetched_at = header["fetched_at"]
+        self.completed_locations = header["completed_locations"]
+        return header["perimeter"], state
+
+    def journal_deletion(self, location_name: str, obj_type: str, obj_name: str):
+        """
+        Writes an object deletion to the journal, as soon as it has been applied
+
+        :param location_name: (str) The location of the deleted object
+        :param obj_type: (str) The class name of the deleted object
+        :param obj_name: (str) The name of the deleted object
+        :return:
+        """
+
+        with self._journal_lock:
+            with open(os.path.join(self._stages_folder, JOURNAL_FILE), "a") as f:
+                f.write(json.dumps([location_name, obj_type, obj_name]) + "\n")
+
+    def load_journal(self) -> set:
+        """
+        Returns the object deletions written to the journal
+
+        :return: (set) Set of tuples (location name, class name, object name)
+        """
+
+        if not os.path.exists(file_path := os.path.join(self._stages_folder, JOURNAL_FILE)):
+            return set()
+        with open(file_path) as f:
+            # the last line can be truncated if the run has been killed while writing it
+            return {tuple(json.loads(x)) for x in f if x.endswith("\n")}
+
+    def reset_journal(self):
+        if os.path.exists(file_path := os.path.join(self._stages_folder, JOURNAL_FILE)):
+            os.remove(file_path)
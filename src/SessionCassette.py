@@ -0,0 +1,140 @@
+"""
+API session recording module for PaloCleaner
+
+Records all the XML API requests sent to Panorama and to the firewalls, with their responses and durations, into a
+cassette file (gzip compressed JSON lines), and serves them back on a later run instead of contacting the appliances.
+This permits to reproduce (and profile) a run on a customer-shaped dataset without access to the customer Panorama.
+
+Secrets are never written to the cassette : the API key, user and password parameters of the requests are removed,
+and the API keys returned by keygen requests are replaced.
+Requests are matched on the appliance hostname and on their other parameters. When the same request has been recorded
+several times (ie : log jobs polling), the responses are replayed in the recorded order.
+"""
+
+import gzip
+import json
+import re
+import time
+from collections import deque
+from threading import Lock
+from urllib.parse import urlencode
+
+CASSETTE_VERSION = 1
+# Request parameters which are removed from the recorded requests (and ignored when matching requests on replay)
+REDACTED_PARAMETERS = ("key", "user", "password")
+# Value replacing the API keys returned by keygen requests
+REDACTED_KEY = "REDACTED"
+
+
+class CassetteError(Exception):
+    """Raised when the cassette cannot be loaded, or when a replayed request has not been recorded"""
+    pass
+
+
+class SessionCassette:
+    """Recorded XML API session (requests / responses exchanged with the appliances)"""
+
+    def __init__(self, file_path: str, replay: bool = False, replay_latency: bool = True):
+        """
+        SessionCassette class initialization function
+
+        :param file_path: (str) Path of the cassette file (written by save() when recording, loaded when replaying)
+        :param replay: (bool) True to replay the cassette, False to record a new one
+        :param replay_latency: (bool) True to replay the responses with their recorded duration, False to replay them immediately
+        """
+
+        self._file_path = file_path
+        self._replay_latency = replay_latency
+        self._lock = Lock()                 # Lock protecting the interactions (requests are sent by several threads)
+        self._interactions = list()         # Recorded interactions (dicts), in the order of the responses
+        self._replay_queues = dict()        # Interactions to be replayed. Key is the request key (see get_key), value is a deque of interactions
+        self.replay = replay
+        self.recorded_at = time.time()      # Timestamp of the start of the recording (read from the cassette when replaying)
+        if replay:
+            self.load()
+
+    @staticmethod
+    def get_key(host: str, query: dict) -> str:
+        """
+        Returns the key identifying a request, ignoring the redacted parameters
+
+        :param host: (str) Hostname or IP address of the appliance
+        :param query: (dict) The request parameters
+        :return: (str) The request key
+        """
+
+        return host + "?" + urlencode(sorted((k, v) for k, v in query.items() if k not in REDACTED_PARAMETERS))
+
+    def load(self):
+        try:
+            with gzip.open(self._file_path, "rt", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                if header.get("version") != CASSETTE_VERSION:
+                    raise CassetteError(f"Unsupported cassette version {header.get('version')}")
+                self.recorded_at = header["recorded_at"]
+                for line in f:
+                    interaction = json.loads(line)
+                    self._replay_queues.setdefault(interaction["key"], deque()).append(interaction)
+        except (OSError, ValueError, KeyError) as e:
+            raise CassetteError(f"Cannot load cassette {self._file_path} : {e}")
+
+    def record(self, host: str, query: dict, status: int, content_type: str, body: bytes, duration: float):
+        """
+        Records an interaction
+
+        :param host: (str) Hostname or IP address of the appliance
+        :param query: (dict) The request parameters
+        :param status: (int) The HTTP status code of the response
+        :param content_type: (str) The Content-Type header of the response
+        :param body: (bytes) The (decompressed) response body
+        :param duration: (float) The duration (in seconds) of the request, including retries
+        :return:
+        """
+
+        body = body.decode("utf-8", errors="replace")
+        if query.get("type") == "keygen":
+            body = re.sub(r"<key>.*?</key>", f"<key>{REDACTED_KEY}</key>", body, flags=re.S)
+        interaction = {
+            "key": self.get_key(host, query),
+            "status": status,
+            "content_type": content_type,
+            "body": body,
+            "duration": round(duration, 4),
+        }
+        with self._lock:
+            self._interactions.append(interaction)
+
+    def play(self, host: str, query: dict) -> (int, str, bytes, float):
+        """
+        Returns the recorded response of a request
+
+        :param host: (str) Hostname or IP address of the appliance
+        :param query: (dict) The request parameters
+        :return: (tuple) The HTTP status code, the Content-Type header, the response body, and the delay to wait before
+            returning the response (recorded duration, or 0 if the latency is not replayed)
+        """
+
+        key = self.get_key(host, query)
+        with self._lock:
+            queue = self._replay_queues.get(key)
+            if not queue:
+                raise CassetteError(f"Request not found on cassette : {key}")
+            # the last response of a request is kept, to be replayed again if the request is sent more times than recorded
+            interaction = queue.popleft() if len(queue) > 1 else queue[0]
+        return interaction["status"], interaction["content_type"], interaction["body"].encode("utf-8"), \
+            interaction["duration"] if self._replay_latency else 0
+
+    def save(self) -> int:
+        """
+        Writes the recorded interactions to the cassette file
+
+        :return: (int) The number of interactions recorded
+        """
+
+        with self._lock:
+            interactions = list(self._interactions)
+        with gzip.open(self._file_path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"version": CASSETTE_VERSION, "recorded_at": self.recorded_at}) + "\n")
+            for interaction in interactions:
+                f.write(json.dumps(interaction) + "\n")
+        return len(interactions)
@@ -15,6 +15,8 @@ from typing import List, Tuple, Set, Optional, Dict, Any, TYPE_CHECKING
 import panos.objects
 
 from ShadowRuleDetector import ip_to_tuple, merge_ip_tuples, is_ip_subset
+import PaloCleanerTools
+import ObjectRecords
 
 if TYPE_CHECKING:
     from PaloCleaner import PaloCleaner
@@ -138,7 +140,7 @@ class ShadowObjectDetector:
                 if rule.disabled:
                     continue
 
-                rule_type = type(rule)
+                rule_type = ObjectRecords.get_panos_class(rule)
                 if rule_type not in repl_map:
                     continue
 
@@ -275,6 +277,7 @@ class ShadowObjectDetector:
 
             group_changes = self._group_removals[location][obj.name]
             changed = False
+            previous_group_key = PaloCleanerTools.get_group_key(obj)
 
             for field_name, objects_to_remove in group_changes.items():
                 if field_name != "static_value" or not obj.static_value:
@@ -289,6 +292,10 @@ class ShadowObjectDetector:
                             style="yellow"
                         )
 
+            if changed:
+                # the group value has changed, it needs to be moved on the AddressGroups value index
+                self._cleaner.update_addr_group_valuesearch(location, obj, previous_group_key)
+
             if changed and self._cleaner._apply_cleaning:
                 try:
                     obj.apply()
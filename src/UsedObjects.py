@@ -0,0 +1,186 @@
+"""
+Used objects sets module for PaloCleaner
+
+The used objects of each location are (panos.objects, location name) pairs. Each pair is given a dense integer id the
+first time it is seen (UsedObjectsRegistry), and the used objects sets are stored as bitsets of those ids instead of
+sets of tuples :
+- the upward propagation of the used objects of a location to its parent is a single bitwise operation, the pairs
+  defined at the location itself being masked out with the location mask kept by the registry
+- membership tests are an id lookup followed by a bit test
+- the sets behave like the Python sets of tuples used before (add, update, remove, iteration...)
+The bitsets are bytearrays, so that a bit can be tested or set in place (setting a bit of a Python int copies the whole
+int). They are converted to Python ints only for the bitwise operations on whole sets.
+"""
+
+from threading import Lock
+
+
+def bits_to_int(bits: bytearray) -> int:
+    return int.from_bytes(bits, "little")
+
+
+def int_to_bits(value: int) -> bytearray:
+    return bytearray(value.to_bytes((value.bit_length() + 7) // 8, "little"))
+
+
+def set_bit(bits: bytearray, bit_id: int) -> bool:
+    """
+    Sets a bit of a bitset in place (the bitset is extended if needed)
+
+    :param bits: (bytearray) The bitset
+    :param bit_id: (int) The bit to be set
+    :return: (bool) True if the bit was not already set
+    """
+
+    if (byte_index := bit_id >> 3) >= len(bits):
+        bits.extend(bytes(byte_index + 1 - len(bits)))
+    if bits[byte_index] >> (bit_id & 7) & 1:
+        return False
+    bits[byte_index] |= 1 << (bit_id & 7)
+    return True
+
+
+class UsedObjectsRegistry:
+    """Dense integer ids of the (panos.objects, location name) pairs, shared by all the UsedObjectsSet instances"""
+
+    def __init__(self):
+        """
+        UsedObjectsRegistry class initialization function
+        """
+
+        self._ids = dict()                      # id of each (panos.objects, location name) pair
+        self._pairs = list()                    # (panos.objects, location name) pair of each id
+        self._location_masks = dict()           # bitset of the ids of the pairs defined at each location
+        self.lock = Lock()                      # Lock protecting the registry and the sets (pairs can be added to the sets by concurrent threads)
+
+    def __getstate__(self):
+        # the lock cannot be pickled (the registry is saved on the pipeline stages artifacts)
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def get_id(self, pair: tuple) -> int:
+        """
+        Returns the id of a (panos.objects, location name) pair, giving it a new id if the pair has never been seen
+
+        :param pair: (tuple) The (panos.objects, location name) pair
+        :return: (int) The id of the pair
+        """
+
+        if (pair_id := self._ids.get(pair)) is None:
+            with self.lock:
+                if (pair_id := self._ids.get(pair)) is None:
+                    pair_id = len(self._pairs)
+                    self._pairs.append(pair)
+                    self._ids[pair] = pair_id
+                    set_bit(self._location_masks.setdefault(pair[1], bytearray()), pair_id)
+        return pair_id
+
+    def find_id(self, pair: tuple):
+        """
+        Returns the id of a (panos.objects, location name) pair, without giving it a new id
+
+        :param pair: (tuple) The (panos.objects, location name) pair
+        :return: (int) The id of the pair, or None if the pair has never been seen
+        """
+
+        return self._ids.get(pair)
+
+    def get_location_mask(self, location_name: str) -> int:
+        return bits_to_int(self._location_masks.get(location_name, bytearray()))
+
+    def iter_pairs(self, bits: bytes):
+        """
+        Iterates over the (panos.objects, location name) pairs of a bitset
+
+        :param bits: (bytes) The bitset of the pairs ids
+        :return: (generator) The (panos.objects, location name) pairs, by increasing id
+        """
+
+        # the ids are read from the binary representation of the bitset (lowest bit first)
+        reversed_bits = bin(bits_to_int(bits))[:1:-1]
+        pair_id = reversed_bits.find("1")
+        while pair_id != -1:
+            yield self._pairs[pair_id]
+            pair_id = reversed_bits.find("1", pair_id + 1)
+
+
+class UsedObjectsSet:
+    """Set of (panos.objects, location name) pairs, stored as a bitset of their UsedObjectsRegistry ids"""
+
+    def __init__(self, registry: UsedObjectsRegistry, pairs=None):
+        """
+        UsedObjectsSet class initialization function
+
+        :param registry: (UsedObjectsRegistry) The registry giving the ids of the pairs
+        :param pairs: (iterable) The (panos.objects, location name) pairs initially on the set, if any
+        """
+
+        self._registry = registry
+        self._bits = bytearray()                # bitset of the ids of the pairs on the set (bit n of byte n // 8 for id n)
+        self._count = 0                         # number of pairs on the set
+        if pairs is not None:
+            self.update(pairs)
+
+    def __contains__(self, pair):
+        if (pair_id := self._registry.find_id(pair)) is None or pair_id >> 3 >= len(self._bits):
+            return False
+        return bool(self._bits[pair_id >> 3] >> (pair_id & 7) & 1)
+
+    def __iter__(self):
+        # the iteration is done on a copy, so that the set can be modified while iterating
+        return self._registry.iter_pairs(bytes(self._bits))
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count != 0
+
+    def __repr__(self):
+        return f"UsedObjectsSet({list(self)!r})"
+
+    def add(self, pair: tuple):
+        pair_id = self._registry.get_id(pair)
+        with self._registry.lock:
+            self._count += set_bit(self._bits, pair_id)
+
+    def update(self, pairs):
+        """
+        Adds (panos.objects, location name) pairs to the set
+
+        :param pairs: (iterable) The pairs to be added
+        :return:
+        """
+
+        pair_ids = [self._registry.get_id(pair) for pair in pairs]
+        with self._registry.lock:
+            for pair_id in pair_ids:
+                self._count += set_bit(self._bits, pair_id)
+
+    def update_upward(self, location_set: "UsedObjectsSet", location_name: str):
+        """
+        Adds to the set (of the upward location) all the pairs of a location set which are not defined at this location
+
+        :param location_set: (UsedObjectsSet) The used objects set of the location
+        :param location_name: (str) The name of the location
+        :return:
+        """
+
+        with self._registry.lock:
+            added_bits = bits_to_int(location_set._bits) & ~self._registry.get_location_mask(location_name) & ~bits_to_int(self._bits)
+            if added_bits:
+                self._bits = int_to_bits(bits_to_int(self._bits) | added_bits)
+                self._count += bin(added_bits).count("1")
+
+    def remove(self, pair: tuple):
+        with self._registry.lock:
+            if pair not in self:
+                raise KeyError(pair)
+            pair_id = self._registry.find_id(pair)
+            self._bits[pair_id >> 3] &= ~(1 << (pair_id & 7)) & 0xFF
+            self._count -= 1
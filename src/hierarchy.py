@@ -72,6 +72,10 @@ class HierarchyDG:
 
         return depth_tree
 
+    @classmethod
+    def gen_index(cls, dg_dict):
+        return HierarchyIndex(dg_dict)
+
     @classmethod
     def get_perimeter(cls, dg_dict):
         return {
@@ -79,3 +83,46 @@ class HierarchyDG:
             "indirect": [k for k, v in dg_dict.items() if v.indirectly_included],
             "full": [k for k, v in dg_dict.items() if v.inclusion_state == 2]
         }
+
+
+class HierarchyIndex:
+    # Lookups on the device-groups hierarchy, precomputed once from the HierarchyDG dict so that the hot paths do not
+    # need to walk the tree one parent at a time
+    def __init__(self, dg_dict):
+        self.parents = dict()       # name of the parent of each DG (None for "shared")
+        self.ancestors = dict()     # tuple of the names of each DG and of its upward DG, up to "shared" (included)
+        self.levels = dict()        # depth level of each DG ("shared" is level 0)
+        self.subtrees = dict()      # tuple of the names of each DG and of all its downward DG
+
+        order = list()
+        # position of each DG in the pre-order walk, and position following its last downward DG
+        start, end = dict(), dict()
+        # iterative depth-first walk from the root(s), parents being always indexed before their childs
+        stack = [(v, False) for v in dg_dict.values() if v.parent is None]
+        while stack:
+            dg, exiting = stack.pop()
+            if exiting:
+                end[dg.name] = len(order)
+                continue
+            parent_name = dg.parent.name if dg.parent else None
+            self.parents[dg.name] = parent_name
+            self.ancestors[dg.name] = (dg.name,) + (self.ancestors[parent_name] if parent_name else tuple())
+            self.levels[dg.name] = dg.level
+            start[dg.name] = len(order)
+            order.append(dg.name)
+            stack.append((dg, True))
+            stack.extend((c, False) for c in reversed(dg.childs))
+        for name in order:
+            self.subtrees[name] = tuple(order[start[name]:end[name]])
+
+    def get_parent(self, dg_name):
+        return self.parents[dg_name]
+
+    def get_ancestors(self, dg_name):
+        return self.ancestors[dg_name]
+
+    def get_level(self, dg_name):
+        return self.levels[dg_name]
+
+    def get_subtree(self, dg_name):
+        return self.subtrees[dg_name]
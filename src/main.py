@@ -1,7 +1,10 @@
 import argparse
 import os
 import time
-from PaloCleaner import PaloCleaner
+from PipelineStages import PIPELINE_STAGES
+
+# Environment variable from which the API password is read if not provided by --api-password or --api-password-file
+PASSWORD_ENVIRONMENT_VARIABLE = "PALOCLEANER_API_PASSWORD"
 
 def parse_cli_args():
     parser = argparse.ArgumentParser()
@@ -10,7 +13,6 @@ def parse_cli_args():
         "--panorama-url",
         action = "store",
         help = "Address of the Panorama server to which to connect (FQDN)",
-        required = True
     )
 
     parser.add_argument(
@@ -25,7 +27,6 @@ def parse_cli_args():
         "--api-user",
         action = "store",
         help = "Username to use for API connection to Panorama",
-        required = True
     )
 
     parser.add_argument(
@@ -35,6 +36,20 @@ def parse_cli_args():
         default = ""
     )
 
+    parser.add_argument(
+        "--api-password-file",
+        action = "store",
+        help = "Path to a file containing the password to use for API connection to Panorama (instead of --api-password)",
+        default = None
+    )
+
+    parser.add_argument(
+        "--batch",
+        action = "store_true",
+        help = "Headless mode for scheduled jobs : no password prompt, no pause, no spinner / progress bar, and SIGINT / SIGTERM cancel the run without confirmation",
+        default = False
+    )
+
     parser.add_argument(
         "--apply-cleaning",
         action = "store_true",
@@ -110,6 +125,14 @@ def parse_cli_args():
         const = 0,
     )
 
+    parser.add_argument(
+        "--download-threads",
+        type = int,
+        action = "store",
+        help = "Number of device-groups to download concurrently (objects, rulebases and hitcounts)",
+        default = 1,
+    )
+
     parser.add_argument(
         "--ignore-appliances-opstate",
         nargs = "+",
@@ -118,6 +141,124 @@ def parse_cli_args():
         help = "List of appliances IP address for which opstate needs to be ignored (will not connect to get hitcounts)"
     )
 
+    parser.add_argument(
+        "--record-session",
+        type = str,
+        action = "store",
+        help = "Records all the API requests / responses exchanged with Panorama and the firewalls (without secrets) on the provided cassette file, to be replayed later with --replay-session",
+        default = None,
+    )
+
+    parser.add_argument(
+        "--replay-session",
+        type = str,
+        action = "store",
+        help = "Replays a cassette file recorded with --record-session instead of contacting Panorama and the firewalls",
+        default = None,
+    )
+
+    parser.add_argument(
+        "--replay-latency",
+        type = str,
+        choices = ["original", "none"],
+        action = "store",
+        help = "When using --replay-session, replay the responses with their recorded duration (original, default) or immediately (none)",
+        default = "original",
+    )
+
+    parser.add_argument(
+        "--api-retries",
+        type = int,
+        action = "store",
+        help = "Maximum number of retries (with exponential backoff) of the read-only API requests failing with a transient error (HTTP 5xx, API throttling, connection reset)",
+        default = 3,
+    )
+
+    parser.add_argument(
+        "--async-download",
+        action = "store_true",
+        help = "Download the objects and rulebases of all device-groups concurrently (asyncio), before analyzing them",
+    )
+
+    parser.add_argument(
+        "--max-inflight-requests",
+        type = int,
+        action = "store",
+        help = "Maximum number of API requests sent at the same time when using --async-download",
+        default = 16,
+    )
+
+    parser.add_argument(
+        "--cache-folder",
+        type = str,
+        action = "store",
+        help = "Folder where the downloaded configuration is cached. Next runs only download the device-groups changed since then (detected using Panorama configuration logs)",
+        default = None,
+    )
+
+    parser.add_argument(
+        "--hitcounts-cache-ttl",
+        type = int,
+        action = "store",
+        help = "Caches the collected rules hitcounts on the --cache-folder, and uses them on next runs for the provided number of hours instead of collecting them again",
+        default = None,
+    )
+
+    parser.add_argument(
+        "--refresh-hitcounts",
+        action = "store_true",
+        help = "Collects the rules hitcounts again even if they are cached (and updates the cache). Used with --hitcounts-cache-ttl",
+        default = False,
+    )
+
+    parser.add_argument(
+        "--lazy-objects",
+        action = "store_true",
+        help = "Deprecated, has no effect : objects and rules are always built directly from the XML configuration, as compact records fully initialized only when needed",
+        default = False,
+    )
+
+    parser.add_argument(
+        "--hitcounts-source",
+        type = str,
+        action = "store",
+        choices = ["firewalls", "panorama"],
+        help = "Get rules hitcounts from each member firewall, or from Panorama (aggregated from managed devices, with fallback on firewalls)",
+        default = "firewalls",
+    )
+
+    parser.add_argument(
+        "--opstate-threads",
+        type = int,
+        action = "store",
+        help = "Number of appliances to connect to concurrently when collecting hitcounts",
+        default = 1,
+    )
+
+    parser.add_argument(
+        "--opstate-timeout",
+        type = int,
+        action = "store",
+        help = "Connection / read timeout (in seconds) of each API request sent to appliances when collecting hitcounts",
+        default = 30,
+    )
+
+    parser.add_argument(
+        "--opstate-retries",
+        type = int,
+        action = "store",
+        help = "Number of retries when hitcounts collection fails on an appliance",
+        default = 2,
+    )
+
+    parser.add_argument(
+        "--opstate-deadline",
+        type = int,
+        action = "store",
+        help = "Maximum time (in seconds) allowed for hitcounts collection. Appliances not polled when reached are skipped",
+        default = None,
+    )
+
     parser.add_argument(
         "--unused-only",
         nargs="*",
@@ -190,6 +331,14 @@ def parse_cli_args():
         help = "Enable DNS resolution of FQDN objects (mainly for group processing), using the provided DNS resolver IP",
     )
 
+    parser.add_argument(
+        "--dns-threads",
+        type = int,
+        action = "store",
+        help = "Maximum number of DNS queries sent at the same time when using --dns-resolver",
+        default = 16,
+    )
+
     parser.add_argument(
         "--parse-schedules",
         action = "store_true",
@@ -217,6 +366,44 @@ def parse_cli_args():
         default = False
     )
 
+    parser.add_argument(
+        "--config-file",
+        action = "store",
+        help = "Path to a Panorama XML configuration export to be analyzed offline (no connection to Panorama)",
+        default = None
+    )
+
+    parser.add_argument(
+        "--stages-folder",
+        type = str,
+        action = "store",
+        help = "Folder where the output of each processing stage (" + ", ".join(PIPELINE_STAGES[:-1]) + ") is saved, to be used by next runs with --from-stage",
+        default = None,
+    )
+
+    parser.add_argument(
+        "--from-stage",
+        choices = PIPELINE_STAGES[1:],
+        action = "store",
+        help = "Starts the processing from this stage, using the output of the previous stages saved on --stages-folder (no connection to Panorama)",
+        default = None,
+    )
+
+    parser.add_argument(
+        "--resume",
+        action = "store_true",
+        help = "Resumes an interrupted run from its output saved on --stages-folder (after the last optimized device-group, or after the last completed stage)",
+        default = False,
+    )
+
+    parser.add_argument(
+        "--checkpoint-interval",
+        type = int,
+        action = "store",
+        help = "Minimum time (in seconds) between two checkpoints of the optimization stage saved on --stages-folder (a checkpoint is saved after a device-group is optimized). 0 to save a checkpoint after each device-group",
+        default = 60,
+    )
+
     return parser.parse_args()
 
 
@@ -224,6 +411,106 @@ def main():
     # Get script start parameters list and values
     start_cli_args = parse_cli_args()
 
+    if not start_cli_args.config_file and not (start_cli_args.panorama_url and start_cli_args.api_user):
+        print("\n ERROR - --panorama-url and --api-user are required when not using --config-file \n")
+        exit(0)
+
+    # the API password can also be read from a file, or from the PALOCLEANER_API_PASSWORD environment variable
+    # (so that it does not appear on the processes list)
+    if start_cli_args.api_password_file and start_cli_args.api_password:
+        print("\n ERROR - --api-password and --api-password-file cannot be used together \n")
+        exit(0)
+
+    if start_cli_args.api_password_file:
+        try:
+            with open(start_cli_args.api_password_file) as f:
+                start_cli_args.api_password = f.readline().rstrip("\r\n")
+        except OSError as e:
+            print(f"\n ERROR - Cannot read --api-password-file : {e} \n")
+            exit(0)
+    elif not start_cli_args.api_password:
+        start_cli_args.api_password = os.environ.get(PASSWORD_ENVIRONMENT_VARIABLE, "")
+
+    if start_cli_args.batch and not (start_cli_args.config_file or ((start_cli_args.from_stage or start_cli_args.resume) and not start_cli_args.apply_cleaning)) and not start_cli_args.api_password:
+        print(f"\n ERROR - --batch requires the API password to be provided with --api-password, --api-password-file or the {PASSWORD_ENVIRONMENT_VARIABLE} environment variable \n")
+        exit(0)
+
+    if start_cli_args.config_file and start_cli_args.cache_folder:
+        print("\n ERROR - --cache-folder cannot be used with --config-file \n")
+        exit(0)
+
+    if start_cli_args.from_stage and not start_cli_args.stages_folder:
+        print("\n ERROR - --from-stage has been called without --stages-folder \n")
+        exit(0)
+
+    if start_cli_args.resume and (not start_cli_args.stages_folder or start_cli_args.from_stage):
+        print("\n ERROR - --resume requires --stages-folder, and cannot be used in conjunction with --from-stage \n")
+        exit(0)
+
+    if start_cli_args.checkpoint_interval < 0:
+        print("\n ERROR - --checkpoint-interval cannot be negative \n")
+        exit(0)
+
+    if start_cli_args.from_stage and start_cli_args.apply_cleaning:
+        print("\n ERROR - --apply-cleaning cannot be used in conjunction with --from-stage (the saved configuration may not be up to date) \n")
+        exit(0)
+
+    if start_cli_args.hitcounts_cache_ttl is not None and (not start_cli_args.cache_folder or start_cli_args.hitcounts_cache_ttl < 1):
+        print("\n ERROR - --hitcounts-cache-ttl must be at least 1 and requires --cache-folder \n")
+        exit(0)
+
+    if start_cli_args.refresh_hitcounts and start_cli_args.hitcounts_cache_ttl is None:
+        print("\n ERROR - --refresh-hitcounts has been called without --hitcounts-cache-ttl \n")
+        exit(0)
+
+    if start_cli_args.config_file and start_cli_args.apply_cleaning:
+        print("\n ERROR - --apply-cleaning cannot be used in conjunction with --config-file (offline analysis) \n")
+        exit(0)
+
+    if start_cli_args.config_file and (start_cli_args.max_days_since_change or start_cli_args.max_days_since_hit):
+        print("\n ERROR - --max-days-since-change and --max-days-since-hit cannot be used in conjunction with --config-file (hitcounts are not available offline) \n")
+        exit(0)
+
+    if start_cli_args.download_threads < 1:
+        print("\n ERROR - --download-threads must be at least 1 \n")
+        exit(0)
+
+    if start_cli_args.max_inflight_requests < 1:
+        print("\n ERROR - --max-inflight-requests must be at least 1 \n")
+        exit(0)
+
+    if start_cli_args.config_file and start_cli_args.async_download:
+        print("\n ERROR - --async-download cannot be used with --config-file \n")
+        exit(0)
+
+    if start_cli_args.api_retries < 0:
+        print("\n ERROR - --api-retries cannot be negative \n")
+        exit(0)
+
+    if start_cli_args.record_session and start_cli_args.replay_session:
+        print("\n ERROR - --record-session and --replay-session cannot be used together \n")
+        exit(0)
+
+    if start_cli_args.config_file and (start_cli_args.record_session or start_cli_args.replay_session):
+        print("\n ERROR - --record-session and --replay-session cannot be used with --config-file \n")
+        exit(0)
+
+    if start_cli_args.dns_threads < 1:
+        print("\n ERROR - --dns-threads must be at least 1 \n")
+        exit(0)
+
+    if start_cli_args.opstate_threads < 1:
+        print("\n ERROR - --opstate-threads must be at least 1 \n")
+        exit(0)
+
+    if start_cli_args.opstate_timeout < 1 or start_cli_args.opstate_retries < 0:
+        print("\n ERROR - --opstate-timeout must be at least 1 and --opstate-retries cannot be negative \n")
+        exit(0)
+
+    if start_cli_args.opstate_deadline is not None and start_cli_args.opstate_deadline < 1:
+        print("\n ERROR - --opstate-deadline must be at least 1 \n")
+        exit(0)
+
     # if the --apply-tiebreak-tag has been used without the --tiebreak-tag argument value, raise en error and exit
     if start_cli_args.apply_tiebreak_tag and not start_cli_args.tiebreak_tag:
         print("\n ERROR - --apply-tiebreak-tag has been called without --tiebreak-tag \n")
@@ -255,9 +542,15 @@ def main():
         print(f"Report folder will be {report_folder}")
         os.mkdir(report_folder)
 
+    # PaloCleaner (and its rich / pan-os-python dependencies) is only imported once the arguments have been validated,
+    # so that --help and arguments errors are displayed without loading them
+    from PaloCleaner import PaloCleaner
+
     # Instantiate the PaloCleaner object (connection to Panorama)
     cleaner = PaloCleaner(report_folder, **start_cli_args.__dict__)
-    cleaner.start()
+    # in batch mode, a failed or cancelled run is reported to the scheduler with a non-zero exit code
+    if cleaner.start() == 0 and start_cli_args.batch:
+        exit(1)
 
 # entry point
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+"""
+Startup time benchmark for PaloCleaner
+
+Measures (on fresh Python interpreters) the time needed by the CLI to display its help and to reject invalid arguments,
+which must not load the heavy dependencies (rich, pan-os-python, dnspython, asyncio), and the time needed to import the
+PaloCleaner module itself. The modules having the highest cumulative import time are listed (python -X importtime).
+
+Example :
+    python startup_benchmark.py --runs 10 --max-help-ms 300
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_FOLDER = os.path.dirname(os.path.abspath(__file__))
+# Measured commands (python interpreter arguments)
+SCENARIOS = {
+    "interpreter": ["-c", "pass"],
+    "main.py --help": ["main.py", "--help"],
+    "main.py (arguments error)": ["main.py"],
+    "import PaloCleaner": ["-c", "import PaloCleaner"],
+}
+
+
+def time_command(args: [str], runs: int) -> [float]:
+    """
+    Runs a Python command several times, and returns its durations
+
+    :param args: (list) The python interpreter arguments
+    :param runs: (int) Number of runs
+    :return: (list) The duration (in milliseconds) of each run
+    """
+
+    durations = list()
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=SRC_FOLDER, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        durations.append((time.perf_counter() - start_time) * 1000)
+    return durations
+
+
+def get_import_times(module: str, top: int) -> [(float, str)]:
+    """
+    Returns the modules having the highest cumulative import time when importing a module
+
+    :param module: (str) The imported module
+    :param top: (int) Number of modules to be returned
+    :return: (list) List of tuples (cumulative import time in milliseconds, module name)
+    """
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=SRC_FOLDER,
+                            capture_output=True, text=True)
+    import_times = list()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        import_times.append((int(cumulative) / 1000, name.rstrip()))
+    return sorted(import_times, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PaloCleaner startup time benchmark")
+    parser.add_argument("--runs", type=int, action="store", default=10,
+                        help="Number of runs of each measured command")
+    parser.add_argument("--top", type=int, action="store", default=15,
+                        help="Number of modules listed with their cumulative import time")
+    parser.add_argument("--max-help-ms", type=float, action="store", default=None,
+                        help="Exits with an error code if the median time of main.py --help is higher (for CI)")
+    args = parser.parse_args()
+
+    print(f"{'Command':<28}{'median':>10}{'min':>10}{'max':>10}   ({args.runs} runs, milliseconds)")
+    medians = dict()
+    for name, command in SCENARIOS.items():
+        durations = time_command(command, args.runs)
+        medians[name] = statistics.median(durations)
+        print(f"{name:<28}{medians[name]:>10.1f}{min(durations):>10.1f}{max(durations):>10.1f}")
+
+    print(f"\nHighest cumulative import times of PaloCleaner (milliseconds) :")
+    for cumulative, name in get_import_times("PaloCleaner", args.top):
+        print(f"{cumulative:>10.1f}  {name}")
+
+    if args.max_help_ms is not None and medians["main.py --help"] > args.max_help_ms:
+        print(f"\nERROR - main.py --help median time ({medians['main.py --help']:.1f} ms) is higher than {args.max_help_ms} ms")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import pytest
+from hierarchy import HierarchyDG
+
+
+@pytest.fixture
+def dg_index():
+    # shared
+    # ├── dg1
+    # │   ├── dg11
+    # │   │   └── dg111
+    # │   └── dg12
+    # └── dg2
+    dg_dict = {'shared': HierarchyDG('shared')}
+    dg_dict['shared'].level = 0
+    for dg_name, parent_name in [('dg1', 'shared'), ('dg11', 'dg1'), ('dg111', 'dg11'), ('dg12', 'dg1'), ('dg2', 'shared')]:
+        dg_dict[dg_name] = HierarchyDG(dg_name)
+        dg_dict[dg_name].add_parent(dg_dict[parent_name])
+    return HierarchyDG.gen_index(dg_dict)
+
+
+def test_parents(dg_index):
+    assert dg_index.get_parent('shared') is None
+    assert dg_index.get_parent('dg1') == 'shared'
+    assert dg_index.get_parent('dg111') == 'dg11'
+
+
+def test_ancestors(dg_index):
+    assert dg_index.get_ancestors('shared') == ('shared',)
+    assert dg_index.get_ancestors('dg2') == ('dg2', 'shared')
+    assert dg_index.get_ancestors('dg111') == ('dg111', 'dg11', 'dg1', 'shared')
+
+
+def test_levels(dg_index):
+    assert dg_index.get_level('shared') == 0
+    assert dg_index.get_level('dg1') == 1
+    assert dg_index.get_level('dg12') == 2
+    assert dg_index.get_level('dg111') == 3
+
+
+def test_subtrees(dg_index):
+    # subtrees are listed in pre-order, each location before its downward locations
+    assert dg_index.get_subtree('shared') == ('shared', 'dg1', 'dg11', 'dg111', 'dg12', 'dg2')
+    assert dg_index.get_subtree('dg1') == ('dg1', 'dg11', 'dg111', 'dg12')
+    assert dg_index.get_subtree('dg11') == ('dg11', 'dg111')
+    assert dg_index.get_subtree('dg2') == ('dg2',)
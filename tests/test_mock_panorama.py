@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+import MockPanorama
+
+SRC_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def query(mock, action, xpath):
+    status, response = mock.handle({"type": "config", "action": action, "xpath": xpath, "key": MockPanorama.API_KEY}, "127.0.0.1")
+    return response
+
+
+@pytest.fixture
+def mock_server():
+    mock = MockPanorama.MockPanorama(MockPanorama.generate_config(4, 20, 10, 0, seed=1))
+    MockPanorama.MockRequestHandler.mock = mock
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockPanorama.MockRequestHandler)
+    server.daemon_threads = True
+    server.socket = MockPanorama.get_ssl_context(None, None).wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield mock, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_unsupported_xpath_predicate_returns_an_error():
+    mock = MockPanorama.MockPanorama(MockPanorama.generate_config(1, 5, 2, 0))
+    response = query(mock, "get", "/config/shared/address/entry[starts-with(@name, 'shared')]")
+    assert response.startswith('<response status="error"')
+
+
+def test_cleaning_against_mock(mock_server):
+    mock, port = mock_server
+    result = subprocess.run(
+        [sys.executable, "main.py", "--panorama-url", f"127.0.0.1:{port}", "--api-user", "admin",
+         "--api-password", "admin", "--batch", "--no-report", "--apply-cleaning"],
+        cwd=SRC_FOLDER, capture_output=True, text=True, env={**os.environ, "COLUMNS": "200"}, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout[-2000:]
+    assert "Traceback" not in result.stdout
+
+    # objects are replaced (edit of the rules and groups using them) and deleted
+    actions = {x["action"] for x in mock.writes}
+    assert actions == {"edit", "delete"}
+    for write in mock.writes:
+        if write["action"] == "delete":
+            assert 'total-count="0"' in query(mock, "get", write["xpath"])
+
+    # the resulting configuration does not reference any deleted object
+    for location_name in ["shared"] + list(mock.hierarchy):
+        visible = set()
+        for upward_location in mock.get_location_chain(location_name if location_name != "shared" else None):
+            upward_root = mock.get_location_root(upward_location)
+            visible |= {x.get("name") for x in upward_root.findall("./address/entry") + upward_root.findall("./address-group/entry")}
+        location_root = mock.get_location_root(location_name)
+        for group in location_root.findall("./address-group/entry"):
+            assert {x.text for x in group.findall("./static/member")} <= visible, group.get("name")
+        for rule in location_root.findall("./*/*/rules/entry"):
+            members = {x.text for x in rule.findall("./source/member") + rule.findall("./destination/member")}
+            assert members - {"any"} <= visible, rule.get("name")
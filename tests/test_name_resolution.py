@@ -0,0 +1,95 @@
+import pytest
+from panos.objects import AddressObject, ServiceObject, Tag
+from hierarchy import HierarchyDG
+from PaloCleaner import PaloCleaner
+
+
+class SilentConsole:
+    def log(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def cleaner():
+    # shared
+    # ├── dg1
+    # │   └── dg11
+    # └── dg2
+    dg_dict = {'shared': HierarchyDG('shared')}
+    dg_dict['shared'].level = 0
+    for dg_name, parent_name in [('dg1', 'shared'), ('dg11', 'dg1'), ('dg2', 'shared')]:
+        dg_dict[dg_name] = HierarchyDG(dg_name)
+        dg_dict[dg_name].add_parent(dg_dict[parent_name])
+
+    cleaner = PaloCleaner.__new__(PaloCleaner)
+    cleaner._console = SilentConsole()
+    cleaner._dg_index = HierarchyDG.gen_index(dg_dict)
+    cleaner._addr_namesearch = {
+        'shared': {'host1': AddressObject('host1', '10.0.0.1')},
+        'dg1': {'host1': AddressObject('host1', '10.0.0.2'), 'host2': AddressObject('host2', '10.0.0.3')},
+        'dg11': dict(),
+        'dg2': dict(),
+    }
+    cleaner._tag_namesearch = {'shared': {'tag1': Tag('tag1')}, 'dg1': dict(), 'dg11': dict(), 'dg2': dict()}
+    cleaner._service_namesearch = {
+        'predefined': {'service-http': ServiceObject('service-http', 'tcp', destination_port='80')},
+        'shared': dict(), 'dg1': dict(), 'dg11': dict(), 'dg2': dict(),
+    }
+    cleaner._schedule_namesearch = {'shared': dict(), 'dg1': dict(), 'dg11': dict(), 'dg2': dict()}
+    cleaner._tag_objsearch = {'shared': dict(), 'dg1': dict(), 'dg11': dict(), 'dg2': dict()}
+    cleaner._name_resolution = dict()
+    cleaner.build_name_resolution()
+    return cleaner
+
+
+def test_nearest_location_is_returned(cleaner):
+    shared_host, dg1_host = cleaner._addr_namesearch['shared']['host1'], cleaner._addr_namesearch['dg1']['host1']
+    assert cleaner.get_relative_object_location('host1', 'dg11') == (dg1_host, 'dg1')
+    assert cleaner.get_relative_object_location('host1', 'dg2') == (shared_host, 'shared')
+    assert cleaner.get_relative_object_location('host1', 'dg11', find_all=True) == [(dg1_host, 'dg1'), (shared_host, 'shared')]
+
+
+def test_unknown_object(cleaner):
+    assert cleaner.get_relative_object_location('host2', 'dg2') == (None, None)
+    assert cleaner.get_relative_object_location('host2', 'dg2', find_all=True) == list()
+    assert cleaner.get_relative_object_location('host1', 'dg2', obj_type="Schedule") == (None, None)
+
+
+def test_predefined_services_are_found_after_shared(cleaner):
+    predefined_service = cleaner._service_namesearch['predefined']['service-http']
+    assert cleaner.get_relative_object_location('service-http', 'dg11', obj_type="Service") == (predefined_service, 'predefined')
+
+    shared_service = ServiceObject('service-http', 'tcp', destination_port='8080')
+    cleaner._service_namesearch['shared']['service-http'] = shared_service
+    cleaner.update_name_resolution("Service", 'service-http', 'shared')
+    assert cleaner.get_relative_object_location('service-http', 'dg11', obj_type="Service", find_all=True) == [
+        (shared_service, 'shared'), (predefined_service, 'predefined')]
+
+
+def test_update_after_adding_an_object(cleaner):
+    new_tag = Tag('tag2')
+    cleaner._tag_namesearch['dg1']['tag2'] = new_tag
+    cleaner.update_name_resolution("Tag", 'tag2', 'dg1')
+    assert cleaner.get_relative_object_location('tag2', 'dg1', obj_type="Tag") == (new_tag, 'dg1')
+    assert cleaner.get_relative_object_location('tag2', 'dg11', obj_type="Tag") == (new_tag, 'dg1')
+    # the locations which are not downward the modified location are unchanged
+    assert cleaner.get_relative_object_location('tag2', 'shared', obj_type="Tag") == (None, None)
+    assert cleaner.get_relative_object_location('tag2', 'dg2', obj_type="Tag") == (None, None)
+
+
+def test_update_keeps_lower_overrides(cleaner):
+    dg1_host = cleaner._addr_namesearch['dg1']['host2']
+    shared_host = AddressObject('host2', '10.0.0.3')
+    cleaner._addr_namesearch['shared']['host2'] = shared_host
+    cleaner.update_name_resolution("Address", 'host2', 'shared')
+    assert cleaner.get_relative_object_location('host2', 'dg2') == (shared_host, 'shared')
+    assert cleaner.get_relative_object_location('host2', 'dg11') == (dg1_host, 'dg1')
+    assert cleaner.get_relative_object_location('host2', 'dg11', find_all=True) == [(dg1_host, 'dg1'), (shared_host, 'shared')]
+
+
+def test_dag_members_are_found_on_the_ancestors(cleaner):
+    dg1_host, shared_host = cleaner._addr_namesearch['dg1']['host2'], cleaner._addr_namesearch['shared']['host1']
+    cleaner._tag_objsearch['dg1']['tag1'] = {dg1_host}
+    cleaner._tag_objsearch['shared']['tag1'] = {shared_host}
+    found = cleaner.get_relative_object_location_by_tag("'tag1'", 'dg11', 'dag1')
+    assert set(found) == {(dg1_host, 'dg1'), (shared_host, 'shared'), (cleaner._tag_namesearch['shared']['tag1'], 'shared')}
@@ -0,0 +1,116 @@
+import copy
+import pickle
+import xml.etree.ElementTree as ET
+import pytest
+from panos.panorama import Panorama, DeviceGroup
+from panos.objects import AddressObject, AddressGroup, ServiceObject
+from panos.policies import NatRule
+import ObjectRecords
+
+ADDRESSES_XML = """
+<address>
+  <entry name="host1">
+    <ip-netmask>10.0.0.1</ip-netmask>
+    <tag><member>tag1</member></tag>
+  </entry>
+  <entry name="fqdn1">
+    <fqdn>www.example.com</fqdn>
+    <description>example</description>
+  </entry>
+</address>
+"""
+
+NAT_RULES_XML = """
+<rules>
+  <entry name="nat1">
+    <from><member>inside</member></from>
+    <to><member>outside</member></to>
+    <source-translation>
+      <dynamic-ip-and-port><interface-address><interface>ethernet1/1</interface></interface-address></dynamic-ip-and-port>
+    </source-translation>
+  </entry>
+</rules>
+"""
+
+
+@pytest.fixture
+def device_group():
+    device_group = DeviceGroup("dg1")
+    Panorama("offline").add(device_group)
+    return device_group
+
+
+@pytest.fixture
+def records(device_group):
+    return ObjectRecords.build_from_xml(AddressObject, ET.fromstring(ADDRESSES_XML), device_group)
+
+
+@pytest.fixture
+def nat_rule(device_group):
+    return ObjectRecords.build_from_xml(NatRule, ET.fromstring(NAT_RULES_XML), device_group)[0]
+
+
+def test_records_are_built_from_xml(records, device_group):
+    host, fqdn = records
+    assert isinstance(host, AddressObject) and type(host).__name__ == "AddressObject"
+    assert (host.name, host.type, host.value, host.tag, host.description) == ("host1", "ip-netmask", "10.0.0.1", ["tag1"], None)
+    assert (fqdn.name, fqdn.type, fqdn.value, fqdn.description) == ("fqdn1", "fqdn", "www.example.com", "example")
+    assert host.parent is device_group and not host.children
+    # records have no parameters machinery until they are used for an API call
+    assert "_params" not in host.__dict__
+    assert not hasattr(host, "group_membership")
+
+
+def test_record_values_are_used_for_api_calls(records):
+    host = records[0]
+    host.value = "10.0.0.2"
+    host.tag.append("tag2")
+    assert host.xpath().endswith("/device-group/entry[@name='dg1']/address/entry[@name='host1']")
+    assert host.element_str() == b'<entry name="host1"><ip-netmask>10.0.0.2</ip-netmask><tag><member>tag1</member><member>tag2</member></tag></entry>'
+    assert host.about() == {"name": "host1", "type": "ip-netmask", "value": "10.0.0.2", "description": None, "tag": ["tag1", "tag2"]}
+    # values modified after the materialization are used as well
+    host.description = "modified"
+    assert b"<description>modified</description>" in host.element_str()
+
+
+def test_groups_and_services(device_group):
+    group = ObjectRecords.build_from_xml(AddressGroup, ET.fromstring(
+        '<address-group><entry name="group1"><static><member>host1</member></static></entry></address-group>'), device_group)[0]
+    assert (group.static_value, group.dynamic_value) == (["host1"], None)
+    service = ObjectRecords.build_from_xml(ServiceObject, ET.fromstring(
+        '<service><entry name="tcp_443"><protocol><tcp><port>443</port></tcp></protocol></entry></service>'), device_group)[0]
+    assert (service.protocol, service.source_port, service.destination_port) == ("tcp", None, "443")
+    assert ObjectRecords.get_panos_class(service) is ServiceObject
+    assert ObjectRecords.get_panos_class(ServiceObject("tcp_80")) is ServiceObject
+
+
+def test_records_can_be_pickled_and_copied(records):
+    host = records[0]
+    host.group_membership = {"group1"}
+    loaded_host, loaded_parent = pickle.loads(pickle.dumps((host, host.parent)))
+    assert type(loaded_host) is type(host)
+    assert (loaded_host.name, loaded_host.value, loaded_host.group_membership) == ("host1", "10.0.0.1", {"group1"})
+    assert loaded_host.parent is loaded_parent
+    copied_host = copy.copy(host)
+    assert copied_host is not host and copied_host.value == host.value and copied_host.parent is host.parent
+
+
+def test_parsed_field_modification_does_not_materialize(nat_rule):
+    nat_rule.fromzone = ["dmz"]
+    assert "_params" not in nat_rule.__dict__ and nat_rule._xml is not None
+    assert nat_rule.fromzone == ["dmz"]
+    # the modified value is kept once the record is materialized
+    nat_rule.about()
+    assert "_params" in nat_rule.__dict__ and nat_rule._xml is None
+    assert nat_rule.fromzone == ["dmz"]
+
+
+def test_non_parsed_field_modification_is_kept(nat_rule):
+    fields = ObjectRecords.get_fields_spec(NatRule, nat_rule.parent)
+    assert "source_translation_fallback_type" not in fields and "source_translation_interface" not in fields
+    nat_rule.source_translation_fallback_type = "interface-address"
+    assert nat_rule.source_translation_fallback_type == "interface-address"
+    # non-parsed parameters are read from the XML entry
+    assert nat_rule.source_translation_interface == "ethernet1/1"
+    assert nat_rule.source_translation_fallback_type == "interface-address"
+    assert nat_rule.about()["source_translation_fallback_type"] == "interface-address"
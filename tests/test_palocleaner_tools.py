@@ -0,0 +1,57 @@
+import pytest
+from panos.objects import AddressGroup
+from PaloCleanerTools import normalize_dag_condition, get_group_key
+
+
+@pytest.mark.parametrize("condition_1, condition_2", [
+    ("tag1 and tag2", "tag2 and tag1"),
+    ("'tag1' and \"tag2\"", "tag1 and tag2"),
+    ("tag1 AND tag2 OR tag3", "tag3 or tag2 and tag1"),
+    ("(tag1)", "'tag1'"),
+    ("((tag1 and tag2))", "tag2 and tag1"),
+    ("tag1 and (tag2 and tag3)", "(tag3 and tag1) and tag2"),
+    ("tag1 or (tag2 or tag3)", "tag3 or tag2 or tag1"),
+    ("'tag 1' and tag2", "tag2 and \"tag 1\""),
+])
+def test_equivalent_conditions(condition_1, condition_2):
+    assert normalize_dag_condition(condition_1) == normalize_dag_condition(condition_2)
+
+
+@pytest.mark.parametrize("condition_1, condition_2", [
+    ("tag1 and tag2", "tag1 or tag2"),
+    ("(tag1 or tag2) and tag3", "tag1 or (tag2 and tag3)"),
+    ("Tag1", "tag1"),
+])
+def test_different_conditions(condition_1, condition_2):
+    assert normalize_dag_condition(condition_1) != normalize_dag_condition(condition_2)
+
+
+def test_canonical_form():
+    assert normalize_dag_condition("'tag2' AND (tag1)") == "and('tag1','tag2')"
+    assert normalize_dag_condition(" tag1 ") == "'tag1'"
+
+
+@pytest.mark.parametrize("condition", ["not", "tag1 and not tag2", "tag1 and", "(tag1 or tag2", "tag1 tag2)", "and"])
+def test_unparseable_conditions_are_kept(condition):
+    assert normalize_dag_condition(f"  {condition} ") == condition
+
+
+def test_static_group_key_ignores_members_order():
+    group_1 = AddressGroup("group1", static_value=["host1", "host2", "host3"])
+    group_2 = AddressGroup("group2", static_value=["host3", "host1", "host2"])
+    group_3 = AddressGroup("group3", static_value=["host1", "host2"])
+    assert get_group_key(group_1) == get_group_key(group_2) == ("static", frozenset({"host1", "host2", "host3"}))
+    assert hash(get_group_key(group_1)) == hash(get_group_key(group_2))
+    assert get_group_key(group_1) != get_group_key(group_3)
+
+
+def test_dynamic_group_key():
+    group_1 = AddressGroup("group1", dynamic_value="'tag1' and 'tag2'")
+    group_2 = AddressGroup("group2", dynamic_value="tag2 AND tag1")
+    assert get_group_key(group_1) == get_group_key(group_2) == ("dynamic", "and('tag1','tag2')")
+    # a static group and a dynamic group never share the same key
+    assert get_group_key(AddressGroup("group3", static_value=["tag1"])) != get_group_key(AddressGroup("group4", dynamic_value="tag1"))
+
+
+def test_empty_group_key():
+    assert get_group_key(AddressGroup("group1")) is None
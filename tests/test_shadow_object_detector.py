@@ -0,0 +1,25 @@
+from panos.objects import AddressGroup
+from PaloCleaner import PaloCleaner
+from PaloCleanerTools import get_group_key
+from ShadowObjectDetector import ShadowObjectDetector
+
+
+class SilentConsole:
+    def log(self, *args, **kwargs):
+        pass
+
+
+def test_group_cleaning_updates_the_group_value_index():
+    group = AddressGroup("group1", static_value=["net1", "host1", "host2"])
+    cleaner = PaloCleaner.__new__(PaloCleaner)
+    cleaner._console = SilentConsole()
+    cleaner._apply_cleaning = False
+    cleaner._objects = {'dg1': {'Address': [group]}}
+    cleaner._addr_group_valuesearch = {'dg1': {get_group_key(group): [group]}}
+
+    detector = ShadowObjectDetector(cleaner)
+    detector._group_removals = {'dg1': {'group1': {'static_value': ['host1']}}}
+    detector.apply_group_cleaning('dg1')
+
+    assert group.static_value == ["net1", "host2"]
+    assert cleaner._addr_group_valuesearch['dg1'] == {("static", frozenset({"net1", "host2"})): [group]}
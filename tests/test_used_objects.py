@@ -0,0 +1,75 @@
+import pickle
+import pytest
+from panos.objects import AddressObject, Tag
+from UsedObjects import UsedObjectsRegistry, UsedObjectsSet
+
+
+@pytest.fixture
+def pairs():
+    return [(AddressObject(f"host{n}", f"10.0.0.{n}"), location) for n, location in enumerate(["dg1", "dg1", "shared", "dg1", "shared"] * 4)]
+
+
+def test_set_operations(pairs):
+    registry = UsedObjectsRegistry()
+    used_set = UsedObjectsSet(registry, pairs[:5])
+    assert len(used_set) == 5 and used_set
+    assert all(x in used_set for x in pairs[:5])
+    assert pairs[5] not in used_set
+    # a pair is equal to another tuple with the same object and location
+    assert (pairs[0][0], "dg1") in used_set and (pairs[0][0], "shared") not in used_set
+
+    used_set.add(pairs[12])
+    used_set.update(pairs[3:8])
+    assert set(used_set) == set(pairs[:8] + [pairs[12]])
+
+    used_set.remove(pairs[3])
+    assert pairs[3] not in used_set and len(used_set) == 8
+    with pytest.raises(KeyError):
+        used_set.remove(pairs[3])
+    with pytest.raises(KeyError):
+        used_set.remove((Tag("tag1"), "dg1"))
+
+    assert not UsedObjectsSet(registry)
+    assert list(UsedObjectsSet(registry)) == list()
+
+
+def test_set_can_be_modified_while_iterating(pairs):
+    used_set = UsedObjectsSet(UsedObjectsRegistry(), pairs)
+    for pair in used_set:
+        used_set.remove(pair)
+    assert len(used_set) == 0
+
+
+def test_update_upward_masks_the_location_objects(pairs):
+    registry = UsedObjectsRegistry()
+    shared_set = UsedObjectsSet(registry, [pairs[2]])
+    dg1_set = UsedObjectsSet(registry, pairs[:10])
+    shared_set.update_upward(dg1_set, "dg1")
+    assert set(shared_set) == {x for x in pairs[:10] if x[1] == "shared"}
+    # the location set is unchanged
+    assert set(dg1_set) == set(pairs[:10])
+
+
+def test_pickled_sets_share_their_registry(pairs):
+    registry = UsedObjectsRegistry()
+    used_sets = {"dg1": UsedObjectsSet(registry, pairs[:3]), "shared": UsedObjectsSet(registry, pairs[2:5])}
+    loaded_registry, loaded_sets = pickle.loads(pickle.dumps((registry, used_sets)))
+    assert loaded_sets["dg1"]._registry is loaded_registry and loaded_sets["shared"]._registry is loaded_registry
+    assert [x[0].name for x in loaded_sets["shared"]] == ["host2", "host3", "host4"]
+    # the registry lock is recreated, new pairs can be added after the loading
+    loaded_sets["dg1"].add(loaded_sets["shared"]._registry._pairs[4])
+    assert len(loaded_sets["dg1"]) == 4
+
+
+def test_count_is_kept_up_to_date(pairs):
+    registry = UsedObjectsRegistry()
+    used_set = UsedObjectsSet(registry, pairs[:4])
+    used_set.add(pairs[0])
+    used_set.update(pairs[2:6])
+    assert len(used_set) == 6
+    used_set.remove(pairs[1])
+    assert len(used_set) == 5
+    shared_set = UsedObjectsSet(registry, [pairs[2]])
+    shared_set.update_upward(used_set, "dg1")
+    # pairs[2] was already on the set, pairs[1] has been removed, pairs[0], pairs[3] and pairs[5] are defined on dg1
+    assert len(shared_set) == 2 and set(shared_set) == {pairs[2], pairs[4]}